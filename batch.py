@@ -0,0 +1,188 @@
+# runs many Brewin programs, each with any number of input lists, across a pool of worker
+# processes. every worker imports all the interpreters (and builds the parser tables)
+# once when it starts, and keeps its own program cache, so running the same program with
+# different inputs only parses it once per worker.
+# results are streamed back as soon as each job finishes
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import multiprocessing
+import signal
+
+from governor import DEADLINE, Governor
+from intbase import InterpreterBase
+
+VERSIONS = (1, 2, 3, 4)
+
+
+# a single program run: the source, the input list it reads from and how to run it
+class Job:
+    def __init__(
+        self,
+        program,
+        inp=None,
+        version=4,
+        mode=InterpreterBase.TREE_MODE,
+        timeout=None,
+        id=None,
+        max_steps=None,
+        max_depth=None,
+        max_memory=None,
+    ):
+        self.program = program
+        self.inp = inp
+        self.version = version
+        self.mode = mode
+        self.timeout = timeout  # in seconds, None for no limit
+        self.id = id  # returned with the result so callers can match them up
+        self.max_steps = max_steps  # step budget (see governor.py), None for no limit
+        self.max_depth = max_depth  # maximum call depth, None for no limit
+        self.max_memory = max_memory  # memory quota in bytes, None for no limit
+
+
+# raised inside a worker when a job runs past its timeout. it's raised from a signal
+# handler, so it can land anywhere in an interpreter; it isn't an Exception so the
+# interpreters' own except Exception blocks can't swallow it, only run_job catches it
+class JobTimeout(BaseException):
+    pass
+
+
+def on_timeout(signum, frame):
+    raise JobTimeout()
+
+
+def init_worker():
+    for version in VERSIONS:
+        importlib.import_module(f"interpreterv{version}")
+    if hasattr(signal, "setitimer"):
+        signal.signal(signal.SIGALRM, on_timeout)
+
+
+# runs a job and returns its result as a dict:
+# id, output (what it printed, even if it failed), error_type and error_line (from
+# get_error_type_and_line), exception (the message of whatever stopped the program, if
+# anything), stdout (anything else written to stdout while it ran, like the parser's
+# syntax error messages), timed_out, limit (the governor limit the program went past,
+# if any) and peak_memory (the most bytes its values held at once, None for v1, which
+# has nothing to measure). limits are enforced by a Governor, which works everywhere;
+# SIGALRM is only a backstop for a single step that takes too long.
+# every worker shares the stdout of the process that started the pool, so anything a
+# job prints is captured instead of landing in the middle of the results
+def run_job(job):
+    module = importlib.import_module(f"interpreterv{job.version}")
+    # every job gets a governor, even without limits, so its peak memory is measured
+    governor = Governor(job.max_steps, job.timeout, job.max_depth, job.max_memory)
+    interpreter = module.Interpreter(
+        console_output=False, inp=job.inp, mode=job.mode, governor=governor
+    )
+
+    # timeouts need SIGALRM, so they're only enforced on unix
+    timer = job.timeout and hasattr(signal, "setitimer")
+    stdout = io.StringIO()
+    # JobTimeout can be raised anywhere until the timer is disarmed, even after the
+    # program has finished or while its result is being built, so everything between
+    # arming and disarming it is inside the try that catches it. stdout is redirected
+    # outside of it so a timeout can't leave it redirected
+    with contextlib.redirect_stdout(stdout):
+        try:
+            try:
+                if timer:
+                    signal.setitimer(signal.ITIMER_REAL, job.timeout)
+                exception = None
+                try:
+                    interpreter.run(job.program)
+                except Exception as e:
+                    exception = str(e)
+                timed_out = governor.exceeded == DEADLINE
+                result = job_result(
+                    job, interpreter, governor, stdout, exception, timed_out
+                )
+            finally:
+                if timer:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+        except JobTimeout:
+            exception = f"Timed out after {job.timeout}s"
+            result = job_result(job, interpreter, governor, stdout, exception, True)
+    return result
+
+
+# returns the result of a job that has stopped, as described above run_job
+def job_result(job, interpreter, governor, stdout, exception, timed_out):
+    error_type, error_line = interpreter.get_error_type_and_line()
+    return {
+        "id": job.id,
+        "output": interpreter.get_output(),
+        "error_type": error_type,
+        "error_line": error_line,
+        "exception": exception,
+        "stdout": stdout.getvalue(),
+        "timed_out": timed_out,
+        "limit": governor.exceeded,
+        "peak_memory": governor.peak_memory if governor.interpreter else None,
+    }
+
+
+# runs every job across a pool of `processes` workers (one per core by default),
+# yielding each result as soon as it's done, or in the order of jobs if ordered is set
+def run_batch(jobs, processes=None, chunksize=1, ordered=False):
+    with multiprocessing.Pool(processes, initializer=init_worker) as pool:
+        if ordered:
+            yield from pool.imap(run_job, jobs, chunksize)
+        else:
+            yield from pool.imap_unordered(run_job, jobs, chunksize)
+
+
+# returns a job for every combination of program and input list; a job's id is the
+# (program index, input list index) pair
+def make_jobs(programs, input_lists=None, **kwargs):
+    if not input_lists:
+        input_lists = [None]
+    return [
+        Job(program, inp, id=(i, j), **kwargs)
+        for i, program in enumerate(programs)
+        for j, inp in enumerate(input_lists)
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run Brewin programs in parallel")
+    parser.add_argument("programs", nargs="+", help="paths of the programs to run")
+    parser.add_argument("-v", "--version", type=int, default=4, choices=VERSIONS)
+    parser.add_argument("-m", "--mode", default=InterpreterBase.TREE_MODE)
+    parser.add_argument("-i", "--inputs", help="JSON file holding a list of input lists")
+    parser.add_argument("-j", "--processes", type=int, help="number of workers")
+    parser.add_argument("-t", "--timeout", type=float, help="seconds allowed per job")
+    parser.add_argument("-s", "--max-steps", type=int, help="step budget per job")
+    parser.add_argument("-d", "--max-depth", type=int, help="maximum call depth")
+    parser.add_argument("-M", "--max-memory", type=int, help="memory quota in bytes")
+    args = parser.parse_args()
+
+    programs = []
+    for path in args.programs:
+        with open(path) as file:
+            programs.append(file.read())
+    input_lists = None
+    if args.inputs:
+        with open(args.inputs) as file:
+            input_lists = json.load(file)
+
+    jobs = make_jobs(
+        programs,
+        input_lists,
+        version=args.version,
+        mode=args.mode,
+        timeout=args.timeout,
+        max_steps=args.max_steps,
+        max_depth=args.max_depth,
+        max_memory=args.max_memory,
+    )
+    # one JSON object per line, in completion order
+    for result in run_batch(jobs, args.processes):
+        program, inputs = result["id"]
+        result["id"] = {"program": args.programs[program], "inputs": inputs}
+        if result["error_type"]:
+            result["error_type"] = result["error_type"].name
+        print(json.dumps(result), flush=True)
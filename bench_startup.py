@@ -0,0 +1,55 @@
+# measures how long a fresh python process takes to import the parser, with the frozen
+# lexer and parser tables (the default) and with PLY building everything by reflection
+# (BREWIN_BUILD_TABLES). each import runs in a new process so nothing is cached, apart
+# from the bytecode of the modules themselves, which a warm-up run writes first
+#
+# usage: python3 bench_startup.py [runs]
+
+import os
+import statistics
+import subprocess
+import sys
+
+# the time is measured inside the child so interpreter startup itself isn't counted
+CHILD = """
+import time
+start = time.perf_counter()
+import brewparse
+print(time.perf_counter() - start)
+"""
+
+
+def time_imports(runs, build_tables):
+    env = dict(os.environ)
+    env.pop("BREWIN_BUILD_TABLES", None)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    if build_tables:
+        env["BREWIN_BUILD_TABLES"] = "1"
+
+    times = []
+    for _ in range(runs + 1):
+        result = subprocess.run(
+            [sys.executable, "-c", CHILD],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        times.append(float(result.stdout.split()[-1]))
+    # the first run is the warm-up
+    return times[1:]
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    results = {}
+    for name, build_tables in (("reflection", True), ("frozen", False)):
+        times = time_imports(runs, build_tables)
+        results[name] = statistics.median(times)
+        print(
+            f"{name:>10}: median {results[name] * 1000:.2f} ms, "
+            f"min {min(times) * 1000:.2f} ms over {runs} runs"
+        )
+    print(f"   speedup: {results['reflection'] / results['frozen']:.1f}x")
@@ -1,4 +1,6 @@
 
+import os
+
 from ply import lex
 
 reserved = (
@@ -132,5 +134,29 @@ def t_error(t):
 def reset_lineno():
     lexer.lineno = 1
 
+
+# by default the lexer and parser are loaded straight from the frozen tables in
+# lextab.py and parsetab.py, skipping PLY's reflection over this module, grammar
+# validation and signature checks. set BREWIN_BUILD_TABLES after changing any token or
+# grammar rule to build everything from scratch and rewrite both table files
+BUILD_TABLES = bool(os.environ.get("BREWIN_BUILD_TABLES"))
+TABLES_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def build_lexer():
+    if not BUILD_TABLES:
+        try:
+            frozen = lex.Lexer()
+            frozen.lexoptimize = True
+            frozen.readtab("lextab", globals())
+            return frozen
+        except ImportError:
+            pass
+
+    built = lex.lex()
+    built.writetab("lextab", TABLES_DIR)
+    return built
+
+
 # Build the lexer
-lexer = lex.lex()
+lexer = build_lexer()
@@ -1,3 +1,5 @@
+import copy
+
 from element import Element
 from brewlex import *
 from intbase import InterpreterBase
@@ -37,7 +39,7 @@ def p_structs(p):
 
 def p_struct(p):
    "struct : STRUCT NAME LBRACE fields RBRACE"
-   p[0] = Element(InterpreterBase.STRUCT_NODE, name=p[2], fields=p[4])
+   p[0] = Element(InterpreterBase.STRUCT_NODE, name=p[2], fields=p[4], line=p.lineno(1))
 
 def p_fields(p):
    """fields : fields field
@@ -46,7 +48,7 @@ def p_fields(p):
 
 def p_field(p):
   "field : NAME COLON NAME SEMI"  # field_name: type
-  p[0] = Element(InterpreterBase.FIELD_DEF_NODE, name=p[1], var_type=p[3])
+  p[0] = Element(InterpreterBase.FIELD_DEF_NODE, name=p[1], var_type=p[3], line=p.lineno(1))
 
 def p_funcs(p):
     """funcs : funcs func
@@ -58,17 +60,17 @@ def p_func(p):
     """func : FUNC NAME LPAREN formal_args RPAREN COLON NAME LBRACE statements RBRACE
     | FUNC NAME LPAREN RPAREN COLON NAME LBRACE statements RBRACE"""
     if len(p) == 11:  # handle with 1+ formal args
-        p[0] = Element(InterpreterBase.FUNC_NODE, name=p[2], args=p[4], return_type = p[7], statements=p[9])
+        p[0] = Element(InterpreterBase.FUNC_NODE, name=p[2], args=p[4], return_type = p[7], statements=p[9], line=p.lineno(1))
     else:  # handle no formal args
-        p[0] = Element(InterpreterBase.FUNC_NODE, name=p[2], args=[], return_type = p[6], statements=p[8])
+        p[0] = Element(InterpreterBase.FUNC_NODE, name=p[2], args=[], return_type = p[6], statements=p[8], line=p.lineno(1))
 
 def p_func2(p):
     """func : FUNC NAME LPAREN formal_args RPAREN LBRACE statements RBRACE
     | FUNC NAME LPAREN RPAREN LBRACE statements RBRACE"""
     if len(p) == 9:  # handle with 1+ formal args
-        p[0] = Element(InterpreterBase.FUNC_NODE, name=p[2], args=p[4], return_type = None, statements=p[7])
+        p[0] = Element(InterpreterBase.FUNC_NODE, name=p[2], args=p[4], return_type = None, statements=p[7], line=p.lineno(1))
     else:  # handle no formal args
-        p[0] = Element(InterpreterBase.FUNC_NODE, name=p[2], args=[], return_type = None, statements=p[6])
+        p[0] = Element(InterpreterBase.FUNC_NODE, name=p[2], args=[], return_type = None, statements=p[6], line=p.lineno(1))
 
 def p_formal_args(p):
     """formal_args : formal_args COMMA formal_arg
@@ -80,9 +82,9 @@ def p_formal_arg(p):
     """formal_arg : NAME COLON NAME
     | NAME"""
     if len(p) == 2:
-      p[0] = Element(InterpreterBase.ARG_NODE, name=p[1], var_type = None)
+      p[0] = Element(InterpreterBase.ARG_NODE, name=p[1], var_type = None, line=p.lineno(1))
     else:
-      p[0] = Element(InterpreterBase.ARG_NODE, name=p[1], var_type = p[3])
+      p[0] = Element(InterpreterBase.ARG_NODE, name=p[1], var_type = p[3], line=p.lineno(1))
 
 def p_statements(p):
     """statements : statements statement
@@ -96,15 +98,15 @@ def p_statement___assign(p):
 
 def p_assign(p):
     "assign : variable_w_dot ASSIGN expression"
-    p[0] = Element("=", name=p[1], expression=p[3])
+    p[0] = Element("=", name=p[1], expression=p[3], line=p.lineno(2))
 
 def p_statement___var(p):
     """statement : VAR variable COLON NAME SEMI
     | VAR variable SEMI"""
     if len(p) == 6:
-      p[0] = Element(InterpreterBase.VAR_DEF_NODE, name=p[2], var_type=p[4])
+      p[0] = Element(InterpreterBase.VAR_DEF_NODE, name=p[2], var_type=p[4], line=p.lineno(1))
     else:
-      p[0] = Element(InterpreterBase.VAR_DEF_NODE, name=p[2], var_type=None)
+      p[0] = Element(InterpreterBase.VAR_DEF_NODE, name=p[2], var_type=None, line=p.lineno(1))
 
 def p_variable(p):
     "variable : NAME"
@@ -117,6 +119,8 @@ def p_variable_w_dot(p):
         p[0] = p[1] + "." + p[3]
     else:
         p[0] = p[1]
+    # names are plain strings, so their line is kept on the grammar symbol instead
+    p.set_lineno(0, p.lineno(1))
 
 def p_statement_if(p):
     """statement : IF LPAREN expression RPAREN LBRACE statements RBRACE
@@ -128,6 +132,7 @@ def p_statement_if(p):
             condition=p[3],
             statements=p[6],
             else_statements=None,
+            line=p.lineno(1),
         )
     else:
         p[0] = Element(
@@ -135,11 +140,12 @@ def p_statement_if(p):
             condition=p[3],
             statements=p[6],
             else_statements=p[10],
+            line=p.lineno(1),
         )
 
 def p_statement_try(p):
     """statement : TRY LBRACE statements RBRACE catchers"""
-    p[0] = Element(InterpreterBase.TRY_NODE, statements=p[3], catchers=p[5])
+    p[0] = Element(InterpreterBase.TRY_NODE, statements=p[3], catchers=p[5], line=p.lineno(1))
 
 def p_catches(p):
     """catchers : catchers catch
@@ -148,15 +154,15 @@ def p_catches(p):
 
 def p_catch(p):
     "catch : CATCH STRING LBRACE statements RBRACE"
-    p[0] = Element(InterpreterBase.CATCH_NODE, exception_type=p[2], statements=p[4])
+    p[0] = Element(InterpreterBase.CATCH_NODE, exception_type=p[2], statements=p[4], line=p.lineno(1))
 
 def p_statement_for(p):
     "statement : FOR LPAREN assign SEMI expression SEMI assign RPAREN LBRACE statements RBRACE"
-    p[0] = Element(InterpreterBase.FOR_NODE, init=p[3], condition=p[5], update=p[7], statements=p[10])
+    p[0] = Element(InterpreterBase.FOR_NODE, init=p[3], condition=p[5], update=p[7], statements=p[10], line=p.lineno(1))
 
 def p_statement_raise(p):
     "statement : RAISE expression SEMI"
-    p[0] = Element(InterpreterBase.RAISE_NODE, exception_type=p[2])
+    p[0] = Element(InterpreterBase.RAISE_NODE, exception_type=p[2], line=p.lineno(1))
 
 def p_statement_expr(p):
     "statement : expression SEMI"
@@ -170,21 +176,21 @@ def p_statement_return(p):
         expr = p[2]
     else:
         expr = None
-    p[0] = Element(InterpreterBase.RETURN_NODE, expression=expr)
+    p[0] = Element(InterpreterBase.RETURN_NODE, expression=expr, line=p.lineno(1))
 
 
 def p_expression_not(p):
     "expression : NOT expression"
-    p[0] = Element(InterpreterBase.NOT_NODE, op1=p[2])
+    p[0] = Element(InterpreterBase.NOT_NODE, op1=p[2], line=p.lineno(1))
 
 
 def p_expression_uminus(p):
     "expression : MINUS expression %prec UMINUS"
-    p[0] = Element(InterpreterBase.NEG_NODE, op1=p[2])
+    p[0] = Element(InterpreterBase.NEG_NODE, op1=p[2], line=p.lineno(1))
 
 def p_expression_new(p):
     "expression : NEW NAME"
-    p[0] = Element(InterpreterBase.NEW_NODE, var_type=p[2])
+    p[0] = Element(InterpreterBase.NEW_NODE, var_type=p[2], line=p.lineno(1))
 
 
 def p_arith_expression_binop(p):
@@ -198,7 +204,7 @@ def p_arith_expression_binop(p):
     | expression MINUS expression
     | expression MULTIPLY expression
     | expression DIVIDE expression"""
-    p[0] = Element(p[2], op1=p[1], op2=p[3])
+    p[0] = Element(p[2], op1=p[1], op2=p[3], line=p.lineno(2))
 
 
 def p_expression_group(p):
@@ -209,43 +215,43 @@ def p_expression_group(p):
 def p_expression_and_or(p):
     """expression : expression OR expression
     | expression AND expression"""
-    p[0] = Element(p[2], op1=p[1], op2=p[3])
+    p[0] = Element(p[2], op1=p[1], op2=p[3], line=p.lineno(2))
 
 
 def p_expression_number(p):
     "expression : NUMBER"
-    p[0] = Element(InterpreterBase.INT_NODE, val=p[1])
+    p[0] = Element(InterpreterBase.INT_NODE, val=p[1], line=p.lineno(1))
 
 
 def p_expression_bool(p):
     """expression : TRUE
     | FALSE"""
     bool_val = p[1] == InterpreterBase.TRUE_DEF
-    p[0] = Element(InterpreterBase.BOOL_NODE, val=bool_val)
+    p[0] = Element(InterpreterBase.BOOL_NODE, val=bool_val, line=p.lineno(1))
 
 
 def p_expression_nil(p):
     "expression : NIL"
-    p[0] = Element(InterpreterBase.NIL_NODE)
+    p[0] = Element(InterpreterBase.NIL_NODE, line=p.lineno(1))
 
 
 def p_expression_string(p):
     "expression : STRING"
-    p[0] = Element(InterpreterBase.STRING_NODE, val=p[1])
+    p[0] = Element(InterpreterBase.STRING_NODE, val=p[1], line=p.lineno(1))
 
 
 def p_expression_variable(p):
     "expression : variable_w_dot"
-    p[0] = Element(InterpreterBase.VAR_NODE, name=p[1])
+    p[0] = Element(InterpreterBase.VAR_NODE, name=p[1], line=p.lineno(1))
 
 
 def p_func_call(p):
     """expression : NAME LPAREN args RPAREN
     | NAME LPAREN RPAREN"""
     if len(p) == 5:
-        p[0] = Element(InterpreterBase.FCALL_NODE, name=p[1], args=p[3])
+        p[0] = Element(InterpreterBase.FCALL_NODE, name=p[1], args=p[3], line=p.lineno(1))
     else:
-        p[0] = Element(InterpreterBase.FCALL_NODE, name=p[1], args=[])
+        p[0] = Element(InterpreterBase.FCALL_NODE, name=p[1], args=[], line=p.lineno(1))
 
 
 def p_expression_args(p):
@@ -261,14 +267,47 @@ def p_error(p):
         print("Syntax error at EOF")
 
 
+# a parser that owns its own lexer and LR parser state, so different Parser objects can
+# parse at the same time from different threads. the lexing and parsing tables are
+# read-only and shared by every instance. PLY can recover from some syntax errors and
+# still return an AST, so syntax_errors counts the errors reported by the last parse
+class Parser:
+    def __init__(self):
+        self.lexer = lexer.clone()
+        self.parser = copy.copy(lr_parser)
+        self.parser.errorfunc = self.error
+        self.syntax_errors = 0
+
+    def parse(self, program):
+        self.lexer.lineno = 1
+        self.syntax_errors = 0
+        ast = self.parser.parse(program, lexer=self.lexer)
+        if ast is None:
+            raise SyntaxError("Syntax error")
+        return ast
+
+    def error(self, p):
+        self.syntax_errors += 1
+        return p_error(p)
+
+
 # exported function
 def parse_program(program):
-    reset_lineno()
-    ast = yacc.parse(program)
-    if ast is None:
-        raise SyntaxError("Syntax error")
-    return ast
+    return Parser().parse(program)
+
+
+def build_parser():
+    if not BUILD_TABLES:
+        try:
+            tables = yacc.LRTable()
+            tables.read_table("parsetab")
+            tables.bind_callables(globals())
+            return yacc.LRParser(tables, p_error)
+        except (ImportError, yacc.VersionError):
+            pass
+
+    return yacc.yacc(outputdir=TABLES_DIR) # yacc.yacc(debug=True, debuglog=open("parse.log", "w"))
 
 
 # generate our parser
-yacc.yacc() # yacc.yacc(debug=True, debuglog=open("parse.log", "w"))
+lr_parser = build_parser()
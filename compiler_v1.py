@@ -0,0 +1,175 @@
+# the Compiler class turns main's AST into a tree of closures before running it, so each
+# statement and expression is dispatched on elem_type once instead of every time it runs.
+# the closures mirror the tree walker in interpreterv1.py step for step
+
+from intbase import ErrorType
+
+
+class Compiler:
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.variables = interpreter.variables
+
+        # when profiling, compiled statements count themselves and compiled functions
+        # time themselves (see profiler.py)
+        profiler = interpreter.profiler
+        if profiler:
+            self.compile_statement = profiler.counting_compiler(self.compile_statement)
+            self.compile_function = profiler.timing_compiler(self.compile_function)
+
+    def compile_function(self, func_node):
+        statements = [
+            self.compile_statement(statement_node)
+            for statement_node in func_node.statements
+        ]
+
+        def run_function():
+            for statement in statements:
+                statement()
+
+        return run_function
+
+    def compile_statement(self, statement_node):
+        interpreter = self.interpreter
+        variables = self.variables
+
+        # variable definition
+        if statement_node.elem_type == "vardef":
+            name = statement_node.name
+
+            def vardef():
+                if name in variables:
+                    interpreter.error(
+                        ErrorType.NAME_ERROR,
+                        f"Variable {name} defined more than once",
+                    )
+                variables[name] = 0
+
+            return vardef
+        elif statement_node.elem_type == "=":
+            name = statement_node.name
+            expression = self.compile_expression(statement_node.expression)
+
+            def assign():
+                if name not in variables:
+                    interpreter.error(
+                        ErrorType.NAME_ERROR,
+                        f"Undefined variable {name}",
+                    )
+                variables[name] = expression()
+
+            return assign
+        # function call
+        elif statement_node.elem_type == "fcall":
+            return self.compile_function_call(statement_node)
+        return lambda: None
+
+    def compile_expression(self, expression_node):
+        # value node
+        if expression_node.elem_type == "int" or expression_node.elem_type == "string":
+            val = expression_node.val
+            return lambda: val
+        # variable node
+        elif expression_node.elem_type == "var":
+            return self.compile_variable(expression_node)
+        # binary operation
+        elif expression_node.elem_type == "+":
+            check = self.compile_check_operation(expression_node)
+            op1 = self.compile_expression(expression_node.op1)
+            op2 = self.compile_expression(expression_node.op2)
+
+            def add():
+                check()
+                return op1() + op2()
+
+            return add
+        elif expression_node.elem_type == "-":
+            check = self.compile_check_operation(expression_node)
+            op1 = self.compile_expression(expression_node.op1)
+            op2 = self.compile_expression(expression_node.op2)
+
+            def subtract():
+                check()
+                return op1() - op2()
+
+            return subtract
+        # function call
+        elif expression_node.elem_type == "fcall":
+            return self.compile_function_call(expression_node)
+        return lambda: None
+
+    # mirrors Interpreter.evaluate_value: only values and variables are looked at
+    def compile_value(self, expression_node):
+        if expression_node.elem_type == "int" or expression_node.elem_type == "string":
+            val = expression_node.val
+            return lambda: val
+        elif expression_node.elem_type == "var":
+            return self.compile_variable(expression_node)
+        return lambda: None
+
+    def compile_variable(self, expression_node):
+        interpreter = self.interpreter
+        variables = self.variables
+        var_name = expression_node.name
+
+        def variable():
+            if var_name not in variables:
+                interpreter.error(
+                    ErrorType.NAME_ERROR,
+                    f"Variable {var_name} has not been defined",
+                )
+            return variables[var_name]
+
+        return variable
+
+    # mirrors Interpreter.check_operation, including the order operands are looked up in
+    def compile_check_operation(self, expression_node):
+        interpreter = self.interpreter
+        op1 = self.compile_value(expression_node.op1)
+        op2 = self.compile_value(expression_node.op2)
+
+        def check_operation():
+            if (isinstance(op1(), int) and isinstance(op2(), str)) or (
+                isinstance(op1(), str) and isinstance(op2(), int)
+            ):
+                interpreter.error(
+                    ErrorType.TYPE_ERROR,
+                    "Incompatible types for arithmetic operation",
+                )
+
+        return check_operation
+
+    def compile_function_call(self, function_call):
+        interpreter = self.interpreter
+        func_name = function_call.name
+        arg_nodes = function_call.args
+
+        if func_name == "print":
+            args = [self.compile_expression(arg) for arg in arg_nodes]
+
+            def print_call():
+                interpreter.output("".join([str(arg()) for arg in args]))
+
+            return print_call
+        elif func_name == "inputi":
+
+            def inputi_call():
+                if len(arg_nodes) > 1:
+                    interpreter.error(
+                        ErrorType.NAME_ERROR,
+                        "No inputi() function found that takes > 1 parameter",
+                    )
+                elif len(arg_nodes) == 1:
+                    interpreter.output(arg_nodes[0].val)
+
+                return int(interpreter.get_input())
+
+            return inputi_call
+
+        def undefined_call():
+            interpreter.error(
+                ErrorType.NAME_ERROR,
+                f"Function {func_name} has not been defined",
+            )
+
+        return undefined_call
@@ -0,0 +1,354 @@
+# the Compiler class turns each function's AST into a tree of closures the first time the
+# function is called. every closure has its child closures, names and operator methods
+# bound ahead of time, so running a loop body no longer re-dispatches on elem_type or
+# looks anything up on the nodes. the closures call back into the interpreter for
+# the actual semantics, so both execution modes behave identically
+
+from intbase import ErrorType, TailCall
+from memo import memo_key
+from type_valuev2 import Type, Value, NIL, int_value, create_value, format_line
+
+
+class Compiler:
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.variables = interpreter.variables
+        self.functions = {}  # function node : compiled function
+        self.bodies = {}  # function node : its compiled statements, for tail calls
+
+        # when profiling, compiled statements count themselves and compiled functions
+        # time themselves (see profiler.py)
+        profiler = interpreter.profiler
+        if profiler:
+            self.compile_statement = profiler.counting_compiler(self.compile_statement)
+            self.compile_function = profiler.timing_compiler(self.compile_function)
+
+    # returns the compiled version of a function node, compiling it on first use
+    def function(self, func_node):
+        compiled = self.functions.get(func_node)
+        if compiled is None:
+            compiled = self.compile_function(func_node)
+            self.functions[func_node] = compiled
+        return compiled
+
+    # returns the compiled statements of a function node, compiling it on first use
+    def body(self, func_node):
+        body = self.bodies.get(func_node)
+        if body is None:
+            self.function(func_node)
+            body = self.bodies[func_node]
+        return body
+
+    def compile_function(self, func_node):
+        variables = self.variables
+        body = self.compile_statements(func_node.statements)
+        self.bodies[func_node] = body
+        governor = self.interpreter.governor
+        profiler = self.interpreter.profiler
+        # results of the function, if it's pure and memoized
+        memo = None
+        if func_node in self.interpreter.pure_functions:
+            memo = self.interpreter.memo
+
+        def run_function(args):
+            # a pure function called with the same args as before gives the same result
+            key = None
+            if memo:
+                key = memo_key(func_node, args)
+                if key is not None:
+                    res = memo.get(key)
+                    if res is not None:
+                        return res
+
+            # each pass runs one function; a tail call replaces it with the callee
+            function = func_node
+            run_body = body
+            frames = 0  # tail called functions entered in the profiler
+            if governor:
+                governor.enter(func_node)
+            while True:
+                variables.push_scope("function", function.layout)
+                arg_nodes = function.args
+
+                # instantiate args with the right values
+                for i in range(len(arg_nodes)):
+                    variables.create(arg_nodes[i].name, args[i])
+
+                res = run_body()
+                variables.pop_scope()
+                if type(res) is not TailCall:
+                    break
+                function, args = res.function, res.args
+                run_body = self.body(function)
+                # the callee takes the place of the function that called it
+                if governor:
+                    governor.charge(function)
+                if profiler:
+                    profiler.enter(function)
+                    frames += 1
+
+            # otherwise return NIL
+            res = res if res else NIL
+            for _ in range(frames):
+                profiler.exit()
+            if governor:
+                governor.exit()
+            if key is not None:
+                memo.put(key, res)
+            return res
+
+        return run_function
+
+    def compile_statements(self, statement_nodes):
+        statements = [self.compile_statement(node) for node in statement_nodes]
+
+        def run_statements():
+            for statement in statements:
+                res = statement()
+                # if statement is a return, return that value
+                if res:
+                    return res
+            return None
+
+        return run_statements
+
+    def compile_statement(self, statement_node):
+        interpreter = self.interpreter
+        variables = self.variables
+
+        match statement_node.elem_type:
+            # variable definition
+            case "vardef":
+                name = statement_node.name
+                address = statement_node.address
+
+                def vardef():
+                    if not variables.create(name, NIL, address):
+                        interpreter.error(
+                            ErrorType.NAME_ERROR,
+                            f"Vardef: Variable {name} defined more than once",
+                        )
+
+                return vardef
+            # assignment
+            case "=":
+                name = statement_node.name
+                address = statement_node.address
+                expression = self.compile_expression(statement_node.expression)
+
+                def assign():
+                    if not variables.set(name, expression(), address):
+                        interpreter.error(
+                            ErrorType.NAME_ERROR,
+                            f"Equal: Variable {name} has not been defined",
+                        )
+
+                return assign
+            # function call
+            case "fcall":
+                call = self.compile_function_call(statement_node)
+
+                def call_statement():
+                    call()
+
+                return call_statement
+            # if statement
+            case "if":
+                layout = statement_node.layout
+                condition = self.compile_expression(statement_node.condition)
+                statements = self.compile_statements(statement_node.statements)
+                else_statements = None
+                if statement_node.else_statements:
+                    else_statements = self.compile_statements(
+                        statement_node.else_statements
+                    )
+
+                def if_statement():
+                    variables.push_scope("if", layout)
+
+                    # test if statement
+                    cond = condition()
+                    if cond.type() != Type.BOOL:
+                        interpreter.error(
+                            ErrorType.TYPE_ERROR,
+                            "Invalid if condition",
+                        )
+
+                    res = None
+                    if cond.value():
+                        res = statements()
+                    # if if statement fails, test else statement
+                    elif else_statements:
+                        res = else_statements()
+
+                    variables.pop_scope()
+                    return res
+
+                return if_statement
+            # for loop
+            case "for":
+                layout = statement_node.layout
+                init = self.compile_statement(statement_node.init)
+                condition = self.compile_expression(statement_node.condition)
+                update = self.compile_statement(statement_node.update)
+                statements = self.compile_statements(statement_node.statements)
+                governor = interpreter.governor
+
+                def for_statement():
+                    init()
+
+                    # condition must be true
+                    cond = condition()
+                    if cond.type() != Type.BOOL:
+                        interpreter.error(
+                            ErrorType.TYPE_ERROR,
+                            "Invalid for condition",
+                        )
+
+                    while cond.value():
+                        if governor:
+                            governor.charge(statement_node)
+                        variables.push_scope("for", layout)
+                        res = statements()
+                        variables.pop_scope()
+                        if res:
+                            return res
+
+                        update()
+                        cond = condition()
+                    return None
+
+                return for_statement
+            # return
+            case "return":
+                expression = statement_node.expression
+                if not expression:
+                    return lambda: NIL
+                if (
+                    expression.elem_type == "fcall"
+                    and expression.name not in interpreter.builtin_functions
+                ):
+                    return self.compile_tail_call(expression)
+                return self.compile_expression(expression)
+
+        # any other statement is a no-op, just like in the tree walker
+        return lambda: None
+
+    def compile_expression(self, expression_node):
+        interpreter = self.interpreter
+        variables = self.variables
+        elem_type = expression_node.elem_type
+
+        # binary operations
+        if elem_type in interpreter.binary_operators:
+            operation = interpreter.operations[elem_type]
+            op1 = self.compile_expression(expression_node.op1)
+            op2 = self.compile_expression(expression_node.op2)
+            return lambda: operation(interpreter, op1(), op2())
+
+        match elem_type:
+            # value node
+            case "int" | "string" | "bool":
+                value = create_value(expression_node.val)
+                return lambda: value
+            case "nil":
+                return lambda: NIL
+            # variable node
+            case "var":
+                name = expression_node.name
+                address = expression_node.address
+
+                def var():
+                    result = variables.get(name, address)
+                    if result is None:
+                        interpreter.error(
+                            ErrorType.NAME_ERROR,
+                            f"EE Var: Variable {name} has not been defined",
+                        )
+                    return result
+
+                return var
+            # unary operations
+            case "neg":
+                negate = interpreter.negate
+                op1 = self.compile_expression(expression_node.op1)
+                return lambda: negate(op1())
+            case "!":
+                logical_not = interpreter.logical_not
+                op1 = self.compile_expression(expression_node.op1)
+                return lambda: logical_not(op1())
+            # function call
+            case "fcall":
+                return self.compile_function_call(expression_node)
+
+        return lambda: None
+
+    def compile_function_call(self, function_call):
+        interpreter = self.interpreter
+        name = function_call.name
+        arg_nodes = function_call.args
+        args = [self.compile_expression(arg) for arg in arg_nodes]
+
+        match name:
+            case "print":
+
+                def print_call():
+                    interpreter.output(format_line([arg() for arg in args]))
+                    return NIL
+
+                return print_call
+            case "inputi" | "inputs":
+
+                def input_call():
+                    if len(arg_nodes) > 1:
+                        interpreter.error(
+                            ErrorType.NAME_ERROR,
+                            f"No {name}() function found that takes > 1 parameter",
+                        )
+                    elif len(arg_nodes) == 1:
+                        interpreter.output(arg_nodes[0].val)
+
+                    if name == "inputi":
+                        return int_value(int(interpreter.get_input()))
+                    return Value(Type.STRING, interpreter.get_input())
+
+                return input_call
+
+        # the call site looks its function up the first time it runs and caches it
+        target = None
+
+        def user_call():
+            nonlocal target
+            if target is None:
+                target = self.function(interpreter.find_function(name, len(arg_nodes)))
+            return target([arg() for arg in args])
+
+        return user_call
+
+    # compiles a call whose result is returned straight away. if the running function's
+    # scopes can't be seen by the callee, the call returns a TailCall so run_function
+    # can drop them and run the callee in their place
+    def compile_tail_call(self, function_call):
+        interpreter = self.interpreter
+        variables = self.variables
+        name = function_call.name
+        arg_count = len(function_call.args)
+        args = [self.compile_expression(arg) for arg in function_call.args]
+
+        # the callee and its arg names are looked up the first time the call runs
+        target = None
+        arg_names = None
+
+        def tail_call():
+            nonlocal target, arg_names
+            if target is None:
+                target = interpreter.find_function(name, arg_count)
+                arg_names = [arg.name for arg in target.args]
+            values = [arg() for arg in args]
+
+            if variables.can_drop_function(arg_names):
+                return TailCall(target, values)
+            res = self.function(target)(values)
+            return res if res else NIL
+
+        return tail_call
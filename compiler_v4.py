@@ -0,0 +1,422 @@
+# the Compiler class turns each function's AST into a tree of closures the first time the
+# function is called. every closure has its child closures, names and operator methods
+# bound ahead of time, so running a loop body no longer re-dispatches on elem_type or
+# looks anything up on the nodes. the closures follow the tree walker's protocol and
+# push/pop scopes in exactly the same order
+#
+# statement closures take no arguments and return None, or the value being returned if
+# the statement returned from the function. expression closures take the environment
+# they're evaluated in, just like evaluate_expression, and return their value. a raise
+# is a BrewinException, caught only by try closures.
+# a LazyValue holds the node of its expression in both modes, and is forced by the
+# interpreter's evaluate_lazy, which calls user functions through their compiled call
+# sites
+
+from intbase import ErrorType
+from type_valuev4 import (
+    Type,
+    Value,
+    LazyValue,
+    BrewinException,
+    NIL,
+    bool_value,
+    int_value,
+    create_value,
+    format_line,
+)
+
+
+class Compiler:
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.variables = interpreter.variables
+        self.functions = {}  # function node : compiled function
+        self.calls = {}  # fcall node of a user function : compiled call
+
+        # when profiling, compiled statements count themselves and compiled functions
+        # time themselves (see profiler.py)
+        profiler = interpreter.profiler
+        if profiler:
+            self.compile_statement = profiler.counting_compiler(self.compile_statement)
+            self.compile_function = profiler.timing_compiler(self.compile_function)
+
+    # returns the compiled version of a function node, compiling it on first use
+    def function(self, func_node):
+        compiled = self.functions.get(func_node)
+        if compiled is None:
+            compiled = self.compile_function(func_node)
+            self.functions[func_node] = compiled
+        return compiled
+
+    def compile_function(self, func_node):
+        variables = self.variables
+        layout = func_node.layout
+        arg_names = [arg.name for arg in func_node.args]
+        statements = self.compile_statement_list(func_node.statements)
+        delay = self.interpreter.delay
+        governor = self.interpreter.governor
+
+        def run_function(args, env):
+            if governor:
+                governor.enter(func_node)
+            variables.push_scope("function", layout)
+
+            # instantiate args with the right values
+            for i in range(len(arg_names)):
+                variables.create(arg_names[i], delay(args[i], env))
+
+            for statement in statements:
+                res = statement()
+                # if statement is a return, return that value
+                if res is not None:
+                    variables.pop_scope()
+                    if governor:
+                        governor.exit()
+                    return res
+
+            # otherwise return NIL
+            variables.pop_scope()
+            if governor:
+                governor.exit()
+            return NIL
+
+        return run_function
+
+    def compile_statement_list(self, statement_nodes):
+        return [self.compile_statement(node) for node in statement_nodes]
+
+    # runs the statements of a for or catch node inside a scope of the given type,
+    # stopping at the first return
+    def compile_block(self, scope_type, block_node):
+        variables = self.variables
+        layout = block_node.layout
+        statements = self.compile_statement_list(block_node.statements)
+
+        def run_block():
+            variables.push_scope(scope_type, layout)
+            for statement in statements:
+                res = statement()
+                if res is not None:
+                    variables.pop_scope()
+                    return res
+            variables.pop_scope()
+            return None
+
+        return run_block
+
+    def compile_statement(self, statement_node):
+        interpreter = self.interpreter
+        variables = self.variables
+
+        match statement_node.elem_type:
+            # variable definition
+            case "vardef":
+                name = statement_node.name
+                address = statement_node.address
+
+                def vardef():
+                    if not variables.create(name, NIL, address):
+                        interpreter.error(
+                            ErrorType.NAME_ERROR,
+                            f"Vardef: Variable {name} defined more than once",
+                        )
+
+                return vardef
+            # assignment
+            case "=":
+                name = statement_node.name
+                address = statement_node.address
+                expression = statement_node.expression
+                delay = interpreter.delay
+
+                def assign():
+                    value = delay(expression, variables, True)
+                    if not variables.set(name, value, address):
+                        interpreter.error(
+                            ErrorType.NAME_ERROR,
+                            f"Equal: Variable {name} has not been defined",
+                        )
+
+                return assign
+            # function call, ignoring what it returns
+            case "fcall":
+                call = self.compile_function_call(statement_node)
+
+                def fcall():
+                    call(variables)
+
+                return fcall
+            # if statement
+            case "if":
+                layout = statement_node.layout
+                condition = self.compile_expression(statement_node.condition)
+                statements = self.compile_statement_list(
+                    statement_node.statements
+                )
+                else_statements = self.compile_statement_list(
+                    statement_node.else_statements or []
+                )
+                force = self.force
+
+                def if_statement():
+                    variables.push_scope("if", layout)
+
+                    # test if statement
+                    cond = force(condition(variables))
+                    if cond.type() != Type.BOOL:
+                        interpreter.error(
+                            ErrorType.TYPE_ERROR,
+                            "Invalid if condition",
+                        )
+
+                    # if if statement fails, test else statement
+                    for statement in statements if cond.value() else else_statements:
+                        res = statement()
+                        if res is not None:
+                            variables.pop_scope()
+                            return res
+
+                    variables.pop_scope()
+                    return None
+
+                return if_statement
+            # for loop
+            case "for":
+                init = self.compile_statement(statement_node.init)
+                condition = self.compile_expression(statement_node.condition)
+                update = self.compile_statement(statement_node.update)
+                body = self.compile_block("for", statement_node)
+                force = self.force
+                governor = interpreter.governor
+
+                def for_statement():
+                    init()
+
+                    # condition must be true
+                    cond = force(condition(variables))
+                    if cond.type() != Type.BOOL:
+                        interpreter.error(
+                            ErrorType.TYPE_ERROR,
+                            "Invalid for condition",
+                        )
+
+                    while cond.value():
+                        if governor:
+                            governor.charge(statement_node)
+                        res = body()
+                        if res is not None:
+                            return res
+
+                        update()
+                        cond = force(condition(variables))
+                    return None
+
+                return for_statement
+            # return
+            case "return":
+                if statement_node.expression is None:
+                    return lambda: NIL
+
+                expression = statement_node.expression
+                delay = interpreter.delay
+                return lambda: delay(expression, variables, True)
+            # try
+            case "try":
+                layout = statement_node.layout
+                statements = self.compile_statement_list(
+                    statement_node.statements
+                )
+                # exception type : compiled catch block; the first catch for a type wins
+                catch_table = {}
+                for catch in statement_node.catchers:
+                    if catch.exception_type not in catch_table:
+                        catch_table[catch.exception_type] = self.compile_block(
+                            "catch", catch
+                        )
+                governor = interpreter.governor
+
+                def try_statement():
+                    depth = variables.depth()
+                    call_depth = governor.depth if governor else 0
+                    variables.push_scope("try", layout)
+
+                    try:
+                        for statement in statements:
+                            res = statement()
+                            if res is not None:
+                                variables.pop_scope()
+                                return res
+                    except BrewinException as exception:
+                        # drop the try's scope and every scope entered since
+                        variables.unwind(depth)
+                        if governor:
+                            governor.unwind(call_depth)
+                        catch_block = catch_table.get(exception.value.value())
+                        # no match
+                        if catch_block is None:
+                            raise
+                    else:
+                        # try block finishes normally
+                        variables.pop_scope()
+                        return None
+
+                    # matching raise / catch
+                    # execute catch block
+                    return catch_block()
+
+                return try_statement
+            # raise
+            case "raise":
+                expression = self.compile_expression(
+                    statement_node.exception_type
+                )
+                force = self.force
+
+                def raise_statement():
+                    value = force(expression(variables))
+                    if value.type() != Type.STRING:
+                        interpreter.error(
+                            ErrorType.TYPE_ERROR,
+                            "Raise type not a string",
+                        )
+
+                    # raise what we're raising
+                    raise BrewinException(value)
+
+                return raise_statement
+
+        return lambda: None
+
+    def compile_expression(self, expression_node):
+        interpreter = self.interpreter
+        elem_type = expression_node.elem_type
+        force = self.force
+
+        # binary operations
+        if elem_type in interpreter.binary_operators:
+            op1 = self.compile_expression(expression_node.op1)
+            op2 = self.compile_expression(expression_node.op2)
+
+            if elem_type == "&&" or elem_type == "||":
+                # && stops at the first false, || at the first true
+                stop = elem_type == "||"
+                op1_error = f"Incompatible types for comparison {elem_type}"
+
+                def short_circuit(env):
+                    left = force(op1(env))
+                    if left.type() != Type.BOOL:
+                        interpreter.error(ErrorType.TYPE_ERROR, op1_error)
+                    if bool(left.value()) is stop:
+                        return bool_value(stop)
+
+                    right = force(op2(env))
+                    if right.type() != Type.BOOL:
+                        interpreter.error(
+                            ErrorType.TYPE_ERROR,
+                            "Incompatible types for comparison &&",
+                        )
+                    return bool_value(right.value())
+
+                return short_circuit
+
+            operation = interpreter.operations[elem_type]
+
+            def binary(env):
+                left = force(op1(env))
+                return operation(interpreter, left, force(op2(env)))
+
+            return binary
+
+        match elem_type:
+            # value node
+            case "int" | "string" | "bool":
+                value = create_value(expression_node.val)
+                return lambda env: value
+            case "nil":
+                return lambda env: NIL
+            # variable node
+            case "var":
+                name = expression_node.name
+                address = expression_node.address
+
+                def var(env):
+                    result = env.get(name, address)
+                    if result is None:
+                        interpreter.error(
+                            ErrorType.NAME_ERROR,
+                            f"EE Var: Variable {name} has not been defined",
+                        )
+                    return result
+
+                return var
+            # unary operations
+            case "neg" | "!":
+                operation = (
+                    interpreter.negate if elem_type == "neg" else interpreter.logical_not
+                )
+                op1 = self.compile_expression(expression_node.op1)
+                return lambda env: operation(force(op1(env)))
+            # function call
+            case "fcall":
+                return self.compile_function_call(expression_node)
+
+        return lambda env: None
+
+    def compile_function_call(self, function_call):
+        interpreter = self.interpreter
+        name = function_call.name
+        arg_nodes = function_call.args
+        args = [self.compile_expression(arg) for arg in arg_nodes]
+        force = self.force
+
+        match name:
+            case "print":
+
+                def print_call(env):
+                    interpreter.output(format_line([force(arg(env)) for arg in args]))
+                    return NIL
+
+                return print_call
+            case "inputi" | "inputs":
+
+                def input_call(env):
+                    if len(args) > 1:
+                        interpreter.error(
+                            ErrorType.NAME_ERROR,
+                            f"No {name}() function found that takes > 1 parameter",
+                        )
+                    elif len(args) == 1:
+                        interpreter.output(force(args[0](env)).value())
+
+                    if name == "inputi":
+                        return int_value(int(interpreter.get_input()))
+                    return Value(Type.STRING, interpreter.get_input())
+
+                return input_call
+
+        # the call site looks its function up the first time it runs and caches it
+        target = None
+
+        def user_call(env):
+            nonlocal target
+            if target is None:
+                target = self.function(interpreter.find_function(name, len(arg_nodes)))
+            return target(arg_nodes, env.copy())
+
+        self.calls[function_call] = user_call
+        return user_call
+
+    # takes the value of an expression closure and forces it if it's a LazyValue, like
+    # evaluate_expression_and_lazy
+    def force(self, output):
+        if isinstance(output, LazyValue):
+            return self.interpreter.evaluate_lazy(output, self.call_function)
+        return output
+
+    # runs a call to a user function for the interpreter's evaluate_lazy, through the
+    # closure compiled for its call site
+    def call_function(self, function_call, env):
+        call = self.calls.get(function_call)
+        if call is None:
+            call = self.compile_function_call(function_call)
+        return call(env)
@@ -1,14 +1,45 @@
+from intbase import InterpreterBase
+
+# every kind of AST node has its own class with __slots__ for its attributes, so nodes
+# are small and attributes are read directly (node.condition) instead of through a
+# per-node dictionary. Element(elem_type, **kwargs) still works: it builds the node class
+# registered for elem_type, and node.dict / node.get give a dictionary-like view of the
+# attributes for code that was written against the old Element.
+# attributes a node kind doesn't set start out as None; address, layout and path are
+# filled in later by the Resolver. every node also carries the integer opcode of its elem_type
+# (see intbase.Opcode), which the interpreters dispatch on, and the line of the source it
+# came from (None if it doesn't have one), which isn't part of the dictionary view
+
+# elem_type : opcode, as a plain int since indexing a list with an IntEnum is slower
+OPCODES = {
+    elem_type: int(opcode) for elem_type, opcode in InterpreterBase.OPCODES.items()
+}
+
+
 class Element:
-    def __init__(self, elem_type, **kwargs):
+    __slots__ = ("elem_type", "opcode", "line")
+    node_types = {}  # elem_type : node class
+
+    def __new__(cls, elem_type=None, line=None, **kwargs):
+        if cls is Element:
+            cls = Element.node_types.get(elem_type, GenericNode)
+        return object.__new__(cls)
+
+    def __init__(self, elem_type, line=None, **kwargs):
         self.elem_type = elem_type
-        self.dict = {}
+        self.opcode = OPCODES.get(elem_type)
+        self.line = line
+        for key in type(self).__slots__:
+            setattr(self, key, None)
         for key, value in kwargs.items():
-            self.dict[key] = value
+            setattr(self, key, value)
+
+    @property
+    def dict(self):
+        return NodeDict(self)
 
     def get(self, key):
-        if key not in self.dict:
-            return None
-        return self.dict[key]
+        return getattr(self, key, None)
 
     def __str__(self):
         s = f"{self.elem_type}: "
@@ -27,3 +58,183 @@ class Element:
                 return "[" + s[0:-2] + "]"
             return "[" + s + "]"
         return str(v)
+
+
+# a view of a node's attributes as a dictionary, for compatibility
+class NodeDict:
+    # resolver annotations only show up once they're set
+    annotations = ("address", "layout", "path")
+
+    def __init__(self, node):
+        self.node = node
+
+    def keys(self):
+        return [
+            key
+            for key in type(self.node).__slots__
+            if key not in NodeDict.annotations or getattr(self.node, key) is not None
+        ]
+
+    def items(self):
+        return [(key, getattr(self.node, key)) for key in self.keys()]
+
+    def values(self):
+        return [getattr(self.node, key) for key in self.keys()]
+
+    def get(self, key, default=None):
+        if key in self:
+            return getattr(self.node, key)
+        return default
+
+    def __getitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        return getattr(self.node, key)
+
+    def __setitem__(self, key, value):
+        if key not in type(self.node).__slots__:
+            raise KeyError(key)
+        setattr(self.node, key, value)
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+
+# node kinds
+
+
+class ProgramNode(Element):
+    __slots__ = ("structs", "functions")
+
+
+class StructNode(Element):
+    __slots__ = ("name", "fields")
+
+
+class FieldDefNode(Element):
+    __slots__ = ("name", "var_type")
+
+
+class FuncNode(Element):
+    __slots__ = ("name", "args", "return_type", "statements", "layout")
+
+
+class ArgNode(Element):
+    __slots__ = ("name", "var_type")
+
+
+class AssignNode(Element):
+    __slots__ = ("name", "expression", "address", "path")
+
+
+class VarDefNode(Element):
+    __slots__ = ("name", "var_type", "address")
+
+
+class IfNode(Element):
+    __slots__ = ("condition", "statements", "else_statements", "layout")
+
+
+class ForNode(Element):
+    __slots__ = ("init", "condition", "update", "statements", "layout")
+
+
+class TryNode(Element):
+    __slots__ = ("statements", "catchers", "layout")
+
+
+class CatchNode(Element):
+    __slots__ = ("exception_type", "statements", "layout")
+
+
+class RaiseNode(Element):
+    __slots__ = ("exception_type",)
+
+
+class ReturnNode(Element):
+    __slots__ = ("expression",)
+
+
+# every binary operator ("+", "==", "&&", ...)
+class BinOp(Element):
+    __slots__ = ("op1", "op2")
+
+
+# "neg" and "!"
+class UnaryOp(Element):
+    __slots__ = ("op1",)
+
+
+class NewNode(Element):
+    __slots__ = ("var_type",)
+
+
+# "int", "string" and "bool"
+class ValueNode(Element):
+    __slots__ = ("val",)
+
+
+class NilNode(Element):
+    __slots__ = ()
+
+
+class VarNode(Element):
+    __slots__ = ("name", "address", "path")
+
+
+class FCall(Element):
+    __slots__ = ("name", "args")
+
+
+# any elem_type without a node class keeps its attributes in a real dictionary
+class GenericNode(Element):
+    __slots__ = ("dict",)
+
+    def __init__(self, elem_type, line=None, **kwargs):
+        self.elem_type = elem_type
+        self.opcode = OPCODES.get(elem_type)
+        self.line = line
+        self.dict = dict(kwargs)
+
+    def get(self, key):
+        return self.dict.get(key)
+
+    def __getattr__(self, key):
+        try:
+            return self.dict[key]
+        except KeyError:
+            raise AttributeError(key) from None
+
+
+Element.node_types = {
+    "program": ProgramNode,
+    "struct": StructNode,
+    "fielddef": FieldDefNode,
+    "func": FuncNode,
+    "arg": ArgNode,
+    "=": AssignNode,
+    "vardef": VarDefNode,
+    "if": IfNode,
+    "for": ForNode,
+    "try": TryNode,
+    "catch": CatchNode,
+    "raise": RaiseNode,
+    "return": ReturnNode,
+    "neg": UnaryOp,
+    "!": UnaryOp,
+    "new": NewNode,
+    "int": ValueNode,
+    "string": ValueNode,
+    "bool": ValueNode,
+    "nil": NilNode,
+    "var": VarNode,
+    "fcall": FCall,
+}
+for operator in ("+", "-", "*", "/", "==", "!=", "<", "<=", ">", ">=", "&&", "||"):
+    Element.node_types[operator] = BinOp
@@ -2,48 +2,114 @@
 # brewin program and the value of that variable - the value that's passed in can be anything you like
 # in our implementation we pass in a Value object which holds a type and a value
 
+# each scope stores its variables in a fixed-size list of slots, and a layout mapping
+# names to slots that's shared by every scope created for the same block (see
+# resolver.py). a slot holding None hasn't been defined yet.
+# get, set and create take an optional address from the resolver, which lets them go
+# straight to the right slot instead of searching every scope by name
+
+
+class Scope:
+    def __init__(self, type, layout):
+        self.type = type
+        self.layout = layout
+        self.values = [None] * len(layout)
+
+    # returns the value of symbol in this scope, or None if it isn't defined here
+    def lookup(self, symbol):
+        slot = self.layout.get(symbol)
+        if slot is None:
+            return None
+        return self.values[slot]
+
 
 class EnvironmentManager:
     def __init__(self):
-        # stack of environments, where each environment is a dictionary
-        # the bottom-most dictionary is the global scope
-        self.scopes = [{"type": "function", "variables": {}}]
+        # stack of environments, where each environment is a scope
+        # the bottom-most scope is the global scope
+        self.scopes = [Scope("function", {})]
+
+    # returns the scope an address points to if it has the expected layout
+    def scope_at(self, address):
+        depth, _, layout = address
+        if depth < len(self.scopes):
+            scope = self.scopes[-1 - depth]
+            if scope.layout is layout:
+                return scope
+        return None
 
     # looks for a symbol starting from the current (top-most) scope down to the global scope
-    def get(self, symbol):
+    def get(self, symbol, address=None):
+        if address:
+            scope = self.scope_at(address)
+            if scope and scope.values[address[1]] is not None:
+                return scope.values[address[1]]
+
+        top = self.scopes[-1]
         for scope in reversed(self.scopes):
             # if you find the variable
             # and you're not in a function looking at a different function's scope
-            if symbol in scope["variables"] and not (
-                scope["type"] == "function"
-                and scope != self.scopes[-1]
-                and self.scopes[-1]["type"] == "function"
+            value = scope.lookup(symbol)
+            if value is not None and not (
+                scope.type == "function" and scope is not top and top.type == "function"
             ):
-                return scope["variables"][symbol]
+                return value
         return None
 
     # search all scopes to find where the symbol is defined and update it there
-    def set(self, symbol, value):
+    def set(self, symbol, value, address=None):
+        if address:
+            scope = self.scope_at(address)
+            if scope and scope.values[address[1]] is not None:
+                scope.values[address[1]] = value
+                return True
+
         for scope in reversed(self.scopes):
             # TODO: may need to update this with the same logic as get
             # but this works for now
-            if symbol in scope["variables"]:
-                scope["variables"][symbol] = value
+            if scope.lookup(symbol) is not None:
+                scope.values[scope.layout[symbol]] = value
+                return True
+        return False
+
+    # returns whether the running function's scopes (its function scope and the block
+    # scopes above it) can be dropped before calling a function whose args are names.
+    # that's only safe if every variable in them is in the function scope and shadowed
+    # by one of the args, so nothing the callee does could have reached them
+    def can_drop_function(self, names):
+        for scope in reversed(self.scopes):
+            for symbol, slot in scope.layout.items():
+                if scope.values[slot] is not None and (
+                    scope.type != "function" or symbol not in names
+                ):
+                    return False
+            if scope.type == "function":
                 return True
         return False
 
     # adds a new symbol to the current (top-most) scope, initializing it with `start_val`
-    def create(self, symbol, start_val):
-        if symbol not in self.scopes[-1]["variables"]:
-            self.scopes[-1]["variables"][symbol] = start_val
+    def create(self, symbol, start_val, address=None):
+        scope = self.scopes[-1]
+        if address and scope.layout is address[2]:
+            slot = address[1]
+        else:
+            slot = scope.layout.get(symbol)
+            # a name the resolver didn't see gets a slot in a layout of the scope's own
+            if slot is None:
+                slot = len(scope.values)
+                scope.layout = {**scope.layout, symbol: slot}
+                scope.values.append(None)
+
+        if scope.values[slot] is None:
+            scope.values[slot] = start_val
             return True
         return False
 
-    # enters a new scope by adding a new dictionary to the scopes stack
-    def push_scope(self, type):
-        self.scopes.append({"type": type, "variables": {}})
+    # enters a new scope for a block with the given layout
+    def push_scope(self, type, layout=None):
+        self.scopes.append(Scope(type, {} if layout is None else layout))
 
-    # exits the current scope by removing the top-most dictionary from the stack
+    # exits the current scope by removing the top-most scope from the stack
     def pop_scope(self):
         if len(self.scopes) > 1:
             self.scopes.pop()
@@ -54,8 +120,11 @@ class EnvironmentManager:
     def print(self):
         for i, scope in enumerate(reversed(self.scopes)):
             print(f"Scope {len(self.scopes) - i - 1}")
-            for key, value in scope["variables"].items():
-                type = scope["type"]
+            for key, slot in scope.layout.items():
+                value = scope.values[slot]
+                if value is None:
+                    continue
+                type = scope.type
                 if isinstance(value.value(), dict):
                     for key2, value2 in value.value().items():
                         print(
@@ -2,78 +2,189 @@
 # brewin program and the value of that variable - the value that's passed in can be anything you like
 # in our implementation we pass in a Value object which holds a type and a value
 
+# scopes form a chain of frames linked from the top-most scope down to the global scope.
+# copy() only hands out the current top frame, so every LazyValue snapshot shares its
+# frames with the live environment instead of rebuilding every scope dictionary.
+# a frame can only be mutated by the manager that owns it; any other manager that wants
+# to write to it first copies the path from its top frame down to that frame
+
+# each frame stores its variables in a fixed-size list of slots, and a layout mapping
+# names to slots that's shared by every frame created for the same block (see
+# resolver.py). a slot holding None hasn't been defined yet.
+# get, set and create take an optional address from the resolver, which lets them go
+# straight to the right slot instead of searching every frame by name
+
+
+class Scope:
+    def __init__(self, type, layout, values, parent, owner):
+        self.type = type
+        self.layout = layout
+        self.values = values
+        self.parent = parent
+        self.owner = owner
+        # number of frames below this one
+        self.depth = parent.depth + 1 if parent else 0
+
+    # returns the value of symbol in this scope, or None if it isn't defined here
+    def lookup(self, symbol):
+        slot = self.layout.get(symbol)
+        if slot is None:
+            return None
+        return self.values[slot]
+
 
 class EnvironmentManager:
     def __init__(self):
-        # stack of environments, where each environment is a dictionary
-        # the bottom-most dictionary is the global scope
-        self.scopes = [{"type": "function", "variables": {}}]
+        # the bottom-most frame is the global scope
+        self.owner = object()
+        self.top = Scope("function", {}, [], None, self.owner)
+
+    # returns the frame an address points to if it has the expected layout
+    def scope_at(self, address):
+        depth, _, layout = address
+        scope = self.top
+        for _ in range(depth):
+            scope = scope.parent
+            if scope is None:
+                return None
+        if scope.layout is layout:
+            return scope
+        return None
 
     # looks for a symbol starting from the current (top-most) scope down to the global scope
-    def get(self, symbol):
-        for scope in reversed(self.scopes):
+    def get(self, symbol, address=None):
+        if address:
+            scope = self.scope_at(address)
+            if scope and scope.values[address[1]] is not None:
+                return scope.values[address[1]]
+
+        top = self.top
+        scope = top
+        while scope is not None:
             # if you find the variable
             # and you're not in a function looking at a different function's scope
-            if symbol in scope["variables"] and not (
-                scope["type"] == "function"
-                and scope != self.scopes[-1]
-                and self.scopes[-1]["type"] == "function"
+            value = scope.lookup(symbol)
+            if value is not None and not (
+                scope.type == "function" and scope is not top and top.type == "function"
             ):
-                return scope["variables"][symbol]
+                return value
+            scope = scope.parent
         return None
 
     # search all scopes to find where the symbol is defined and update it there
-    def set(self, symbol, value):
-        for scope in reversed(self.scopes):
+    def set(self, symbol, value, address=None):
+        if address:
+            scope = self.scope_at(address)
+            if scope and scope.values[address[1]] is not None:
+                self.writable(scope).values[address[1]] = value
+                return True
+
+        scope = self.top
+        while scope is not None:
             # TODO: may need to update this with the same logic as get
             # but this works for now
-            if symbol in scope["variables"]:
-                scope["variables"][symbol] = value
+            if scope.lookup(symbol) is not None:
+                self.writable(scope).values[scope.layout[symbol]] = value
                 return True
+            scope = scope.parent
         return False
 
     # adds a new symbol to the current (top-most) scope, initializing it with `start_val`
-    def create(self, symbol, start_val):
-        if symbol not in self.scopes[-1]["variables"]:
-            self.scopes[-1]["variables"][symbol] = start_val
-            return True
-        return False
+    def create(self, symbol, start_val, address=None):
+        scope = self.top
+        if address and scope.layout is address[2]:
+            slot = address[1]
+        else:
+            slot = scope.layout.get(symbol)
+
+        if slot is not None and scope.values[slot] is not None:
+            return False
 
+        scope = self.writable(scope)
+        # a name the resolver didn't see gets a slot in a layout of the frame's own
+        if slot is None:
+            slot = len(scope.values)
+            scope.layout = {**scope.layout, symbol: slot}
+            scope.values.append(None)
+        scope.values[slot] = start_val
+        return True
+
+    # takes an O(1) snapshot: both managers share every existing frame and give up
+    # ownership of it, so whichever one writes next copies the frames it touches
     def copy(self):
-        copied_manager = EnvironmentManager()
+        copied_manager = EnvironmentManager.__new__(EnvironmentManager)
+        copied_manager.owner = object()
+        copied_manager.top = self.top
+        self.owner = object()
+        return copied_manager
 
-        copied_manager.scopes = []
-        for scope in self.scopes:
-            variables = {}
-            for name, variable in scope["variables"].items():
-                variables[name] = variable
+    # returns a frame of this manager that is safe to mutate in place of `target`,
+    # copying every shared frame between the top of the chain and `target`
+    def writable(self, target):
+        child = None
+        scope = self.top
+        while True:
+            if scope.owner is not self.owner:
+                copied = Scope(
+                    scope.type,
+                    scope.layout,
+                    list(scope.values),
+                    scope.parent,
+                    self.owner,
+                )
+            else:
+                copied = scope
 
-            copied_scope = {
-                "type": scope["type"],
-                "variables": variables,
-            }
-            copied_manager.scopes.append(copied_scope)
+            if child is None:
+                self.top = copied
+            else:
+                child.parent = copied
 
-        return copied_manager
+            if scope is target:
+                return copied
+            child = copied
+            scope = copied.parent
 
-    # enters a new scope by adding a new dictionary to the scopes stack
-    def push_scope(self, type):
-        self.scopes.append({"type": type, "variables": {}, "evaluated": {}})
+    # enters a new scope for a block with the given layout by adding a new frame on top
+    # of the chain
+    def push_scope(self, type, layout=None):
+        if layout is None:
+            layout = {}
+        self.top = Scope(type, layout, [None] * len(layout), self.top, self.owner)
 
-    # exits the current scope by removing the top-most dictionary from the stack
+    # exits the current scope by unlinking the top-most frame from the chain
     def pop_scope(self):
-        if len(self.scopes) > 1:
-            self.scopes.pop()
+        if self.top.parent is not None:
+            self.top = self.top.parent
         else:
             raise Exception("Cannot pop global scope")
 
+    # returns the number of scopes above the global scope
+    def depth(self):
+        return self.top.depth
+
+    # exits every scope above the given depth, like a raise leaving the blocks and
+    # functions it passes through
+    def unwind(self, depth):
+        while self.top.depth > depth:
+            self.top = self.top.parent
+
     # prints all scopes for debugging purposes
     def print(self):
-        for i, scope in enumerate(reversed(self.scopes)):
-            print(f"Scope {len(self.scopes) - i - 1}")
-            for key, value in scope["variables"].items():
-                type = scope["type"]
+        scopes = []
+        scope = self.top
+        while scope is not None:
+            scopes.append(scope)
+            scope = scope.parent
+
+        for i, scope in enumerate(scopes):
+            print(f"Scope {len(scopes) - i - 1}")
+            for key, slot in scope.layout.items():
+                value = scope.values[slot]
+                if value is None:
+                    continue
+                type = scope.type
                 print(
-                    f"Scope {len(self.scopes) - i - 1} | {type} | {key}: {value.print()}"
+                    f"Scope {len(scopes) - i - 1} | {type} | {key}: {value.print()}"
                 )
         print()
@@ -0,0 +1,135 @@
+# the ConstantFolder runs once over a resolved AST before it's executed. every operator
+# whose operands are all constants is replaced by the constant it evaluates to, so
+# something like 2 * 60 * 60 in a loop body isn't recomputed on every iteration.
+# constants are evaluated by the interpreter that's going to run the program (through
+# the evaluate function it passes in), so each version folds with its own semantics.
+# an operator that would fail (a type error, dividing by zero, or a raise in v4) is left
+# alone, so the error still happens when and where it would have.
+# it also drops additions and subtractions of 0 and multiplications and divisions by 1,
+# but only when the other operand is known to be an int, since anything else could be
+# a type error
+
+from element import BinOp, Element, FCall, NilNode, UnaryOp, ValueNode
+from intbase import InterpreterBase
+
+CONSTANT_TYPES = {
+    InterpreterBase.INT_NODE,
+    InterpreterBase.STRING_NODE,
+    InterpreterBase.BOOL_NODE,
+}
+
+
+class ConstantFolder:
+    def __init__(self, evaluate):
+        # evaluate takes an expression node made only of constants and returns its
+        # Value, or None if evaluating it fails
+        self.evaluate = evaluate
+
+    def fold_program(self, ast):
+        for function in ast.functions:
+            self.fold_statements(function.statements)
+
+    def fold_statements(self, statement_nodes):
+        if not statement_nodes:
+            return
+        for statement_node in statement_nodes:
+            self.fold_statement(statement_node)
+
+    def fold_statement(self, statement_node):
+        match statement_node.elem_type:
+            case "=":
+                statement_node.expression = self.fold(statement_node.expression)
+            case "fcall":
+                self.fold(statement_node)
+            case "if":
+                statement_node.condition = self.fold(statement_node.condition)
+                self.fold_statements(statement_node.statements)
+                self.fold_statements(statement_node.else_statements)
+            case "for":
+                self.fold_statement(statement_node.init)
+                statement_node.condition = self.fold(statement_node.condition)
+                self.fold_statements(statement_node.statements)
+                self.fold_statement(statement_node.update)
+            case "return":
+                if statement_node.expression:
+                    statement_node.expression = self.fold(statement_node.expression)
+            case "try":
+                self.fold_statements(statement_node.statements)
+                for catch in statement_node.catchers:
+                    self.fold_statements(catch.statements)
+            case "raise":
+                statement_node.exception_type = self.fold(
+                    statement_node.exception_type
+                )
+
+    # returns expression_node with its constant parts folded
+    def fold(self, expression_node):
+        if isinstance(expression_node, FCall):
+            expression_node.args = [self.fold(arg) for arg in expression_node.args]
+        elif isinstance(expression_node, BinOp):
+            expression_node.op1 = self.fold(expression_node.op1)
+            expression_node.op2 = self.fold(expression_node.op2)
+            if is_constant(expression_node.op1) and is_constant(expression_node.op2):
+                return self.evaluate_node(expression_node)
+            return simplify(expression_node)
+        elif isinstance(expression_node, UnaryOp):
+            expression_node.op1 = self.fold(expression_node.op1)
+            if is_constant(expression_node.op1):
+                return self.evaluate_node(expression_node)
+        return expression_node
+
+    # returns the constant node expression_node evaluates to, or expression_node itself
+    # if it can't be evaluated
+    def evaluate_node(self, expression_node):
+        value = self.evaluate(expression_node)
+        if value is None:
+            return expression_node
+        # the constant keeps the line of the expression it replaces
+        line = expression_node.line
+        if value.type() in CONSTANT_TYPES:
+            return Element(value.type(), val=value.value(), line=line)
+        if value.type() == InterpreterBase.NIL_NODE:
+            return Element(InterpreterBase.NIL_NODE, line=line)
+        return expression_node
+
+
+def is_constant(node):
+    return isinstance(node, (ValueNode, NilNode))
+
+
+def is_int(node, val):
+    return node.elem_type == InterpreterBase.INT_NODE and node.val == val
+
+
+# whether an expression always evaluates to an int (if it doesn't fail)
+def is_known_int(node):
+    match node.elem_type:
+        case "int" | "-" | "*" | "/":
+            return True
+        case "neg":
+            return is_known_int(node.op1)
+    return False
+
+
+# drops an operand that can't change the other one
+def simplify(expression_node):
+    op1 = expression_node.op1
+    op2 = expression_node.op2
+    match expression_node.elem_type:
+        case "+":
+            if is_int(op2, 0) and is_known_int(op1):
+                return op1
+            if is_int(op1, 0) and is_known_int(op2):
+                return op2
+        case "-":
+            if is_int(op2, 0) and is_known_int(op1):
+                return op1
+        case "*":
+            if is_int(op2, 1) and is_known_int(op1):
+                return op1
+            if is_int(op1, 1) and is_known_int(op2):
+                return op2
+        case "/":
+            if is_int(op2, 1) and is_known_int(op1):
+                return op1
+    return expression_node
@@ -0,0 +1,247 @@
+# the Governor class puts limits on how much a Brewin program can do, so a program that
+# never stops (like for (i = 0; true; i = i + 0) {}) can't run forever and one that
+# keeps allocating can't take all the host's memory: a step budget, a wall-clock
+# deadline, a maximum call depth and a memory quota. a program that goes past one stops
+# with an ErrorType.LIMIT_ERROR, and exceeded says which limit it was. so does a program
+# that recurses too deeply for the Python stack before reaching max_depth.
+# the only way a program can run for longer than its size allows is a loop or a
+# function call, so those are the only places the interpreters report to the governor.
+# each one is charged as many steps as it has statements and expressions (see cost),
+# which is as many as one pass through it can evaluate without going through another
+# loop or call; each of those is charged for itself. the clock is only read every
+# CHECK_INTERVAL steps, so keeping a governor on costs an addition and a comparison per
+# loop iteration and call.
+#
+# memory is measured by walking everything reachable from the program's variables
+# (values, strings, struct records, and in v4 LazyValues and the environments they
+# captured) and adding up their sizes, so only what the program can still use counts.
+# the interpreters charge the allocations that can keep growing (string concatenation,
+# new structs and v4 LazyValues) with allocate, and once enough has been allocated since
+# the last measurement to go past the quota (or to double what was live), memory is
+# measured again. measuring takes time proportional to what's live, so it's only done
+# about as often as that much has been allocated
+
+import math
+import sys
+import time
+
+from element import Element
+from intbase import ErrorType
+
+CHECK_INTERVAL = 4096  # steps between looks at the clock
+MEASURE_INTERVAL = 1 << 20  # bytes allocated before the first measurement
+
+# rough sizes in bytes of what the interpreters allocate, for charging it before it's
+# measured: a string Value (plus a byte per character added), a struct's Value and
+# record (plus FIELD_SIZE per field), and a v4 LazyValue with the environment it
+# captures
+STRING_SIZE = 100
+STRUCT_SIZE = 150
+FIELD_SIZE = 8
+THUNK_SIZE = 250
+
+# what a program went past
+STEPS = "steps"
+DEADLINE = "deadline"
+DEPTH = "depth"
+MEMORY = "memory"
+
+
+class Governor:
+    def __init__(
+        self,
+        max_steps=None,
+        deadline=None,
+        max_depth=None,
+        max_memory=None,
+        clock=time.monotonic,
+    ):
+        self.max_steps = max_steps  # None for no limit
+        self.deadline = deadline  # in seconds from when the program starts, or None
+        self.max_depth = math.inf if max_depth is None else max_depth
+        self.max_memory = max_memory  # in bytes, None for no limit
+        self.clock = clock
+        self.costs = {}  # for or function node : steps it's charged
+        self.reset()
+
+    def reset(self):
+        self.steps = 0
+        self.depth = 0  # functions running
+        self.exceeded = None  # STEPS, DEADLINE, DEPTH or MEMORY once a limit is hit
+        self.interpreter = None
+        self.stop_at = None
+        self.next_check = 0
+        self.memory = 0  # bytes live when memory was last measured
+        self.allocated = 0  # bytes charged since then
+        self.peak_memory = 0  # the most bytes measured live at once
+        self.measurements = 0
+        self.next_measure = math.inf  # nothing is measured until the program starts
+
+    # called when a program starts running in interpreter
+    def start(self, interpreter):
+        self.reset()
+        self.interpreter = interpreter
+        if self.deadline is not None:
+            self.stop_at = self.clock() + self.deadline
+        self.next_measure = MEASURE_INTERVAL
+        if self.max_memory is not None:
+            self.next_measure = min(self.next_measure, self.max_memory)
+        self.check()
+
+    # called when a program stops. peak_memory is then the most memory that was live at
+    # once, or for a program that never allocated enough to be measured, everything it
+    # allocated
+    def finish(self):
+        if not self.measurements:
+            self.peak_memory = self.allocated
+
+    # charges steps, checking the limits if it's time to
+    def step(self, steps):
+        self.steps += steps
+        if self.steps >= self.next_check:
+            self.check()
+
+    # charges one pass through a for loop or function node
+    def charge(self, node):
+        cost = self.costs.get(node)
+        if cost is None:
+            cost = self.cost(node)
+        self.step(cost)
+
+    # called when a function starts running
+    def enter(self, func_node):
+        self.descend()
+        self.charge(func_node)
+
+    # called when forcing a v4 LazyValue starts evaluating its expression. that can run
+    # the rest of a function that has already returned (return 1 + f(n + 1) does), so
+    # until exit is called it counts toward the call depth just like a call
+    def descend(self):
+        self.depth += 1
+        if self.depth > self.max_depth:
+            self.stop(DEPTH, f"Call depth of {self.max_depth} exceeded")
+
+    # called when a function returns, or a LazyValue that descended has its value
+    def exit(self):
+        self.depth -= 1
+
+    # called when a raise leaves every function entered after depth
+    def unwind(self, depth):
+        self.depth = depth
+
+    def check(self):
+        if self.max_steps is not None and self.steps > self.max_steps:
+            self.stop(STEPS, f"Step budget of {self.max_steps} exceeded")
+        if self.stop_at is not None and self.clock() > self.stop_at:
+            self.stop(DEADLINE, f"Deadline of {self.deadline}s exceeded")
+        self.next_check = self.steps + CHECK_INTERVAL
+        if self.max_steps is not None:
+            self.next_check = min(self.next_check, self.max_steps + 1)
+
+    # charges size bytes of new values, measuring what's live if it's time to
+    def allocate(self, size):
+        self.allocated += size
+        if self.memory + self.allocated > self.next_measure:
+            self.measure()
+
+    def measure(self):
+        live = measure(self.interpreter.variables)
+        self.memory = live
+        self.allocated = 0
+        self.measurements += 1
+        self.peak_memory = max(self.peak_memory, live)
+        if self.max_memory is not None and live > self.max_memory:
+            self.stop(MEMORY, f"Memory quota of {self.max_memory} bytes exceeded")
+
+        # measure again once as much as is live now has been allocated, or the quota
+        # could be reached, but not so close together that measuring is all it does
+        self.next_measure = live + max(live, MEASURE_INTERVAL)
+        if self.max_memory is not None:
+            self.next_measure = min(
+                self.next_measure,
+                max(self.max_memory, live + MEASURE_INTERVAL // 16),
+            )
+
+    def stop(self, limit, description):
+        self.exceeded = limit
+        self.interpreter.error(ErrorType.LIMIT_ERROR, description)
+
+    # returns the steps one pass through a for loop (its body, update and condition) or
+    # function (its body) is charged: every statement and expression in it, not
+    # counting the bodies of the loops in it, which are charged for every pass
+    def cost(self, node):
+        if node.elem_type == "for":
+            cost = size(node.update) + size(node.condition)
+        else:
+            cost = 1
+        for statement_node in node.statements:
+            cost += size(statement_node)
+        self.costs[node] = cost
+        return cost
+
+
+# returns the number of statements and expressions in node, stopping at loop bodies
+def size(node):
+    if node is None:
+        return 0
+    match node.elem_type:
+        case "for":
+            return 1 + size(node.init) + size(node.condition)
+        case "if":
+            return (
+                1
+                + size(node.condition)
+                + sum(size(statement) for statement in node.statements)
+                + sum(size(statement) for statement in node.else_statements or [])
+            )
+        case "try":
+            return (
+                1
+                + sum(size(statement) for statement in node.statements)
+                + sum(size(catch) for catch in node.catchers)
+            )
+        case "catch":
+            return sum(size(statement) for statement in node.statements)
+        case "=" | "return":
+            return 1 + size(node.expression)
+        case "raise":
+            return 1 + size(node.exception_type)
+        case "fcall":
+            return 1 + sum(size(arg) for arg in node.args)
+        case "neg" | "!":
+            return 1 + size(node.op1)
+        case "vardef" | "var" | "int" | "string" | "bool" | "nil" | "new":
+            return 1
+    # binary operators
+    return 1 + size(node.op1) + size(node.op2)
+
+
+# returns roughly how many bytes are held by everything reachable from root, counting
+# each object once. the program's AST and compiled code aren't counted, since they
+# don't grow while it runs
+def measure(root):
+    seen = set()
+    pending = [root]
+    total = 0
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen or isinstance(obj, UNCOUNTED):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+
+        if isinstance(obj, (list, tuple)):
+            pending.extend(obj)
+        elif isinstance(obj, dict):
+            pending.extend(obj.values())
+        elif hasattr(obj, "__dict__"):
+            total += sys.getsizeof(obj.__dict__)
+            pending.extend(obj.__dict__.values())
+        else:
+            for cls in type(obj).__mro__:
+                for slot in getattr(cls, "__slots__", ()):
+                    pending.append(getattr(obj, slot, None))
+    return total
+
+
+UNCOUNTED = (Element, type(measure), type, type(None))
@@ -1,14 +1,72 @@
 # Base class for our interpreter
-from enum import Enum
+from enum import Enum, IntEnum
+
+from output_sink import CaptureSink
 
 
 class ErrorType(Enum):
     TYPE_ERROR = 1
     NAME_ERROR = 2  # if a variable or function name can't be found
     FAULT_ERROR = 3  # used if an object reference is null and used to make a call
+    LIMIT_ERROR = 4  # the program went past a limit set by its Governor
     # Add others here
 
 
+# a small integer for every kind of AST node. each node is stamped with its opcode when
+# it's built, so the interpreters can dispatch on it by indexing into a list of handlers
+# instead of comparing elem_type strings
+class Opcode(IntEnum):
+    PROGRAM = 0
+    STRUCT = 1
+    FIELD_DEF = 2
+    FUNC = 3
+    ARG = 4
+    VAR_DEF = 5
+    ASSIGN = 6
+    IF = 7
+    FOR = 8
+    TRY = 9
+    CATCH = 10
+    RAISE = 11
+    RETURN = 12
+    FCALL = 13
+    VAR = 14
+    INT = 15
+    STRING = 16
+    BOOL = 17
+    NIL = 18
+    NEW = 19
+    NEG = 20
+    NOT = 21
+    ADD = 22
+    SUBTRACT = 23
+    MULTIPLY = 24
+    DIVIDE = 25
+    EQ = 26
+    NOT_EQ = 27
+    LESS = 28
+    LESS_EQ = 29
+    GREATER = 30
+    GREATER_EQ = 31
+    AND = 32
+    OR = 33
+
+
+# returns a list with an entry for every opcode, so the handler for a node is
+# table[node.opcode]; opcodes missing from handlers get the default
+def handler_table(handlers, default=None):
+    return [handlers.get(opcode, default) for opcode in Opcode]
+
+
+# what a tree walker's return statement gives back instead of a value when it returns
+# the result of a call that can reuse the current function's frame: run_function drops
+# the returning function's scopes and runs the callee in the same loop
+class TailCall:
+    def __init__(self, function, args):
+        self.function = function  # function node
+        self.args = args  # evaluated arg values
+
+
 class InterpreterBase:
     # AST node types
     PROGRAM_NODE = "program"
@@ -33,21 +91,69 @@ class InterpreterBase:
     CATCH_NODE = "catch"
     RAISE_NODE = "raise"
 
+    # opcode of every AST node type
+    OPCODES = {
+        PROGRAM_NODE: Opcode.PROGRAM,
+        STRUCT_NODE: Opcode.STRUCT,
+        FIELD_DEF_NODE: Opcode.FIELD_DEF,
+        FUNC_NODE: Opcode.FUNC,
+        ARG_NODE: Opcode.ARG,
+        VAR_DEF_NODE: Opcode.VAR_DEF,
+        "=": Opcode.ASSIGN,
+        IF_NODE: Opcode.IF,
+        FOR_NODE: Opcode.FOR,
+        TRY_NODE: Opcode.TRY,
+        CATCH_NODE: Opcode.CATCH,
+        RAISE_NODE: Opcode.RAISE,
+        RETURN_NODE: Opcode.RETURN,
+        FCALL_NODE: Opcode.FCALL,
+        VAR_NODE: Opcode.VAR,
+        INT_NODE: Opcode.INT,
+        STRING_NODE: Opcode.STRING,
+        BOOL_NODE: Opcode.BOOL,
+        NIL_NODE: Opcode.NIL,
+        NEW_NODE: Opcode.NEW,
+        NEG_NODE: Opcode.NEG,
+        NOT_NODE: Opcode.NOT,
+        "+": Opcode.ADD,
+        "-": Opcode.SUBTRACT,
+        "*": Opcode.MULTIPLY,
+        "/": Opcode.DIVIDE,
+        "==": Opcode.EQ,
+        "!=": Opcode.NOT_EQ,
+        "<": Opcode.LESS,
+        "<=": Opcode.LESS_EQ,
+        ">": Opcode.GREATER,
+        ">=": Opcode.GREATER_EQ,
+        "&&": Opcode.AND,
+        "||": Opcode.OR,
+    }
+
     # other constants
     TRUE_DEF = "true"
     FALSE_DEF = "false"
     NIL_DEF = "nil"
     VOID_DEF = "void"
 
+    # execution modes
+    TREE_MODE = "tree"  # walk the AST directly
+    COMPILED_MODE = "compiled"  # compile each function into closures first
+    VM_MODE = "vm"  # compile each function into bytecode for a stack machine (v3 only)
+
     # methods
-    def __init__(self, console_output=True, inp=None):
+    def __init__(self, console_output=True, inp=None, output_sink=None):
         self.console_output = console_output
         self.inp = inp  # if not none, then read input from passed-in list
+        # where printed lines go (see output_sink.py). by default they're all kept for
+        # get_output, and printed too if console_output is set
+        if output_sink is None:
+            output_sink = CaptureSink(echo=console_output)
+        self.output_sink = output_sink
         self.reset()
 
     # Call to reset I/O for another run of the program
     def reset(self):
-        self.output_log = []
+        self.output_sink.reset()
         self.input_cursor = 0
         self.error_type = None
         self.error_line = None
@@ -58,6 +164,8 @@ class InterpreterBase:
 
     def get_input(self):
         if not self.inp:
+            # make sure any prompt has been written first
+            self.output_sink.flush()
             return input()  # Get input from keyboard if not input list provided
 
         if self.input_cursor < len(self.inp):
@@ -81,12 +189,16 @@ class InterpreterBase:
         raise Exception(f"{error_type} on line {line_num}{description}")
 
     def output(self, v):
-        if self.console_output:
-            print(v)
-        self.output_log.append(v)
+        self.output_sink.write(v)
 
+    # returns what the program printed, if the output sink keeps it
     def get_output(self):
-        return self.output_log
+        return self.output_sink.get_output()
+
+    # what the program printed, for code written before output sinks existed
+    @property
+    def output_log(self):
+        return self.output_sink.get_output()
 
     def get_error_type_and_line(self):
         return self.error_type, self.error_line
@@ -1,31 +1,67 @@
 from intbase import InterpreterBase, ErrorType
-from brewparse import parse_program
+from program_cache import load_program
+from compiler_v1 import Compiler
+from profiler import Profiler
 
 
 class Interpreter(InterpreterBase):
-    def __init__(self, console_output=True, inp=None, trace_output=False):
+    def __init__(
+        self,
+        console_output=True,
+        inp=None,
+        trace_output=False,
+        mode=InterpreterBase.TREE_MODE,
+        output_sink=None,
+        governor=None,
+    ):
         # call InterpreterBase's constructor
-        super().__init__(console_output, inp)
+        super().__init__(console_output, inp, output_sink)
+        self.mode = mode
+        # limits on how long the program can run (see governor.py). v1 programs have no
+        # loops or function calls, so they always finish and nothing is charged
+        self.governor = governor
+        # counts time and the statements run on each line when trace_output is set
+        # (see profiler.py)
+        self.profiler = Profiler() if trace_output else None
 
     def run(self, program):
-        ast = parse_program(program)
+        ast = load_program(program)
         self.variables = {}  # variable name : value
-        main_func_node = ast.dict["functions"][0]
-        if main_func_node.dict["name"] != "main":
+        main_func_node = ast.functions[0]
+        if main_func_node.name != "main":
             super().error(
                 ErrorType.NAME_ERROR,
                 "No main() function was found",
             )
-        self.run_function(main_func_node)
+
+        if self.profiler:
+            self.profiler.start()
+        try:
+            if self.mode == InterpreterBase.COMPILED_MODE:
+                Compiler(self).compile_function(main_func_node)()
+            else:
+                self.run_function(main_func_node)
+        finally:
+            # write out anything still buffered, even if the program failed
+            self.output_sink.flush()
+            if self.profiler:
+                self.profiler.finish()
 
     def run_function(self, func_node):
-        for statement_node in func_node.dict["statements"]:
+        profiler = self.profiler
+        if profiler:
+            profiler.enter(func_node)
+        for statement_node in func_node.statements:
+            if profiler:
+                profiler.hit(statement_node)
             self.run_statement(statement_node)
+        if profiler:
+            profiler.exit()
 
     def run_statement(self, statement_node):
         # variable definition
         if statement_node.elem_type == "vardef":
-            name = statement_node.dict["name"]
+            name = statement_node.name
             if name in self.variables:
                 super().error(
                     ErrorType.NAME_ERROR,
@@ -34,8 +70,8 @@ class Interpreter(InterpreterBase):
             self.variables[name] = 0
         elif statement_node.elem_type == "=":
             # maps to either an expression node, variable node, or value node
-            name = statement_node.dict["name"]
-            node = statement_node.dict["expression"]
+            name = statement_node.name
+            node = statement_node.expression
             if name not in self.variables:
                 super().error(
                     ErrorType.NAME_ERROR,
@@ -49,10 +85,10 @@ class Interpreter(InterpreterBase):
     def evaluate_expression(self, expression_node):
         # value node
         if expression_node.elem_type == "int" or expression_node.elem_type == "string":
-            return expression_node.dict["val"]
+            return expression_node.val
         # variable node
         elif expression_node.elem_type == "var":
-            var_name = expression_node.dict["name"]
+            var_name = expression_node.name
             if var_name not in self.variables:
                 super().error(
                     ErrorType.NAME_ERROR,
@@ -73,10 +109,10 @@ class Interpreter(InterpreterBase):
     def evaluate_value(self, expression_node):
         # value node
         if expression_node.elem_type == "int" or expression_node.elem_type == "string":
-            return expression_node.dict["val"]
+            return expression_node.val
         # variable node
         elif expression_node.elem_type == "var":
-            var_name = expression_node.dict["name"]
+            var_name = expression_node.name
             if var_name not in self.variables:
                 super().error(
                     ErrorType.NAME_ERROR,
@@ -85,20 +121,18 @@ class Interpreter(InterpreterBase):
             return self.variables[var_name]
 
     def run_function_call(self, function_call):
-        func_name = function_call.dict["name"]
+        func_name = function_call.name
         if func_name == "print":
-            res = ""
-            for arg in function_call.dict["args"]:
-                res += str(self.evaluate_expression(arg))
-            super().output(res)
+            args = function_call.args
+            super().output("".join([str(self.evaluate_expression(arg)) for arg in args]))
         elif func_name == "inputi":
-            if len(function_call.dict["args"]) > 1:
+            if len(function_call.args) > 1:
                 super().error(
                     ErrorType.NAME_ERROR,
                     "No inputi() function found that takes > 1 parameter",
                 )
-            elif len(function_call.dict["args"]) == 1:
-                super().output(function_call.dict["args"][0].dict["val"])
+            elif len(function_call.args) == 1:
+                super().output(function_call.args[0].val)
 
             return int(super().get_input())
         else:
@@ -108,8 +142,8 @@ class Interpreter(InterpreterBase):
             )
 
     def check_operation(self, expression_node):
-        op1 = expression_node.dict["op1"]
-        op2 = expression_node.dict["op2"]
+        op1 = expression_node.op1
+        op2 = expression_node.op2
 
         if (
             isinstance(self.evaluate_value(op1), int)
@@ -1,7 +1,23 @@
-from intbase import InterpreterBase, ErrorType
-from brewparse import parse_program
+from intbase import InterpreterBase, ErrorType, Opcode, TailCall, handler_table
+from program_cache import load_program
+from folder import ConstantFolder
 from env_v2 import EnvironmentManager
-from type_valuev2 import Type, Value, create_value, get_printable
+from compiler_v2 import Compiler
+from memo import MemoTable, find_pure_functions, memo_key
+from profiler import Profiler
+from governor import DEPTH, STRING_SIZE
+from type_valuev2 import (
+    Type,
+    Value,
+    TRUE,
+    FALSE,
+    NIL,
+    bool_value,
+    int_value,
+    create_value,
+    concat,
+    format_line,
+)
 
 
 class Interpreter(InterpreterBase):
@@ -19,326 +35,547 @@ class Interpreter(InterpreterBase):
         "&&",
         "||",
     }
+    builtin_functions = {"print", "inputi", "inputs"}
 
-    def __init__(self, console_output=True, inp=None, trace_output=False):
+    def __init__(
+        self,
+        console_output=True,
+        inp=None,
+        trace_output=False,
+        mode=InterpreterBase.TREE_MODE,
+        memo_size=None,
+        output_sink=None,
+        governor=None,
+    ):
         # call InterpreterBase's constructor
-        super().__init__(console_output, inp)
-        self.functions = []
+        super().__init__(console_output, inp, output_sink)
+        self.functions = {}  # (name, arg count) : function node
+        self.mode = mode
+        # limits on how long the program can run, if any (see governor.py)
+        self.governor = governor
+        # results of pure functions, if memo_size is set
+        self.memo = MemoTable(memo_size) if memo_size else None
+        self.pure_functions = set()
+        # counts calls, time and the statements run on each line when trace_output is
+        # set (see profiler.py). statements are counted by running them through a copy
+        # of the handler table that counts each one first
+        self.profiler = Profiler() if trace_output else None
+        if self.profiler:
+            self.statement_handlers = [
+                self.profiler.counting(handler)
+                for handler in Interpreter.statement_handlers
+            ]
 
     def run(self, program):
-        ast = parse_program(program)
         self.variables = EnvironmentManager()
+        ast = load_program(
+            program, "v2", ConstantFolder(self.evaluate_constant).fold_program
+        )
         main_func_node = None
-        for function in ast.dict["functions"]:
-            if function.dict["name"] == "main":
+        for function in ast.functions:
+            name = function.name
+            if name == "main":
                 main_func_node = function
             else:
-                self.functions.append(function)
+                # if overloaded with the same arg count, the first definition wins
+                key = (name, len(function.args))
+                self.functions.setdefault(key, function)
 
         if not main_func_node:
             super().error(
                 ErrorType.NAME_ERROR,
                 "No main() function was found",
             )
-        self.run_function(main_func_node)
+
+        if self.memo:
+            self.pure_functions = find_pure_functions(self.functions)
+
+        if self.governor:
+            self.governor.start(self)
+        # started right before the try, so whatever it changes is always undone
+        if self.profiler:
+            self.profiler.start()
+        try:
+            if self.mode == InterpreterBase.COMPILED_MODE:
+                Compiler(self).function(main_func_node)(None)
+            else:
+                self.run_function(main_func_node)
+        except RecursionError:
+            # with a governor, a program too deep for the Python stack stops the same
+            # way as one going past max_depth
+            if not self.governor:
+                raise
+            self.governor.stop(DEPTH, "Python recursion limit exceeded")
+        finally:
+            # write out anything still buffered, even if the program failed
+            self.output_sink.flush()
+            if self.profiler:
+                self.profiler.finish()
+            if self.governor:
+                self.governor.finish()
+
+    # returns the function called name that takes arg_count args
+    def find_function(self, name, arg_count):
+        function = self.functions.get((name, arg_count))
+        if function is None:
+            super().error(
+                ErrorType.NAME_ERROR,
+                f"Function {name} has not been defined",
+            )
+        return function
 
     def run_function(self, func_node, args=None):
-        self.variables.push_scope("function")
-        temp_args = func_node.dict["args"]
+        # a pure function called with the same args as before gives the same result
+        key = None
+        if func_node in self.pure_functions:
+            key = memo_key(func_node, args)
+            if key is not None:
+                res = self.memo.get(key)
+                if res is not None:
+                    return res
 
-        # instantiate args with the right values
-        for i in range(len(temp_args)):
-            self.variables.create(temp_args[i].dict["name"], args[i])
+        # each pass runs one function; a tail call replaces it with the callee
+        profiler = self.profiler
+        frames = 0  # functions entered in the profiler, exited once the last returns
+        governor = self.governor
+        if governor:
+            governor.enter(func_node)
+        while True:
+            if profiler:
+                # a tail call shows up as called by the function it replaced
+                profiler.enter(func_node)
+                frames += 1
+            self.variables.push_scope("function", func_node.layout)
+            temp_args = func_node.args
 
-        for statement_node in func_node.dict["statements"]:
-            res = self.run_statement(statement_node)
-            # if statement_node is a return, return that value
-            if res:
-                self.variables.pop_scope()
-                return res
+            # instantiate args with the right values
+            for i in range(len(temp_args)):
+                self.variables.create(temp_args[i].name, args[i])
 
-        # otherwise return NIL
-        self.variables.pop_scope()
-        return Value(Type.NIL)
+            res = None
+            for statement_node in func_node.statements:
+                res = self.statement_handlers[statement_node.opcode](
+                    self, statement_node
+                )
+                # if statement_node is a return, return that value
+                if res:
+                    break
+
+            self.variables.pop_scope()
+            if type(res) is not TailCall:
+                break
+            func_node, args = res.function, res.args
+            # the callee takes the place of the function that called it
+            if governor:
+                governor.charge(func_node)
 
+        # return NIL if there was no return
+        res = res if res else NIL
+        for _ in range(frames):
+            profiler.exit()
+        if governor:
+            governor.exit()
+        if key is not None:
+            self.memo.put(key, res)
+        return res
+
+    # the handlers below call each other through the tables directly, rather than going
+    # through run_statement and evaluate_expression, so a Brewin call doesn't take any
+    # more Python frames than it did before
     def run_statement(self, statement_node):
-        match statement_node.elem_type:
-            # variable definition
-            case "vardef":
-                name = statement_node.dict["name"]
-                if not self.variables.create(name, Value(Type.NIL)):
-                    super().error(
-                        ErrorType.NAME_ERROR,
-                        f"Vardef: Variable {name} defined more than once",
-                    )
-            # assignment
-            case "=":
-                name = statement_node.dict["name"]
-                node = statement_node.dict["expression"]
-                if not self.variables.set(name, self.evaluate_expression(node)):
-                    super().error(
-                        ErrorType.NAME_ERROR,
-                        f"Equal: Variable {name} has not been defined",
-                    )
-            # function call
-            case "fcall":
-                self.run_function_call(statement_node)
-            # if statement
-            case "if":
-                self.variables.push_scope("if")
-
-                condition = statement_node.dict["condition"]
-                statements = statement_node.dict["statements"]
-                else_statements = statement_node.dict["else_statements"]
-
-                # test if statement
-                cond = self.evaluate_expression(condition)
-                if cond.type() != Type.BOOL:
-                    super().error(
-                        ErrorType.TYPE_ERROR,
-                        "Invalid if condition",
-                    )
+        return self.statement_handlers[statement_node.opcode](
+            self, statement_node
+        )
 
-                if cond.value():
-                    for statement in statements:
-                        res = self.run_statement(statement)
-                        if res:
-                            self.variables.pop_scope()
-                            return res
-                # if if statement fails, test else statement
-                else:
-                    if else_statements:
-                        for statement in else_statements:
-                            res = self.run_statement(statement)
-                            if res:
-                                self.variables.pop_scope()
-                                return res
-
-                self.variables.pop_scope()
-            # for loop
-            case "for":
-                # assignment statement
-                init = statement_node.dict["init"]
-                condition = statement_node.dict["condition"]
-                statements = statement_node.dict["statements"]
-
-                self.run_statement(init)
-
-                # condition must be true
-                cond = self.evaluate_expression(condition)
-                if cond.type() != Type.BOOL:
-                    super().error(
-                        ErrorType.TYPE_ERROR,
-                        "Invalid for condition",
+    # variable definition
+    def run_vardef(self, statement_node):
+        name = statement_node.name
+        address = statement_node.address
+        if not self.variables.create(name, NIL, address):
+            super().error(
+                ErrorType.NAME_ERROR,
+                f"Vardef: Variable {name} defined more than once",
+            )
+
+    # assignment
+    def run_assign(self, statement_node):
+        name = statement_node.name
+        node = statement_node.expression
+        address = statement_node.address
+        value = Interpreter.expression_handlers[node.opcode](self, node)
+        if not self.variables.set(name, value, address):
+            super().error(
+                ErrorType.NAME_ERROR,
+                f"Equal: Variable {name} has not been defined",
+            )
+
+    # function call, ignoring what it returns
+    def run_fcall(self, statement_node):
+        self.run_function_call(statement_node)
+
+    # if statement
+    def run_if(self, statement_node):
+        self.variables.push_scope("if", statement_node.layout)
+
+        condition = statement_node.condition
+        statements = statement_node.statements
+        else_statements = statement_node.else_statements
+
+        # test if statement
+        cond = Interpreter.expression_handlers[condition.opcode](self, condition)
+        if cond.type() != Type.BOOL:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Invalid if condition",
+            )
+
+        if cond.value():
+            for statement in statements:
+                res = self.statement_handlers[statement.opcode](self, statement)
+                if res:
+                    self.variables.pop_scope()
+                    return res
+        # if if statement fails, test else statement
+        else:
+            if else_statements:
+                for statement in else_statements:
+                    res = self.statement_handlers[statement.opcode](
+                        self, statement
                     )
+                    if res:
+                        self.variables.pop_scope()
+                        return res
+
+        self.variables.pop_scope()
+
+    # for loop
+    def run_for(self, statement_node):
+        # assignment statement
+        init = statement_node.init
+        condition = statement_node.condition
+        statements = statement_node.statements
 
-                while cond.value():
-                    self.variables.push_scope("for")
-                    for statement in statements:
-                        res = self.run_statement(statement)
-                        if res:
-                            self.variables.pop_scope()
-                            return res
+        self.statement_handlers[init.opcode](self, init)
+
+        # condition must be true
+        cond = Interpreter.expression_handlers[condition.opcode](self, condition)
+        if cond.type() != Type.BOOL:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Invalid for condition",
+            )
+
+        governor = self.governor
+        while cond.value():
+            if governor:
+                governor.charge(statement_node)
+            self.variables.push_scope("for", statement_node.layout)
+            for statement in statements:
+                res = self.statement_handlers[statement.opcode](self, statement)
+                if res:
                     self.variables.pop_scope()
+                    return res
+            self.variables.pop_scope()
 
-                    update = statement_node.dict["update"]
-                    self.run_statement(update)
-                    cond = self.evaluate_expression(condition)
-            # return
-            case "return":
-                expression = statement_node.dict["expression"]
-                return (
-                    self.evaluate_expression(expression)
-                    if expression
-                    else Value(Type.NIL)
-                )
+            update = statement_node.update
+            self.statement_handlers[update.opcode](self, update)
+            cond = Interpreter.expression_handlers[condition.opcode](self, condition)
+
+    # return
+    def run_return(self, statement_node):
+        expression = statement_node.expression
+        if not expression:
+            return NIL
+        if (
+            expression.opcode == Opcode.FCALL
+            and expression.name not in Interpreter.builtin_functions
+        ):
+            return self.run_tail_call(expression)
+        return Interpreter.expression_handlers[expression.opcode](self, expression)
+
+    # calls a function whose result is returned straight away. if the running function's
+    # scopes can't be seen by the callee, this returns a TailCall so run_function can
+    # drop them and run the callee in their place
+    def run_tail_call(self, function_call):
+        arg_nodes = function_call.args
+        function = self.find_function(function_call.name, len(arg_nodes))
+        args = []
+        for arg in arg_nodes:
+            args.append(Interpreter.expression_handlers[arg.opcode](self, arg))
+
+        if self.variables.can_drop_function([arg.name for arg in function.args]):
+            return TailCall(function, args)
+        res = self.run_function(function, args)
+        return res if res else NIL
+
+    # any other node used as a statement does nothing
+    def skip_statement(self, statement_node):
+        return None
 
     def evaluate_expression(self, expression_node):
-        # binary operations
-        if expression_node.elem_type in Interpreter.binary_operators:
-            op1 = self.evaluate_expression(expression_node.dict["op1"])
-            op2 = self.evaluate_expression(expression_node.dict["op2"])
-
-            match expression_node.elem_type:
-                case "+":
-                    if (op1.type() == Type.INT and op2.type() == Type.INT) or (
-                        op1.type() == Type.STRING and op2.type() == Type.STRING
-                    ):
-                        return create_value(op1.value() + op2.value())
+        return Interpreter.expression_handlers[expression_node.opcode](
+            self, expression_node
+        )
 
-                    super().error(
-                        ErrorType.TYPE_ERROR,
-                        "Illegal usage of arithmetic operation on non-integer types",
-                    )
-                case "-":
-                    if op1.type() != Type.INT or op2.type() != Type.INT:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Illegal usage of arithmetic operation on non-integer types",
-                        )
-                    return Value(Type.INT, op1.value() - op2.value())
-                case "*":
-                    if op1.type() != Type.INT or op2.type() != Type.INT:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Illegal usage of arithmetic operation on non-integer types",
-                        )
-                    return Value(Type.INT, op1.value() * op2.value())
-                case "/":
-                    if op1.type() != Type.INT or op2.type() != Type.INT:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Illegal usage of arithmetic operation on non-integer types",
-                        )
-                    return Value(Type.INT, op1.value() // op2.value())
-                case "==":
-                    if op1.type() != op2.type():
-                        return Value(Type.BOOL, False)
-                    return Value(Type.BOOL, op1.value() == op2.value())
-                case "<":
-                    if op1.type() != Type.INT or op2.type() != Type.INT:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Incompatible types for comparison <",
-                        )
-                    return Value(Type.BOOL, op1.value() < op2.value())
-                case "<=":
-                    if op1.type() != Type.INT or op2.type() != Type.INT:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Incompatible types for comparison <=",
-                        )
-                    return Value(Type.BOOL, op1.value() <= op2.value())
-                case ">":
-                    if op1.type() != Type.INT or op2.type() != Type.INT:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Incompatible types for comparison >",
-                        )
-                    return Value(Type.BOOL, op1.value() > op2.value())
-                case ">=":
-                    if op1.type() != Type.INT or op2.type() != Type.INT:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Incompatible types for comparison >=",
-                        )
-                    return Value(Type.BOOL, op1.value() >= op2.value())
-                case "!=":
-                    if op1.type() != op2.type():
-                        return Value(Type.BOOL, True)
-                    return Value(Type.BOOL, op1.value() != op2.value())
-                case "&&":
-                    if op1.type() != Type.BOOL or op2.type() != Type.BOOL:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Incompatible types for comparison &&",
-                        )
-                    left, right = op1.value(), op2.value()
-                    if left is True and right is True:
-                        return Value(Type.BOOL, True)
-                    else:
-                        return Value(Type.BOOL, False)
-                case "||":
-                    if op1.type() != Type.BOOL or op2.type() != Type.BOOL:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Incompatible types for comparison ||",
-                        )
-                    left, right = op1.value(), op2.value()
-                    if left is True or right is True:
-                        return Value(Type.BOOL, True)
-                    else:
-                        return Value(Type.BOOL, False)
+    def evaluate_binary_operation(self, expression_node):
+        left = expression_node.op1
+        right = expression_node.op2
+        op1 = Interpreter.expression_handlers[left.opcode](self, left)
+        op2 = Interpreter.expression_handlers[right.opcode](self, right)
+        return Interpreter.operation_handlers[expression_node.opcode](self, op1, op2)
+
+    # value node
+    def evaluate_value(self, expression_node):
+        return create_value(expression_node.val)
+
+    def evaluate_nil(self, expression_node):
+        return NIL
+
+    # variable node
+    def evaluate_variable(self, expression_node):
+        name = expression_node.name
+        address = expression_node.address
+        result = self.variables.get(name, address)
+        if result is None:
+            super().error(
+                ErrorType.NAME_ERROR,
+                f"EE Var: Variable {name} has not been defined",
+            )
+        return result
+
+    # unary operations
+    def evaluate_negate(self, expression_node):
+        op1 = expression_node.op1
+        return self.negate(Interpreter.expression_handlers[op1.opcode](self, op1))
+
+    def evaluate_not(self, expression_node):
+        op1 = expression_node.op1
+        return self.logical_not(Interpreter.expression_handlers[op1.opcode](self, op1))
+
+    # any other node used as an expression has no value
+    def evaluate_nothing(self, expression_node):
+        return None
+
+    # evaluates an expression made only of constants for the ConstantFolder, returning
+    # None (and forgetting the error) if it fails
+    def evaluate_constant(self, expression_node):
+        error_type, error_line = self.error_type, self.error_line
+        try:
+            return self.evaluate_expression(expression_node)
+        except Exception:
+            self.error_type, self.error_line = error_type, error_line
+            return None
+
+    # operations shared by every execution mode, applied to already evaluated operands
+    def add(self, op1, op2):
+        if op1.type() == Type.INT and op2.type() == Type.INT:
+            return int_value(op1.value() + op2.value())
+        if op1.type() == Type.STRING and op2.type() == Type.STRING:
+            result = concat(op1, op2)
+            # concatenation is how a program builds strings that keep growing
+            if self.governor:
+                self.governor.allocate(STRING_SIZE + len(op2.value()))
+            return result
+
+        super().error(
+            ErrorType.TYPE_ERROR,
+            "Illegal usage of arithmetic operation on non-integer types",
+        )
+
+    def subtract(self, op1, op2):
+        if op1.type() != Type.INT or op2.type() != Type.INT:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Illegal usage of arithmetic operation on non-integer types",
+            )
+        return int_value(op1.value() - op2.value())
+
+    def multiply(self, op1, op2):
+        if op1.type() != Type.INT or op2.type() != Type.INT:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Illegal usage of arithmetic operation on non-integer types",
+            )
+        return int_value(op1.value() * op2.value())
+
+    def divide(self, op1, op2):
+        if op1.type() != Type.INT or op2.type() != Type.INT:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Illegal usage of arithmetic operation on non-integer types",
+            )
+        return int_value(op1.value() // op2.value())
+
+    def equal(self, op1, op2):
+        if op1.type() != op2.type():
+            return FALSE
+        return bool_value(op1.value() == op2.value())
+
+    def less(self, op1, op2):
+        if op1.type() != Type.INT or op2.type() != Type.INT:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Incompatible types for comparison <",
+            )
+        return bool_value(op1.value() < op2.value())
+
+    def less_equal(self, op1, op2):
+        if op1.type() != Type.INT or op2.type() != Type.INT:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Incompatible types for comparison <=",
+            )
+        return bool_value(op1.value() <= op2.value())
+
+    def greater(self, op1, op2):
+        if op1.type() != Type.INT or op2.type() != Type.INT:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Incompatible types for comparison >",
+            )
+        return bool_value(op1.value() > op2.value())
+
+    def greater_equal(self, op1, op2):
+        if op1.type() != Type.INT or op2.type() != Type.INT:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Incompatible types for comparison >=",
+            )
+        return bool_value(op1.value() >= op2.value())
+
+    def not_equal(self, op1, op2):
+        if op1.type() != op2.type():
+            return TRUE
+        return bool_value(op1.value() != op2.value())
+
+    def logical_and(self, op1, op2):
+        if op1.type() != Type.BOOL or op2.type() != Type.BOOL:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Incompatible types for comparison &&",
+            )
+        left, right = op1.value(), op2.value()
+        if left is True and right is True:
+            return TRUE
         else:
-            match expression_node.elem_type:
-                # value node
-                case "int" | "string" | "bool":
-                    return create_value(expression_node.dict["val"])
-                case "nil":
-                    return Value(Type.NIL)
-                # variable node
-                case "var":
-                    name = expression_node.dict["name"]
-                    result = self.variables.get(name)
-                    if result is None:
-                        super().error(
-                            ErrorType.NAME_ERROR,
-                            f"EE Var: Variable {name} has not been defined",
-                        )
-                    return result
-                # unary operations
-                case "neg":
-                    op1 = self.evaluate_expression(expression_node.dict["op1"])
-                    if op1.type() != Type.INT and op1.type() != Type.STRING:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Invalid negation type",
-                        )
-                    return Value(Type.INT, -op1.value())
-                case "!":
-                    op1 = self.evaluate_expression(expression_node.dict["op1"])
-                    if op1.type() != Type.BOOL:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Illegal usage of not operation on non-boolean type",
-                        )
-                    return (
-                        Value(Type.BOOL, True)
-                        if op1.value() is False
-                        else Value(Type.BOOL, False)
-                    )
-                # function call
-                case "fcall":
-                    return self.run_function_call(expression_node)
+            return FALSE
+
+    def logical_or(self, op1, op2):
+        if op1.type() != Type.BOOL or op2.type() != Type.BOOL:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Incompatible types for comparison ||",
+            )
+        left, right = op1.value(), op2.value()
+        if left is True or right is True:
+            return TRUE
+        else:
+            return FALSE
+
+    def negate(self, op1):
+        if op1.type() != Type.INT and op1.type() != Type.STRING:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Invalid negation type",
+            )
+        return int_value(-op1.value())
+
+    def logical_not(self, op1):
+        if op1.type() != Type.BOOL:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Illegal usage of not operation on non-boolean type",
+            )
+        return TRUE if op1.value() is False else FALSE
+
+    # maps each binary operator to the method that applies it
+    operations = {
+        "+": add,
+        "-": subtract,
+        "*": multiply,
+        "/": divide,
+        "==": equal,
+        "<": less,
+        "<=": less_equal,
+        ">": greater,
+        ">=": greater_equal,
+        "!=": not_equal,
+        "&&": logical_and,
+        "||": logical_or,
+    }
 
     def run_function_call(self, function_call):
-        name = function_call.dict["name"]
-        arg_nodes = function_call.dict["args"]
+        name = function_call.name
+        arg_nodes = function_call.args
         match name:
             case "print":
-                res = ""
-                for arg in function_call.dict["args"]:
-                    res += get_printable(self.evaluate_expression(arg))
-
-                super().output(res)
-                return Value(Type.NIL)
+                values = [
+                    Interpreter.expression_handlers[arg.opcode](self, arg)
+                    for arg in function_call.args
+                ]
+                super().output(format_line(values))
+                return NIL
             case "inputi":
-                if len(function_call.dict["args"]) > 1:
+                if len(function_call.args) > 1:
                     super().error(
                         ErrorType.NAME_ERROR,
                         "No inputi() function found that takes > 1 parameter",
                     )
-                elif len(function_call.dict["args"]) == 1:
-                    super().output(function_call.dict["args"][0].dict["val"])
+                elif len(function_call.args) == 1:
+                    super().output(function_call.args[0].val)
 
-                return Value(Type.INT, int(super().get_input()))
+                return int_value(int(super().get_input()))
             case "inputs":
-                if len(function_call.dict["args"]) > 1:
+                if len(function_call.args) > 1:
                     super().error(
                         ErrorType.NAME_ERROR,
                         "No inputs() function found that takes > 1 parameter",
                     )
-                elif len(function_call.dict["args"]) == 1:
-                    super().output(function_call.dict["args"][0].dict["val"])
+                elif len(function_call.args) == 1:
+                    super().output(function_call.args[0].val)
 
                 return Value(Type.STRING, super().get_input())
             case _:
-                for function in self.functions:
-                    # if same name and same amount of args
-                    if function.dict["name"] == name and len(arg_nodes) == len(
-                        function.dict["args"]
-                    ):
-                        args = []
-                        for arg in arg_nodes:
-                            args.append(self.evaluate_expression(arg))
-                        res = self.run_function(function, args)
-                        # return NIL if no return value
-                        return res if res else Value(Type.NIL)
-
-                super().error(
-                    ErrorType.NAME_ERROR,
-                    f"Function {name} has not been defined",
-                )
+                function = self.find_function(name, len(arg_nodes))
+                args = []
+                for arg in arg_nodes:
+                    args.append(Interpreter.expression_handlers[arg.opcode](self, arg))
+                res = self.run_function(function, args)
+                # return NIL if no return value
+                return res if res else NIL
+
+    # handlers indexed by opcode, for run_statement and evaluate_expression
+    statement_handlers = handler_table(
+        {
+            Opcode.VAR_DEF: run_vardef,
+            Opcode.ASSIGN: run_assign,
+            Opcode.FCALL: run_fcall,
+            Opcode.IF: run_if,
+            Opcode.FOR: run_for,
+            Opcode.RETURN: run_return,
+        },
+        skip_statement,
+    )
+    expression_handlers = handler_table(
+        {
+            **dict.fromkeys(
+                (InterpreterBase.OPCODES[op] for op in operations),
+                evaluate_binary_operation,
+            ),
+            Opcode.INT: evaluate_value,
+            Opcode.STRING: evaluate_value,
+            Opcode.BOOL: evaluate_value,
+            Opcode.NIL: evaluate_nil,
+            Opcode.VAR: evaluate_variable,
+            Opcode.NEG: evaluate_negate,
+            Opcode.NOT: evaluate_not,
+            Opcode.FCALL: run_function_call,
+        },
+        evaluate_nothing,
+    )
+    operation_handlers = handler_table(
+        {InterpreterBase.OPCODES[op]: method for op, method in operations.items()}
+    )
 
 
 if __name__ == "__main__":
@@ -1,7 +1,27 @@
-from intbase import InterpreterBase, ErrorType
-from brewparse import parse_program
+from intbase import InterpreterBase, ErrorType, Opcode, TailCall, handler_table
+from program_cache import load_program
+from folder import ConstantFolder
 from env_v3 import EnvironmentManager
-from type_valuev3 import Type, Value, create_value, get_printable
+from compiler_v3 import Compiler
+from vm_v3 import VirtualMachine
+from memo import MemoTable, find_pure_functions, memo_key
+from profiler import Profiler
+from governor import DEPTH, STRING_SIZE, STRUCT_SIZE, FIELD_SIZE
+from type_valuev3 import (
+    Type,
+    Value,
+    TRUE,
+    FALSE,
+    NIL,
+    VOID,
+    Struct,
+    StructLayout,
+    bool_value,
+    int_value,
+    create_value,
+    concat,
+    format_line,
+)
 
 
 class Interpreter(InterpreterBase):
@@ -20,28 +40,58 @@ class Interpreter(InterpreterBase):
         "||",
     }
     default_types = {"bool": False, "int": 0, "string": "", "void": None}
-
-    def __init__(self, console_output=True, inp=None, trace_output=False):
+    builtin_functions = {"print", "inputi", "inputs"}
+
+    def __init__(
+        self,
+        console_output=True,
+        inp=None,
+        trace_output=False,
+        mode=InterpreterBase.TREE_MODE,
+        memo_size=None,
+        output_sink=None,
+        governor=None,
+    ):
         # call InterpreterBase's constructor
-        super().__init__(console_output, inp)
-        self.functions = []
+        super().__init__(console_output, inp, output_sink)
+        self.functions = {}  # (name, arg count) : function node
+        self.mode = mode
+        # limits on how long the program can run, if any (see governor.py)
+        self.governor = governor
+        # results of pure functions, if memo_size is set
+        self.memo = MemoTable(memo_size) if memo_size else None
+        self.pure_functions = set()
         self.structs = {}
+        self.struct_layouts = {}  # struct name : StructLayout
+        # counts calls, time and the statements run on each line when trace_output is
+        # set (see profiler.py). statements are counted by running them through a copy
+        # of the handler table that counts each one first
+        self.profiler = Profiler() if trace_output else None
+        if self.profiler:
+            self.statement_handlers = [
+                self.profiler.counting(handler)
+                for handler in Interpreter.statement_handlers
+            ]
 
     def run(self, program):
-        ast = parse_program(program)
         self.variables = EnvironmentManager()
+        ast = load_program(
+            program, "v3", ConstantFolder(self.evaluate_constant).fold_program
+        )
 
-        for struct in ast.dict["structs"]:
-            self.structs[struct.dict["name"]] = struct
+        for struct in ast.structs:
+            self.structs[struct.name] = struct
+        for name, struct in self.structs.items():
+            self.struct_layouts[name] = self.create_struct_layout(struct)
 
         main_func_node = None
-        for function in ast.dict["functions"]:
-            name = function.dict["name"]
+        for function in ast.functions:
+            name = function.name
             # check invalid args
-            for arg in function.dict["args"]:
+            for arg in function.args:
                 if (
-                    arg.dict["var_type"] not in Interpreter.default_types
-                    and arg.dict["var_type"] not in self.structs
+                    arg.var_type not in Interpreter.default_types
+                    and arg.var_type not in self.structs
                 ):
                     super().error(
                         ErrorType.TYPE_ERROR,
@@ -49,8 +99,8 @@ class Interpreter(InterpreterBase):
                     )
             # check invalid returns
             if (
-                function.dict["return_type"] not in Interpreter.default_types
-                and function.dict["return_type"] not in self.structs
+                function.return_type not in Interpreter.default_types
+                and function.return_type not in self.structs
             ):
                 super().error(
                     ErrorType.TYPE_ERROR,
@@ -59,461 +109,651 @@ class Interpreter(InterpreterBase):
             if name == "main":
                 main_func_node = function
             else:
-                self.functions.append(function)
+                # if overloaded with the same arg count, the first definition wins
+                key = (name, len(function.args))
+                self.functions.setdefault(key, function)
 
         if not main_func_node:
             super().error(
                 ErrorType.NAME_ERROR,
                 "No main() function was found",
             )
-        self.run_function(main_func_node)
 
-    def run_function(self, func_node, args=None):
-        self.variables.push_scope("function")
-        # temp_args is the args within the function
-        # args is the information that's being passed into the function
-        temp_args = func_node.dict["args"]
-        return_type = func_node.dict["return_type"]
-
-        # instantiate args with the right values
-        for i in range(len(temp_args)):
-            name = temp_args[i].dict["name"]
-            type = temp_args[i].dict["var_type"]
-
-            # assigning an int to a bool
-            if type == Type.BOOL and args[i].type() == Type.INT:
-                args[i] = self.check_bool(args[i])
-            if type not in self.structs and args[i].type() != type:
-                super().error(
-                    ErrorType.TYPE_ERROR,
-                    f"{args[i].type()} cannot be assigned to a {type}",
-                )
-            if (
-                type in self.structs
-                and args[i].type() in self.structs
-                and type != args[i].type()
-            ):
-                super().error(
-                    ErrorType.TYPE_ERROR,
-                    f"Struct type {args[i].type()} cannot be assigned to struct type {type}",
-                )
-            if args[i].type() == Type.NIL and type in self.structs:
-                self.variables.create(name, Value(type))
+        if self.memo:
+            # no structs, since their fields can change
+            self.pure_functions = find_pure_functions(
+                self.functions, {"int", "string", "bool"}
+            )
+
+        if self.governor:
+            self.governor.start(self)
+        # started right before the try, so whatever it changes is always undone
+        if self.profiler:
+            self.profiler.start()
+        try:
+            if self.mode == InterpreterBase.COMPILED_MODE:
+                Compiler(self).function(main_func_node)(None)
+            elif self.mode == InterpreterBase.VM_MODE:
+                VirtualMachine(self).run_function(main_func_node)
             else:
-                self.variables.create(name, args[i])
+                self.run_function(main_func_node)
+        except RecursionError:
+            # with a governor, a program too deep for the Python stack stops the same
+            # way as one going past max_depth
+            if not self.governor:
+                raise
+            self.governor.stop(DEPTH, "Python recursion limit exceeded")
+        finally:
+            # write out anything still buffered, even if the program failed
+            self.output_sink.flush()
+            if self.profiler:
+                self.profiler.finish()
+            if self.governor:
+                self.governor.finish()
+
+    # returns the function called name that takes arg_count args
+    def find_function(self, name, arg_count):
+        function = self.functions.get((name, arg_count))
+        if function is None:
+            super().error(
+                ErrorType.NAME_ERROR,
+                f"Function {name} has not been defined",
+            )
+        return function
 
-        for statement_node in func_node.dict["statements"]:
-            res = self.run_statement(statement_node)
+    def run_function(self, func_node, args=None):
+        # a pure function called with the same args as before gives the same result
+        key = None
+        if func_node in self.pure_functions:
+            key = memo_key(func_node, args)
+            if key is not None:
+                res = self.memo.get(key)
+                if res is not None:
+                    return res
+
+        # return types of the functions that tail called the one running, whose checks
+        # still apply to its result. a type that's the same as the one before it is left
+        # out, since checking the same type twice does nothing more
+        pending_types = []
+
+        # each pass runs one function; a tail call replaces it with the callee
+        profiler = self.profiler
+        frames = 0  # functions entered in the profiler, exited once the last returns
+        governor = self.governor
+        if governor:
+            governor.enter(func_node)
+        while True:
+            if profiler:
+                # a tail call shows up as called by the function it replaced
+                profiler.enter(func_node)
+                frames += 1
+            self.variables.push_scope("function", func_node.layout)
+            self.create_args(func_node, args)
+            return_type = func_node.return_type
+
+            res = None
+            for statement_node in func_node.statements:
+                res = self.statement_handlers[statement_node.opcode](
+                    self, statement_node
+                )
 
-            # if statement_node is a return, return that value
-            if res:
-                self.variables.pop_scope()
-                if res.type() == Type.VOID:
-                    return self.return_default(return_type)
-                self.check_return(return_type, res)
-                return res
+                # if statement_node is a return, return that value
+                if res:
+                    break
+
+            self.variables.pop_scope()
+            if type(res) is not TailCall:
+                break
+            if not pending_types or pending_types[-1] != return_type:
+                pending_types.append(return_type)
+            func_node, args = res.function, res.args
+            # the callee takes the place of the function that called it
+            if governor:
+                governor.charge(func_node)
+
+        if res:
+            res = self.finish_return(return_type, res)
+        else:
+            # otherwise, return the default return value
+            res = self.return_default(return_type)
+        for return_type in reversed(pending_types):
+            res = self.finish_return(return_type, res)
+        for _ in range(frames):
+            profiler.exit()
+        if governor:
+            governor.exit()
+        if key is not None:
+            self.memo.put(key, res)
+        return res
+
+    # creates the function's args in the current scope after checking their types
+    def create_args(self, func_node, args):
+        # func_node.args is the args within the function
+        # args is the information that's being passed into the function
+        for i in range(len(func_node.args)):
+            self.create_arg(func_node.args[i], args[i])
+
+    # creates the arg described by arg_node with the value passed for it
+    def create_arg(self, arg_node, value):
+        name = arg_node.name
+        type = arg_node.var_type
+
+        # assigning an int to a bool
+        if type == Type.BOOL and value.type() == Type.INT:
+            value = self.check_bool(value)
+        if type not in self.structs and value.type() != type:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                f"{value.type()} cannot be assigned to a {type}",
+            )
+        if (
+            type in self.structs
+            and value.type() in self.structs
+            and type != value.type()
+        ):
+            super().error(
+                ErrorType.TYPE_ERROR,
+                f"Struct type {value.type()} cannot be assigned to struct type {type}",
+            )
+        if value.type() == Type.NIL and type in self.structs:
+            self.variables.create(name, Value(type))
+        else:
+            self.variables.create(name, value)
 
-        # otherwise, return the default return value
-        self.variables.pop_scope()
-        return self.return_default(return_type)
+    # checks a returned value against the function's return type
+    def finish_return(self, return_type, res):
+        if res.type() == Type.VOID:
+            return self.return_default(return_type)
+        return self.check_return(return_type, res)
 
+    # the handlers below call each other through the tables directly, rather than going
+    # through run_statement and evaluate_expression, so a Brewin call doesn't take any
+    # more Python frames than it did before
     def run_statement(self, statement_node):
-        match statement_node.elem_type:
-            # variable definition
-            case "vardef":
-                name = statement_node.dict["name"]
-                type = statement_node.dict["var_type"]
-                self.type_to_variable(name, type)
-            # assignment
-            case "=":
-                name = statement_node.dict["name"]
-                node = statement_node.dict["expression"]
-                value = self.evaluate_expression(node)
-
-                # if struct variable
-                if "." in name:
-                    self.set_nested_variable(name, value)
-                else:
-                    if not self.variables.get(name):
-                        super().error(
-                            ErrorType.NAME_ERROR,
-                            f"Assign: Variable {name} has not been defined",
-                        )
+        return self.statement_handlers[statement_node.opcode](
+            self, statement_node
+        )
+
+    # variable definition
+    def run_vardef(self, statement_node):
+        name = statement_node.name
+        type = statement_node.var_type
+        self.type_to_variable(name, type, statement_node.address)
+
+    # assignment
+    def run_assign(self, statement_node):
+        name = statement_node.name
+        node = statement_node.expression
+        address = statement_node.address
+        value = Interpreter.expression_handlers[node.opcode](self, node)
+
+        # if struct variable
+        if statement_node.path:
+            self.set_nested_variable(name, value, address, statement_node.path)
+        else:
+            self.assign_variable(name, value, address)
 
-                    type = self.variables.get(name).type()
-                    self.check_return(type, value)
-
-                    # setting the variable
-                    if type in self.structs and value.type() == Type.NIL:
-                        res = self.variables.set(name, Value(type))
-                    else:
-                        if value.type() == Type.NIL:
-                            super().error(
-                                ErrorType.TYPE_ERROR,
-                                f"Assign: Assigning {name} with a nil type",
-                            )
-                        res = self.variables.set(name, value)
-                        if not res:
-                            super().error(
-                                ErrorType.NAME_ERROR,
-                                f"Assign: Unable to set {name}",
-                            )
-            # function call
-            case "fcall":
-                self.run_function_call(statement_node)
-            # if statement
-            case "if":
-                self.variables.push_scope("if")
-
-                condition = statement_node.dict["condition"]
-                statements = statement_node.dict["statements"]
-                else_statements = statement_node.dict["else_statements"]
-
-                # test if statement
-                cond = self.evaluate_expression(condition)
-                # coercion if int
-                cond = self.check_bool(cond)
-
-                if cond.type() != Type.BOOL:
-                    super().error(
-                        ErrorType.TYPE_ERROR,
-                        "Invalid if condition",
-                    )
+    # function call, ignoring what it returns
+    def run_fcall(self, statement_node):
+        self.run_function_call(statement_node)
 
-                if cond.value():
-                    for statement in statements:
-                        res = self.run_statement(statement)
-                        if res:
-                            self.variables.pop_scope()
-                            return res
-                # if if statement fails, test else statement
-                else:
-                    if else_statements:
-                        for statement in else_statements:
-                            res = self.run_statement(statement)
-                            if res:
-                                self.variables.pop_scope()
-                                return res
-
-                self.variables.pop_scope()
-            # for loop
-            case "for":
-                # assignment statement
-                init = statement_node.dict["init"]
-                condition = statement_node.dict["condition"]
-                statements = statement_node.dict["statements"]
-
-                self.run_statement(init)
-
-                # condition must be true
-                cond = self.evaluate_expression(condition)
-                # coercion if int
-                cond = self.check_bool(cond)
-
-                if cond.type() != Type.BOOL:
-                    super().error(
-                        ErrorType.TYPE_ERROR,
-                        "Invalid for condition",
-                    )
+    # if statement
+    def run_if(self, statement_node):
+        self.variables.push_scope("if", statement_node.layout)
+
+        condition = statement_node.condition
+        statements = statement_node.statements
+        else_statements = statement_node.else_statements
+
+        # test if statement
+        cond = Interpreter.expression_handlers[condition.opcode](self, condition)
+        # coercion if int
+        cond = self.check_bool(cond)
+
+        if cond.type() != Type.BOOL:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Invalid if condition",
+            )
 
-                while cond.value():
-                    self.variables.push_scope("for")
-                    for statement in statements:
-                        res = self.run_statement(statement)
-                        if res:
-                            self.variables.pop_scope()
-                            return res
+        if cond.value():
+            for statement in statements:
+                res = self.statement_handlers[statement.opcode](self, statement)
+                if res:
                     self.variables.pop_scope()
+                    return res
+        # if if statement fails, test else statement
+        else:
+            if else_statements:
+                for statement in else_statements:
+                    res = self.statement_handlers[statement.opcode](
+                        self, statement
+                    )
+                    if res:
+                        self.variables.pop_scope()
+                        return res
 
-                    update = statement_node.dict["update"]
-                    self.run_statement(update)
-                    cond = self.evaluate_expression(condition)
-            # return
-            case "return":
-                expression = statement_node.dict["expression"]
-                return (
-                    self.evaluate_expression(expression)
-                    if expression
-                    else Value(Type.VOID)
-                )
+        self.variables.pop_scope()
+
+    # for loop
+    def run_for(self, statement_node):
+        # assignment statement
+        init = statement_node.init
+        condition = statement_node.condition
+        statements = statement_node.statements
+
+        self.statement_handlers[init.opcode](self, init)
+
+        # condition must be true
+        cond = Interpreter.expression_handlers[condition.opcode](self, condition)
+        # coercion if int
+        cond = self.check_bool(cond)
+
+        if cond.type() != Type.BOOL:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Invalid for condition",
+            )
+
+        governor = self.governor
+        while cond.value():
+            if governor:
+                governor.charge(statement_node)
+            self.variables.push_scope("for", statement_node.layout)
+            for statement in statements:
+                res = self.statement_handlers[statement.opcode](self, statement)
+                if res:
+                    self.variables.pop_scope()
+                    return res
+            self.variables.pop_scope()
+
+            update = statement_node.update
+            self.statement_handlers[update.opcode](self, update)
+            cond = Interpreter.expression_handlers[condition.opcode](self, condition)
+
+    # return
+    def run_return(self, statement_node):
+        expression = statement_node.expression
+        if not expression:
+            return VOID
+        if (
+            expression.opcode == Opcode.FCALL
+            and expression.name not in Interpreter.builtin_functions
+        ):
+            return self.run_tail_call(expression)
+        return Interpreter.expression_handlers[expression.opcode](self, expression)
+
+    # calls a function whose result is returned straight away. if the running function's
+    # scopes can't be seen by the callee, this returns a TailCall so run_function can
+    # drop them and run the callee in their place
+    def run_tail_call(self, function_call):
+        arg_nodes = function_call.args
+        function = self.find_function(function_call.name, len(arg_nodes))
+        args = []
+        for arg in arg_nodes:
+            args.append(Interpreter.expression_handlers[arg.opcode](self, arg))
+
+        if self.variables.can_drop_function([arg.name for arg in function.args]):
+            return TailCall(function, args)
+        res = self.run_function(function, args)
+        return res if res else VOID
+
+    # any other node used as a statement does nothing
+    def skip_statement(self, statement_node):
+        return None
 
     def evaluate_expression(self, expression_node):
-        # binary operations
-        if expression_node.elem_type in Interpreter.binary_operators:
-            op1 = self.evaluate_expression(expression_node.dict["op1"])
-            op2 = self.evaluate_expression(expression_node.dict["op2"])
-
-            # print("op1", op1.type(), op1.value())
-            # print("op2", op2.type(), op2.value())
-
-            match expression_node.elem_type:
-                case "+":
-                    if (op1.type() == Type.INT and op2.type() == Type.INT) or (
-                        op1.type() == Type.STRING and op2.type() == Type.STRING
-                    ):
-                        return create_value(op1.value() + op2.value())
-                    super().error(
-                        ErrorType.TYPE_ERROR,
-                        "Illegal usage of arithmetic operation on non-integer types",
-                    )
-                case "-":
-                    if op1.type() != Type.INT or op2.type() != Type.INT:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Illegal usage of arithmetic operation on non-integer types",
-                        )
-                    return Value(Type.INT, op1.value() - op2.value())
-                case "*":
-                    if op1.type() != Type.INT or op2.type() != Type.INT:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Illegal usage of arithmetic operation on non-integer types",
-                        )
-                    return Value(Type.INT, op1.value() * op2.value())
-                case "/":
-                    if op1.type() != Type.INT or op2.type() != Type.INT:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Illegal usage of arithmetic operation on non-integer types",
-                        )
-                    return Value(Type.INT, op1.value() // op2.value())
-                case "==":
-                    if op1.type() == Type.VOID or op2.type() == Type.VOID:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Comparing with a void value",
-                        )
-                    if (
-                        op1.type() in self.structs or op2.type() in self.structs
-                    ) and not (
-                        op1.type() == op2.type()
-                        or op1.type() == Type.NIL
-                        or op2.type() == Type.NIL
-                    ):
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Comparing a struct type to a different type",
-                        )
-                    if op1.value() is None and op2.value() is None:
-                        return Value(Type.BOOL, True)
-                    if op1.type() == Type.BOOL or op2.type() == Type.BOOL:
-                        op1 = self.check_bool(op1)
-                        op2 = self.check_bool(op2)
-                    if (
-                        op1.type() in Interpreter.default_types
-                        or op2.type() in Interpreter.default_types
-                    ) and op1.type() != op2.type():
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Comparing different primitive types",
-                        )
-                    return Value(Type.BOOL, op1.value() == op2.value())
-                case "<":
-                    if op1.type() != Type.INT or op2.type() != Type.INT:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Incompatible types for comparison <",
-                        )
-                    return Value(Type.BOOL, op1.value() < op2.value())
-                case "<=":
-                    if op1.type() != Type.INT or op2.type() != Type.INT:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Incompatible types for comparison <=",
-                        )
-                    return Value(Type.BOOL, op1.value() <= op2.value())
-                case ">":
-                    if op1.type() != Type.INT or op2.type() != Type.INT:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Incompatible types for comparison >",
-                        )
-                    return Value(Type.BOOL, op1.value() > op2.value())
-                case ">=":
-                    if op1.type() != Type.INT or op2.type() != Type.INT:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Incompatible types for comparison >=",
-                        )
-                    return Value(Type.BOOL, op1.value() >= op2.value())
-                case "!=":
-                    if op1.type() == Type.VOID or op2.type() == Type.VOID:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Comparing with a void value",
-                        )
-                    if (
-                        op1.type() in self.structs or op2.type() in self.structs
-                    ) and not (
-                        op1.type() == op2.type()
-                        or op1.type() == Type.NIL
-                        or op2.type() == Type.NIL
-                    ):
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Comparing a struct type to a different type",
-                        )
-                    if op1.value() is None and op2.value() is None:
-                        return Value(Type.BOOL, False)
-                    if op1.type() == Type.BOOL or op2.type() == Type.BOOL:
-                        op1 = self.check_bool(op1)
-                        op2 = self.check_bool(op2)
-                    if (
-                        op1.type() in Interpreter.default_types
-                        or op2.type() in Interpreter.default_types
-                    ) and op1.type() != op2.type():
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Comparing different primitive types",
-                        )
-                    return Value(Type.BOOL, op1.value() != op2.value())
-                case "&&":
-                    op1 = self.check_bool(op1)
-                    op2 = self.check_bool(op2)
-                    if op1.type() != Type.BOOL or op2.type() != Type.BOOL:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Incompatible types for comparison &&",
-                        )
-                    left, right = op1.value(), op2.value()
-                    if left is True and right is True:
-                        return Value(Type.BOOL, True)
-                    else:
-                        return Value(Type.BOOL, False)
-                case "||":
-                    op1 = self.check_bool(op1)
-                    op2 = self.check_bool(op2)
-                    if op1.type() != Type.BOOL or op2.type() != Type.BOOL:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Incompatible types for comparison ||",
-                        )
-                    left, right = op1.value(), op2.value()
-                    if left is True or right is True:
-                        return Value(Type.BOOL, True)
-                    else:
-                        return Value(Type.BOOL, False)
+        return Interpreter.expression_handlers[expression_node.opcode](
+            self, expression_node
+        )
+
+    def evaluate_binary_operation(self, expression_node):
+        left = expression_node.op1
+        right = expression_node.op2
+        op1 = Interpreter.expression_handlers[left.opcode](self, left)
+        op2 = Interpreter.expression_handlers[right.opcode](self, right)
+        return Interpreter.operation_handlers[expression_node.opcode](self, op1, op2)
+
+    # value node
+    def evaluate_value(self, expression_node):
+        return create_value(expression_node.val)
+
+    def evaluate_nil(self, expression_node):
+        return NIL
+
+    # variable node
+    def evaluate_variable(self, expression_node):
+        name = expression_node.name
+        address = expression_node.address
+        return self.get_nested_variable(name, address, expression_node.path)
+
+    # unary operations
+    def evaluate_negate(self, expression_node):
+        op1 = expression_node.op1
+        return self.negate(Interpreter.expression_handlers[op1.opcode](self, op1))
+
+    def evaluate_not(self, expression_node):
+        op1 = expression_node.op1
+        return self.logical_not(Interpreter.expression_handlers[op1.opcode](self, op1))
+
+    # new instance
+    def evaluate_new(self, expression_node):
+        return self.new_struct(expression_node.var_type)
+
+    # any other node used as an expression has no value
+    def evaluate_nothing(self, expression_node):
+        return None
+
+    # evaluates an expression made only of constants for the ConstantFolder, returning
+    # None (and forgetting the error) if it fails
+    def evaluate_constant(self, expression_node):
+        error_type, error_line = self.error_type, self.error_line
+        try:
+            return self.evaluate_expression(expression_node)
+        except Exception:
+            self.error_type, self.error_line = error_type, error_line
+            return None
+
+    # operations shared by every execution mode, applied to already evaluated operands
+    def add(self, op1, op2):
+        if op1.type() == Type.INT and op2.type() == Type.INT:
+            return int_value(op1.value() + op2.value())
+        if op1.type() == Type.STRING and op2.type() == Type.STRING:
+            result = concat(op1, op2)
+            # concatenation is how a program builds strings that keep growing
+            if self.governor:
+                self.governor.allocate(STRING_SIZE + len(op2.value()))
+            return result
+
+        super().error(
+            ErrorType.TYPE_ERROR,
+            "Illegal usage of arithmetic operation on non-integer types",
+        )
+
+    def subtract(self, op1, op2):
+        if op1.type() != Type.INT or op2.type() != Type.INT:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Illegal usage of arithmetic operation on non-integer types",
+            )
+        return int_value(op1.value() - op2.value())
+
+    def multiply(self, op1, op2):
+        if op1.type() != Type.INT or op2.type() != Type.INT:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Illegal usage of arithmetic operation on non-integer types",
+            )
+        return int_value(op1.value() * op2.value())
+
+    def divide(self, op1, op2):
+        if op1.type() != Type.INT or op2.type() != Type.INT:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Illegal usage of arithmetic operation on non-integer types",
+            )
+        return int_value(op1.value() // op2.value())
+
+    def equal(self, op1, op2):
+        if op1.type() == Type.VOID or op2.type() == Type.VOID:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Comparing with a void value",
+            )
+        if (op1.type() in self.structs or op2.type() in self.structs) and not (
+            op1.type() == op2.type() or op1.type() == Type.NIL or op2.type() == Type.NIL
+        ):
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Comparing a struct type to a different type",
+            )
+        if op1.value() is None and op2.value() is None:
+            return TRUE
+        if op1.type() == Type.BOOL or op2.type() == Type.BOOL:
+            op1 = self.check_bool(op1)
+            op2 = self.check_bool(op2)
+        if (
+            op1.type() in Interpreter.default_types
+            or op2.type() in Interpreter.default_types
+        ) and op1.type() != op2.type():
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Comparing different primitive types",
+            )
+        return bool_value(op1.value() == op2.value())
+
+    def less(self, op1, op2):
+        if op1.type() != Type.INT or op2.type() != Type.INT:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Incompatible types for comparison <",
+            )
+        return bool_value(op1.value() < op2.value())
+
+    def less_equal(self, op1, op2):
+        if op1.type() != Type.INT or op2.type() != Type.INT:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Incompatible types for comparison <=",
+            )
+        return bool_value(op1.value() <= op2.value())
+
+    def greater(self, op1, op2):
+        if op1.type() != Type.INT or op2.type() != Type.INT:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Incompatible types for comparison >",
+            )
+        return bool_value(op1.value() > op2.value())
+
+    def greater_equal(self, op1, op2):
+        if op1.type() != Type.INT or op2.type() != Type.INT:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Incompatible types for comparison >=",
+            )
+        return bool_value(op1.value() >= op2.value())
+
+    def not_equal(self, op1, op2):
+        if op1.type() == Type.VOID or op2.type() == Type.VOID:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Comparing with a void value",
+            )
+        if (op1.type() in self.structs or op2.type() in self.structs) and not (
+            op1.type() == op2.type() or op1.type() == Type.NIL or op2.type() == Type.NIL
+        ):
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Comparing a struct type to a different type",
+            )
+        if op1.value() is None and op2.value() is None:
+            return FALSE
+        if op1.type() == Type.BOOL or op2.type() == Type.BOOL:
+            op1 = self.check_bool(op1)
+            op2 = self.check_bool(op2)
+        if (
+            op1.type() in Interpreter.default_types
+            or op2.type() in Interpreter.default_types
+        ) and op1.type() != op2.type():
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Comparing different primitive types",
+            )
+        return bool_value(op1.value() != op2.value())
+
+    def logical_and(self, op1, op2):
+        op1 = self.check_bool(op1)
+        op2 = self.check_bool(op2)
+        if op1.type() != Type.BOOL or op2.type() != Type.BOOL:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Incompatible types for comparison &&",
+            )
+        left, right = op1.value(), op2.value()
+        if left is True and right is True:
+            return TRUE
         else:
-            match expression_node.elem_type:
-                # value node
-                case "int" | "string" | "bool":
-                    return create_value(expression_node.dict["val"])
-                case "nil":
-                    return Value(Type.NIL)
-                # variable node
-                case "var":
-                    name = expression_node.dict["name"]
-                    result = self.get_nested_variable(name)
-                    return result
-                # unary operations
-                case "neg":
-                    op1 = self.evaluate_expression(expression_node.dict["op1"])
-                    if op1.type() != Type.INT and op1.type() != Type.STRING:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Invalid negation type",
-                        )
-                    return Value(Type.INT, -op1.value())
-                case "!":
-                    op1 = self.evaluate_expression(expression_node.dict["op1"])
-                    op1 = self.check_bool(op1)
-                    if op1.type() != Type.BOOL:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Illegal usage of not operation on non-boolean type",
-                        )
-                    return (
-                        Value(Type.BOOL, True)
-                        if op1.value() is False
-                        else Value(Type.BOOL, False)
-                    )
-                # new instance
-                case "new":
-                    var_type = expression_node.dict["var_type"]
-                    if var_type not in self.structs:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Invalid struct type",
-                        )
-                    # create variables for all the struct-specific variables
-                    struct = self.structs[var_type]
-                    variables = {}
-                    for var in struct.dict["fields"]:
-                        name = var.dict["name"]
-                        type = var.dict["var_type"]
-                        if type in Interpreter.default_types:
-                            variables[name] = Value(
-                                type, Interpreter.default_types[type]
-                            )
-                        else:
-                            if type not in self.structs:
-                                super().error(
-                                    ErrorType.TYPE_ERROR,
-                                    "Unrecognized type for variable in struct",
-                                )
-                            variables[name] = Value(type)
-
-                    # return a reference to the struct
-                    return Value(var_type, variables)
-                # function call
-                case "fcall":
-                    return self.run_function_call(expression_node)
+            return FALSE
+
+    def logical_or(self, op1, op2):
+        op1 = self.check_bool(op1)
+        op2 = self.check_bool(op2)
+        if op1.type() != Type.BOOL or op2.type() != Type.BOOL:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Incompatible types for comparison ||",
+            )
+        left, right = op1.value(), op2.value()
+        if left is True or right is True:
+            return TRUE
+        else:
+            return FALSE
+
+    def negate(self, op1):
+        if op1.type() != Type.INT and op1.type() != Type.STRING:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Invalid negation type",
+            )
+        return int_value(-op1.value())
+
+    def logical_not(self, op1):
+        op1 = self.check_bool(op1)
+        if op1.type() != Type.BOOL:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Illegal usage of not operation on non-boolean type",
+            )
+        return TRUE if op1.value() is False else FALSE
+
+    # maps each binary operator to the method that applies it
+    operations = {
+        "+": add,
+        "-": subtract,
+        "*": multiply,
+        "/": divide,
+        "==": equal,
+        "<": less,
+        "<=": less_equal,
+        ">": greater,
+        ">=": greater_equal,
+        "!=": not_equal,
+        "&&": logical_and,
+        "||": logical_or,
+    }
+
+    # works out the layout of a struct definition. a field with a type that doesn't
+    # exist is only an error once the struct is instantiated
+    def create_struct_layout(self, struct):
+        fields = []
+        defaults = []
+        for var in struct.fields:
+            type = var.var_type
+            fields.append(var.name)
+            if type in Interpreter.default_types:
+                defaults.append(Value(type, Interpreter.default_types[type]))
+            elif type in self.structs:
+                defaults.append(Value(type))
+            else:
+                defaults = None
+                break
+        return StructLayout(struct.name, fields, defaults)
+
+    # creates a new instance of a struct with every field set to its default
+    def new_struct(self, var_type):
+        layout = self.struct_layouts.get(var_type)
+        if layout is None:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Invalid struct type",
+            )
+        if layout.defaults is None:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Unrecognized type for variable in struct",
+            )
+
+        if self.governor:
+            self.governor.allocate(STRUCT_SIZE + FIELD_SIZE * len(layout.defaults))
+
+        # return a reference to the struct
+        return Value(var_type, Struct(layout))
 
     def run_function_call(self, function_call):
-        name = function_call.dict["name"]
-        arg_nodes = function_call.dict["args"]
+        name = function_call.name
+        arg_nodes = function_call.args
         match name:
             case "print":
-                res = ""
-                for arg in function_call.dict["args"]:
-                    output = self.evaluate_expression(arg)
+                values = []
+                for arg in function_call.args:
+                    output = Interpreter.expression_handlers[arg.opcode](self, arg)
                     if output.type() == Type.VOID:
                         super().error(
                             ErrorType.TYPE_ERROR,
                             "Using void in print",
                         )
-                    res += get_printable(output)
+                    values.append(output)
 
-                super().output(res)
+                super().output(format_line(values))
                 # self.variables.print()
-                return Value(Type.VOID)
+                return VOID
             case "inputi":
-                if len(function_call.dict["args"]) > 1:
+                if len(function_call.args) > 1:
                     super().error(
                         ErrorType.NAME_ERROR,
                         "No inputi() function found that takes > 1 parameter",
                     )
-                elif len(function_call.dict["args"]) == 1:
-                    super().output(function_call.dict["args"][0].dict["val"])
+                elif len(function_call.args) == 1:
+                    super().output(function_call.args[0].val)
 
-                return Value(Type.INT, int(super().get_input()))
+                return int_value(int(super().get_input()))
             case "inputs":
-                if len(function_call.dict["args"]) > 1:
+                if len(function_call.args) > 1:
                     super().error(
                         ErrorType.NAME_ERROR,
                         "No inputs() function found that takes > 1 parameter",
                     )
-                elif len(function_call.dict["args"]) == 1:
-                    super().output(function_call.dict["args"][0].dict["val"])
+                elif len(function_call.args) == 1:
+                    super().output(function_call.args[0].val)
 
                 return Value(Type.STRING, super().get_input())
             case _:
-                for function in self.functions:
-                    # if same name and same amount of args
-                    if function.dict["name"] == name and len(arg_nodes) == len(
-                        function.dict["args"]
-                    ):
-                        args = []
-                        for arg in arg_nodes:
-                            args.append(self.evaluate_expression(arg))
-                        res = self.run_function(function, args)
-                        return res if res else Value(Type.VOID)
+                function = self.find_function(name, len(arg_nodes))
+                args = []
+                for arg in arg_nodes:
+                    args.append(Interpreter.expression_handlers[arg.opcode](self, arg))
+                res = self.run_function(function, args)
+                return res if res else VOID
+
+    # assigns a value to a (non-struct field) variable, checking its type first
+    def assign_variable(self, name, value, address=None):
+        if not self.variables.get(name, address):
+            super().error(
+                ErrorType.NAME_ERROR,
+                f"Assign: Variable {name} has not been defined",
+            )
+
+        type = self.variables.get(name, address).type()
+        value = self.check_return(type, value)
 
+        # setting the variable
+        if type in self.structs and value.type() == Type.NIL:
+            res = self.variables.set(name, Value(type), address)
+        else:
+            if value.type() == Type.NIL:
+                super().error(
+                    ErrorType.TYPE_ERROR,
+                    f"Assign: Assigning {name} with a nil type",
+                )
+            res = self.variables.set(name, value, address)
+            if not res:
                 super().error(
                     ErrorType.NAME_ERROR,
-                    f"Function {name} has not been defined",
+                    f"Assign: Unable to set {name}",
                 )
 
+    # returns return_value, converted to a bool if it's an int and return_type is bool
     def check_return(self, return_type, return_value):
         # return_type is the return type of the function
         # return_value is the value we're returning from the function
@@ -554,7 +794,7 @@ class Interpreter(InterpreterBase):
             )
         # if return type is bool and return value is int (coercion)
         if return_type == Type.BOOL and return_value.type() == Type.INT:
-            self.convert_to_bool(return_value)
+            return_value = self.check_bool(return_value)
         # mismatched primitive types
         if (
             return_type in Interpreter.default_types
@@ -564,7 +804,9 @@ class Interpreter(InterpreterBase):
                 ErrorType.TYPE_ERROR,
                 f"{return_value.type()} cannot be assigned to a {return_type} (2)",
             )
+        return return_value
 
+    # returns the offset of the field var in the struct obj
     def check_field_access(self, obj, var):
         # variable to the left of a dot is nil
         if obj is None:
@@ -573,17 +815,19 @@ class Interpreter(InterpreterBase):
                 "CFA: Variable to the left of a dot is nil",
             )
         # variable to the left of a dot is not a struct
-        if not isinstance(obj, dict):
+        if not isinstance(obj, Struct):
             super().error(
                 ErrorType.TYPE_ERROR,
                 "CFA: Variable to the left of a dot is not a struct",
             )
         # invalid field name
-        if var not in obj:
+        offset = obj.layout.offsets.get(var)
+        if offset is None:
             super().error(
                 ErrorType.NAME_ERROR,
                 f"CFA: {var} does not exist",
             )
+        return offset
 
     # checks and returns the bool equiv of an int
     def check_bool(self, val):
@@ -591,31 +835,23 @@ class Interpreter(InterpreterBase):
             return val
         else:
             if val.value() == 0:
-                return Value(Type.BOOL, False)
-            else:
-                return Value(Type.BOOL, True)
-
-    # converts a value from int to bool
-    def convert_to_bool(self, val):
-        if val.type() == Type.INT:
-            if val.value() == 0:
-                val.set(Type.BOOL, False)
+                return FALSE
             else:
-                val.set(Type.BOOL, True)
+                return TRUE
 
-    def type_to_variable(self, name, type):
+    def type_to_variable(self, name, type, address=None):
         match type:
             case "bool":
-                res = self.variables.create(name, Value(Type.BOOL, False))
+                res = self.variables.create(name, FALSE, address)
             case "int":
-                res = self.variables.create(name, Value(Type.INT, 0))
+                res = self.variables.create(name, int_value(0), address)
             case "string":
-                res = self.variables.create(name, Value(Type.STRING, ""))
+                res = self.variables.create(name, Value(Type.STRING, ""), address)
             case _:
                 # if type is a struct
                 if type in self.structs:
                     # create a variable for the one representing the struct
-                    res = self.variables.create(name, Value(type))
+                    res = self.variables.create(name, Value(type), address)
                 else:
                     # no matching types
                     super().error(
@@ -631,19 +867,20 @@ class Interpreter(InterpreterBase):
     def return_default(self, type):
         match type:
             case "bool":
-                return Value(Type.BOOL, False)
+                return FALSE
             case "int":
-                return Value(Type.INT, 0)
+                return int_value(0)
             case "string":
                 return Value(Type.STRING, "")
             case "void":
-                return Value(Type.VOID)
+                return VOID
             case _:
-                return Value(Type.NIL)
+                return NIL
 
-    def get_nested_variable(self, name):
-        parts = name.split(".")
-        current = self.variables.get(parts[0])
+    # returns the value of a variable or struct field. path is the name of a struct
+    # field already split into its parts (see resolver.py), or None for a variable
+    def get_nested_variable(self, name, address=None, path=None):
+        current = self.variables.get(path[0] if path else name, address)
 
         if not current:
             super().error(
@@ -651,16 +888,18 @@ class Interpreter(InterpreterBase):
                 f"GNV: Variable {name} has not been defined",
             )
 
-        for part in parts[1:]:
-            current = current.value()
-            self.check_field_access(current, part)
-            current = current[part]
+        if path:
+            for part in path[1:]:
+                struct = current.value()
+                offset = self.check_field_access(struct, part)
+                current = struct.fields[offset]
 
         return current
 
-    def set_nested_variable(self, name, value):
-        parts = name.split(".")
-        current = self.variables.get(parts[0])
+    def set_nested_variable(self, name, value, address=None, path=None):
+        if path is None:
+            path = name.split(".")
+        current = self.variables.get(path[0], address)
 
         if not current:
             super().error(
@@ -669,19 +908,51 @@ class Interpreter(InterpreterBase):
             )
 
         # traverse until the second-to-last part
-        for part in parts[1:-1]:
-            current = current.value()
-            self.check_field_access(current, part)
-            current = current[part]
+        for part in path[1:-1]:
+            struct = current.value()
+            offset = self.check_field_access(struct, part)
+            current = struct.fields[offset]
 
         # set the final part to the new value
-        last_part = parts[-1]
-        current = current.value()
-
-        self.check_field_access(current, last_part)
-        self.check_return(current[last_part].type(), value)
-
-        current[last_part] = value
+        struct = current.value()
+        offset = self.check_field_access(struct, path[-1])
+        value = self.check_return(struct.fields[offset].type(), value)
+
+        struct.fields[offset] = value
+
+    # handlers indexed by opcode, for run_statement and evaluate_expression
+    statement_handlers = handler_table(
+        {
+            Opcode.VAR_DEF: run_vardef,
+            Opcode.ASSIGN: run_assign,
+            Opcode.FCALL: run_fcall,
+            Opcode.IF: run_if,
+            Opcode.FOR: run_for,
+            Opcode.RETURN: run_return,
+        },
+        skip_statement,
+    )
+    expression_handlers = handler_table(
+        {
+            **dict.fromkeys(
+                (InterpreterBase.OPCODES[op] for op in operations),
+                evaluate_binary_operation,
+            ),
+            Opcode.INT: evaluate_value,
+            Opcode.STRING: evaluate_value,
+            Opcode.BOOL: evaluate_value,
+            Opcode.NIL: evaluate_nil,
+            Opcode.VAR: evaluate_variable,
+            Opcode.NEG: evaluate_negate,
+            Opcode.NOT: evaluate_not,
+            Opcode.NEW: evaluate_new,
+            Opcode.FCALL: run_function_call,
+        },
+        evaluate_nothing,
+    )
+    operation_handlers = handler_table(
+        {InterpreterBase.OPCODES[op]: method for op, method in operations.items()}
+    )
 
 
 if __name__ == "__main__":
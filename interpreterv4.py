@@ -1,14 +1,26 @@
-from enum import Enum
-from intbase import InterpreterBase, ErrorType
-from brewparse import parse_program
+from intbase import InterpreterBase, ErrorType, Opcode, handler_table
+from program_cache import load_program
+from folder import ConstantFolder
 from env_v4 import EnvironmentManager
-from type_valuev4 import Type, Value, LazyValue, create_value, get_printable
-
-
-class ExecStatus(Enum):
-    CONTINUE = 1
-    RETURN = 2
-    RAISE = 3
+from compiler_v4 import Compiler
+from element import BinOp, NilNode, UnaryOp, ValueNode, VarNode
+from strictness import find_strict_expressions, is_safe_operation
+from profiler import Profiler
+from governor import DEPTH, STRING_SIZE, THUNK_SIZE
+from type_valuev4 import (
+    Type,
+    Value,
+    LazyValue,
+    BrewinException,
+    TRUE,
+    FALSE,
+    NIL,
+    bool_value,
+    int_value,
+    create_value,
+    concat,
+    format_line,
+)
 
 
 class Interpreter(InterpreterBase):
@@ -26,568 +38,795 @@ class Interpreter(InterpreterBase):
         "&&",
         "||",
     }
-
-    def __init__(self, console_output=True, inp=None, trace_output=False):
+    builtin_functions = {"print", "inputi", "inputs"}
+
+    def __init__(
+        self,
+        console_output=True,
+        inp=None,
+        trace_output=False,
+        mode=InterpreterBase.TREE_MODE,
+        output_sink=None,
+        governor=None,
+    ):
         # call InterpreterBase's constructor
-        super().__init__(console_output, inp)
-        self.functions = []
+        super().__init__(console_output, inp, output_sink)
+        self.functions = {}  # (name, arg count) : function node
+        self.mode = mode
+        # limits on how long the program can run, if any (see governor.py)
+        self.governor = governor
+        # expressions that never call a function (see strictness.py)
+        self.strict_expressions = set()
+        self.catch_tables = {}  # try node : exception type : catch node
+        # counts calls, time and the statements run on each line when trace_output is
+        # set (see profiler.py). statements are counted by running them through a copy
+        # of the handler table that counts each one first
+        self.profiler = Profiler() if trace_output else None
+        if self.profiler:
+            self.statement_handlers = [
+                self.profiler.counting(handler)
+                for handler in Interpreter.statement_handlers
+            ]
 
     def run(self, program):
-        ast = parse_program(program)
         self.variables = EnvironmentManager()
+        ast = load_program(
+            program, "v4", ConstantFolder(self.evaluate_constant).fold_program
+        )
+        self.strict_expressions = find_strict_expressions(ast)
         main_func_node = None
-        for function in ast.dict["functions"]:
-            if function.dict["name"] == "main":
+        for function in ast.functions:
+            name = function.name
+            if name == "main":
                 main_func_node = function
             else:
-                self.functions.append(function)
+                # if overloaded with the same arg count, the first definition wins
+                key = (name, len(function.args))
+                self.functions.setdefault(key, function)
 
         if not main_func_node:
             super().error(
                 ErrorType.NAME_ERROR,
                 "No main() function was found",
             )
-        status, _ = self.run_function(main_func_node)
-        if status == ExecStatus.RAISE:
+
+        if self.governor:
+            self.governor.start(self)
+        # started right before the try, so whatever it changes is always undone
+        if self.profiler:
+            self.profiler.start()
+        try:
+            if self.mode == InterpreterBase.COMPILED_MODE:
+                Compiler(self).function(main_func_node)(None, self.variables)
+            else:
+                self.run_function(main_func_node)
+        except BrewinException:
             super().error(
                 ErrorType.FAULT_ERROR,
                 "Uncaught raise",
             )
+        except RecursionError:
+            # with a governor, a program too deep for the Python stack stops the same
+            # way as one going past max_depth
+            if not self.governor:
+                raise
+            self.governor.stop(DEPTH, "Python recursion limit exceeded")
+        finally:
+            # write out anything still buffered, even if the program failed
+            self.output_sink.flush()
+            if self.profiler:
+                self.profiler.finish()
+            if self.governor:
+                self.governor.finish()
+
+    # returns the function called name that takes arg_count args
+    def find_function(self, name, arg_count):
+        function = self.functions.get((name, arg_count))
+        if function is None:
+            super().error(
+                ErrorType.NAME_ERROR,
+                f"Function {name} has not been defined",
+            )
+        return function
 
+    # returns the function's return value, or NIL if it doesn't return one
     def run_function(self, func_node, args=None, env=None):
         if not env:
             env = self.variables
 
-        self.variables.push_scope("function")
-        temp_args = func_node.dict["args"]
+        profiler = self.profiler
+        if profiler:
+            profiler.enter(func_node)
+        governor = self.governor
+        if governor:
+            governor.enter(func_node)
+        self.variables.push_scope("function", func_node.layout)
+        temp_args = func_node.args
 
         # instantiate args with the right values
         for i in range(len(temp_args)):
-            self.variables.create(temp_args[i].dict["name"], LazyValue(args[i], env))
+            self.variables.create(temp_args[i].name, self.delay(args[i], env))
 
-        for statement_node in func_node.dict["statements"]:
-            status, res = self.run_statement(statement_node, env)
+        for statement_node in func_node.statements:
+            res = self.statement_handlers[statement_node.opcode](
+                self, statement_node
+            )
             # if statement_node is a return, return that value
-            if status == ExecStatus.RETURN or status == ExecStatus.RAISE:
+            if res is not None:
                 self.variables.pop_scope()
-                return (status, res)
+                if profiler:
+                    profiler.exit()
+                if governor:
+                    governor.exit()
+                return res
 
         # otherwise return NIL
         self.variables.pop_scope()
-        return (ExecStatus.CONTINUE, Value(Type.NIL))
-
+        if profiler:
+            profiler.exit()
+        if governor:
+            governor.exit()
+        return NIL
+
+    # the handlers below call each other through the tables directly, rather than going
+    # through run_statement and evaluate_expression, so a Brewin call doesn't take any
+    # more Python frames than it did before. statements always run in self.variables,
+    # so statement handlers don't take an env.
+    # a statement handler returns None, or the value being returned if the statement
+    # returned from the function. an expression handler returns its value.
+    # a Brewin raise is a BrewinException, which unwinds to the nearest try that
+    # catches it, so nothing else has to check for one
     def run_statement(self, statement_node, env=None):
-        if not env:
-            env = self.variables
+        return self.statement_handlers[statement_node.opcode](
+            self, statement_node
+        )
 
-        match statement_node.elem_type:
-            # variable definition
-            case "vardef":
-                name = statement_node.dict["name"]
-                if not self.variables.create(name, Value(Type.NIL)):
-                    super().error(
-                        ErrorType.NAME_ERROR,
-                        f"Vardef: Variable {name} defined more than once",
-                    )
-            # assignment
-            case "=":
-                name = statement_node.dict["name"]
-                node = statement_node.dict["expression"]
-                lazy = LazyValue(node, self.variables.copy())
-                if not self.variables.set(name, lazy):
-                    super().error(
-                        ErrorType.NAME_ERROR,
-                        f"Equal: Variable {name} has not been defined",
-                    )
-            # function call
-            case "fcall":
-                status, res = self.run_function_call(statement_node)
-                return (status, res)
-            # if statement
-            case "if":
-                self.variables.push_scope("if")
-
-                condition = statement_node.dict["condition"]
-                statements = statement_node.dict["statements"]
-                else_statements = statement_node.dict["else_statements"]
-
-                # test if statement
-                status, cond = self.evaluate_expression_and_lazy(condition)
-                if status == ExecStatus.RAISE:
-                    return (status, cond)
-                if cond.type() != Type.BOOL:
-                    super().error(
-                        ErrorType.TYPE_ERROR,
-                        "Invalid if condition",
-                    )
+    # variable definition
+    def run_vardef(self, statement_node):
+        name = statement_node.name
+        address = statement_node.address
+        if not self.variables.create(name, NIL, address):
+            super().error(
+                ErrorType.NAME_ERROR,
+                f"Vardef: Variable {name} defined more than once",
+            )
 
-                if cond.value():
-                    for statement in statements:
-                        status, res = self.run_statement(statement)
-                        if status == ExecStatus.RETURN or status == ExecStatus.RAISE:
-                            self.variables.pop_scope()
-                            return (status, res)
-                # if if statement fails, test else statement
-                else:
-                    if else_statements:
-                        for statement in else_statements:
-                            status, res = self.run_statement(statement)
-                            if (
-                                status == ExecStatus.RETURN
-                                or status == ExecStatus.RAISE
-                            ):
-                                self.variables.pop_scope()
-                                return (status, res)
+    # assignment
+    def run_assign(self, statement_node):
+        name = statement_node.name
+        node = statement_node.expression
+        address = statement_node.address
+        value = self.delay(node, self.variables, True)
+        if not self.variables.set(name, value, address):
+            super().error(
+                ErrorType.NAME_ERROR,
+                f"Equal: Variable {name} has not been defined",
+            )
 
-                self.variables.pop_scope()
-            # for loop
-            case "for":
-                # assignment statement
-                init = statement_node.dict["init"]
-                condition = statement_node.dict["condition"]
-                statements = statement_node.dict["statements"]
-
-                status, res = self.run_statement(init)
-                if status == ExecStatus.RAISE:
-                    return (status, res)
-
-                # condition must be true
-                status, cond = self.evaluate_expression_and_lazy(condition)
-                if status == ExecStatus.RAISE:
-                    return (status, cond)
-                if cond.type() != Type.BOOL:
-                    super().error(
-                        ErrorType.TYPE_ERROR,
-                        "Invalid for condition",
-                    )
+    # function call, ignoring what it returns
+    def run_fcall(self, statement_node):
+        self.run_function_call(statement_node)
 
-                while cond.value():
-                    self.variables.push_scope("for")
-                    for statement in statements:
-                        status, res = self.run_statement(statement)
-                        if status == ExecStatus.RETURN or status == ExecStatus.RAISE:
-                            self.variables.pop_scope()
-                            return (status, res)
-                    self.variables.pop_scope()
+    # if statement
+    def run_if(self, statement_node):
+        self.variables.push_scope("if", statement_node.layout)
 
-                    update = statement_node.dict["update"]
-                    status, res = self.run_statement(update)
-                    if status == ExecStatus.RAISE:
-                        return (status, res)
-                    status, cond = self.evaluate_expression_and_lazy(condition)
-                    if status == ExecStatus.RAISE:
-                        return (status, cond)
-            # return
-            case "return":
-                expression = statement_node.dict["expression"]
-                if expression is None:
-                    return (ExecStatus.RETURN, Value(Type.NIL))
-
-                return (ExecStatus.RETURN, LazyValue(expression, self.variables.copy()))
-            # try
-            case "try":
-                statements = statement_node.dict["statements"]
-                catchers = statement_node.dict["catchers"]
-
-                self.variables.push_scope("try")
-
-                for statement in statements:
-                    status, res = self.run_statement(statement)
-                    if status == ExecStatus.RETURN:
-                        self.variables.pop_scope()
-                        return (status, res)
-                    elif status == ExecStatus.RAISE:
+        condition = statement_node.condition
+        statements = statement_node.statements
+        else_statements = statement_node.else_statements
+
+        # test if statement
+        cond = self.evaluate_expression_and_lazy(condition)
+        if cond.type() != Type.BOOL:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Invalid if condition",
+            )
+
+        if cond.value():
+            for statement in statements:
+                res = self.statement_handlers[statement.opcode](
+                    self, statement
+                )
+                if res is not None:
+                    self.variables.pop_scope()
+                    return res
+        # if if statement fails, test else statement
+        else:
+            if else_statements:
+                for statement in else_statements:
+                    res = self.statement_handlers[statement.opcode](
+                        self, statement
+                    )
+                    if res is not None:
                         self.variables.pop_scope()
-                        for catch in catchers:
-                            catch_type, catch_statements = self.run_statement(catch)
-                            # matching raise / catch
-                            # execute catch block
-                            if catch_type == res.value():
-                                self.variables.push_scope("catch")
-                                for statement in catch_statements:
-                                    status, res = self.run_statement(statement)
-                                    if (
-                                        status == ExecStatus.RETURN
-                                        or status == ExecStatus.RAISE
-                                    ):
-                                        self.variables.pop_scope()
-                                        return (status, res)
-                                self.variables.pop_scope()
-                                return (ExecStatus.CONTINUE, None)
-                        # no match
-                        return (ExecStatus.RAISE, res)
-
-                # try block finishes normally
+                        return res
+
+        self.variables.pop_scope()
+        return None
+
+    # for loop
+    def run_for(self, statement_node):
+        # assignment statement
+        init = statement_node.init
+        condition = statement_node.condition
+        statements = statement_node.statements
+
+        self.statement_handlers[init.opcode](self, init)
+
+        # condition must be true
+        cond = self.evaluate_expression_and_lazy(condition)
+        if cond.type() != Type.BOOL:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Invalid for condition",
+            )
+
+        governor = self.governor
+        while cond.value():
+            if governor:
+                governor.charge(statement_node)
+            self.variables.push_scope("for", statement_node.layout)
+            for statement in statements:
+                res = self.statement_handlers[statement.opcode](
+                    self, statement
+                )
+                if res is not None:
+                    self.variables.pop_scope()
+                    return res
+            self.variables.pop_scope()
+
+            update = statement_node.update
+            self.statement_handlers[update.opcode](self, update)
+            cond = self.evaluate_expression_and_lazy(condition)
+        return None
+
+    # return
+    def run_return(self, statement_node):
+        expression = statement_node.expression
+        if expression is None:
+            return NIL
+
+        return self.delay(expression, self.variables, True)
+
+    # try
+    def run_try(self, statement_node):
+        depth = self.variables.depth()
+        profile_depth = self.profiler.depth() if self.profiler else 0
+        call_depth = self.governor.depth if self.governor else 0
+        self.variables.push_scope("try", statement_node.layout)
+
+        try:
+            for statement in statement_node.statements:
+                res = self.statement_handlers[statement.opcode](
+                    self, statement
+                )
+                if res is not None:
+                    self.variables.pop_scope()
+                    return res
+        except BrewinException as exception:
+            # drop the try's scope and every scope entered since
+            self.variables.unwind(depth)
+            # and the functions the raise left
+            if self.profiler:
+                self.profiler.unwind(profile_depth)
+            if self.governor:
+                self.governor.unwind(call_depth)
+            catch = self.catch_table(statement_node).get(exception.value.value())
+            # no match
+            if catch is None:
+                raise
+        else:
+            # try block finishes normally
+            self.variables.pop_scope()
+            return None
+
+        # matching raise / catch
+        # execute catch block
+        return self.run_catch(catch)
+
+    # returns the exception type : catch node table of a try node, built the first time
+    # it catches something. if two catches have the same type, the first one wins
+    def catch_table(self, try_node):
+        table = self.catch_tables.get(try_node)
+        if table is None:
+            table = {}
+            for catch in try_node.catchers:
+                table.setdefault(catch.exception_type, catch)
+            self.catch_tables[try_node] = table
+        return table
+
+    # catch
+    def run_catch(self, statement_node):
+        self.variables.push_scope("catch", statement_node.layout)
+        for statement in statement_node.statements:
+            res = self.statement_handlers[statement.opcode](self, statement)
+            if res is not None:
                 self.variables.pop_scope()
-                return (ExecStatus.CONTINUE, None)
-            # catch
-            case "catch":
-                type = statement_node.dict["exception_type"]
-                statements = statement_node.dict["statements"]
-                return (type, statements)
-            # raise
-            case "raise":
-                type = statement_node.dict["exception_type"]
-                _, value = self.evaluate_expression(type)
-                if isinstance(value, LazyValue):
-                    _, value = self.evaluate_lazy(value)
-                if value.type() != Type.STRING:
-                    super().error(
-                        ErrorType.TYPE_ERROR,
-                        "Raise type not a string",
-                    )
+                return res
+        self.variables.pop_scope()
+        return None
 
-                # return what we're raising
-                return (ExecStatus.RAISE, value)
+    # raise
+    def run_raise(self, statement_node):
+        type = statement_node.exception_type
+        value = Interpreter.expression_handlers[type.opcode](
+            self, type, self.variables
+        )
+        if isinstance(value, LazyValue):
+            value = self.evaluate_lazy(value)
+        if value.type() != Type.STRING:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Raise type not a string",
+            )
+
+        # raise what we're raising
+        raise BrewinException(value)
 
-        return (ExecStatus.CONTINUE, None)
+    # any other node used as a statement does nothing
+    def skip_statement(self, statement_node):
+        return None
 
     def evaluate_expression(self, expression_node, env=None):
         if not env:
             env = self.variables
-        # binary operations
-        if expression_node.elem_type in Interpreter.binary_operators:
-            match expression_node.elem_type:
-                case "+":
-                    status, op1, op2 = self.get_ops(expression_node, env)
-                    if status == ExecStatus.RAISE:
-                        return (ExecStatus.RAISE, op1 or op2)
-                    if (op1.type() == Type.INT and op2.type() == Type.INT) or (
-                        op1.type() == Type.STRING and op2.type() == Type.STRING
-                    ):
-                        return (
-                            ExecStatus.CONTINUE,
-                            create_value(op1.value() + op2.value()),
-                        )
-
-                    super().error(
-                        ErrorType.TYPE_ERROR,
-                        "Illegal usage of arithmetic operation on non-integer types",
-                    )
-                case "-":
-                    status, op1, op2 = self.get_ops(expression_node, env)
-                    if status == ExecStatus.RAISE:
-                        return (ExecStatus.RAISE, op1 or op2)
-                    if op1.type() != Type.INT or op2.type() != Type.INT:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Illegal usage of arithmetic operation on non-integer types",
-                        )
-                    return (
-                        ExecStatus.CONTINUE,
-                        Value(Type.INT, op1.value() - op2.value()),
-                    )
-                case "*":
-                    status, op1, op2 = self.get_ops(expression_node, env)
-                    if status == ExecStatus.RAISE:
-                        return (ExecStatus.RAISE, op1 or op2)
-                    if op1.type() != Type.INT or op2.type() != Type.INT:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Illegal usage of arithmetic operation on non-integer types",
-                        )
-                    return (
-                        ExecStatus.CONTINUE,
-                        Value(Type.INT, op1.value() * op2.value()),
-                    )
-                case "/":
-                    status, op1, op2 = self.get_ops(expression_node, env)
-                    if status == ExecStatus.RAISE:
-                        return (ExecStatus.RAISE, op1 or op2)
-                    # divide by 0
-                    if op2.value() == 0:
-                        return (ExecStatus.RAISE, Value(Type.STRING, "div0"))
-                    if op1.type() != Type.INT or op2.type() != Type.INT:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Illegal usage of arithmetic operation on non-integer types",
-                        )
-                    return (
-                        ExecStatus.CONTINUE,
-                        Value(Type.INT, op1.value() // op2.value()),
-                    )
-                case "==":
-                    status, op1, op2 = self.get_ops(expression_node, env)
-                    if status == ExecStatus.RAISE:
-                        return (ExecStatus.RAISE, op1 or op2)
-                    if op1.type() != op2.type():
-                        return (ExecStatus.CONTINUE, Value(Type.BOOL, False))
-                    return (
-                        ExecStatus.CONTINUE,
-                        Value(Type.BOOL, op1.value() == op2.value()),
-                    )
-                case "<":
-                    status, op1, op2 = self.get_ops(expression_node, env)
-                    if status == ExecStatus.RAISE:
-                        return (ExecStatus.RAISE, op1 or op2)
-                    if op1.type() != Type.INT or op2.type() != Type.INT:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Incompatible types for comparison <",
-                        )
-                    return (
-                        ExecStatus.CONTINUE,
-                        Value(Type.BOOL, op1.value() < op2.value()),
-                    )
-                case "<=":
-                    status, op1, op2 = self.get_ops(expression_node, env)
-                    if status == ExecStatus.RAISE:
-                        return (ExecStatus.RAISE, op1 or op2)
-                    if op1.type() != Type.INT or op2.type() != Type.INT:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Incompatible types for comparison <=",
-                        )
-                    return (
-                        ExecStatus.CONTINUE,
-                        Value(Type.BOOL, op1.value() <= op2.value()),
-                    )
-                case ">":
-                    status, op1, op2 = self.get_ops(expression_node, env)
-                    if status == ExecStatus.RAISE:
-                        return (ExecStatus.RAISE, op1 or op2)
-                    if op1.type() != Type.INT or op2.type() != Type.INT:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Incompatible types for comparison >",
-                        )
-                    return (
-                        ExecStatus.CONTINUE,
-                        Value(Type.BOOL, op1.value() > op2.value()),
-                    )
-                case ">=":
-                    status, op1, op2 = self.get_ops(expression_node, env)
-                    if status == ExecStatus.RAISE:
-                        return (ExecStatus.RAISE, op1 or op2)
-                    if op1.type() != Type.INT or op2.type() != Type.INT:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Incompatible types for comparison >=",
-                        )
-                    return (
-                        ExecStatus.CONTINUE,
-                        Value(Type.BOOL, op1.value() >= op2.value()),
-                    )
-                case "!=":
-                    status, op1, op2 = self.get_ops(expression_node, env)
-                    if status == ExecStatus.RAISE:
-                        return (ExecStatus.RAISE, op1 or op2)
-                    if op1.type() != op2.type():
-                        return (ExecStatus.CONTINUE, Value(Type.BOOL, True))
-                    return (
-                        ExecStatus.CONTINUE,
-                        Value(Type.BOOL, op1.value() != op2.value()),
-                    )
-                case "&&":
-                    status, op1 = self.evaluate_expression_and_lazy(
-                        expression_node.dict["op1"], env
-                    )
-                    if status == ExecStatus.RAISE:
-                        return (status, op1)
-                    if op1.type() != Type.BOOL:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Incompatible types for comparison &&",
-                        )
-                    if not op1.value():
-                        return (ExecStatus.CONTINUE, Value(Type.BOOL, False))
-
-                    status, op2 = self.evaluate_expression_and_lazy(
-                        expression_node.dict["op2"], env
-                    )
-                    if status == ExecStatus.RAISE:
-                        return (status, op2)
-                    if op2.type() != Type.BOOL:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Incompatible types for comparison &&",
-                        )
-                    return (ExecStatus.CONTINUE, Value(Type.BOOL, op2.value()))
-                case "||":
-                    status, op1 = self.evaluate_expression_and_lazy(
-                        expression_node.dict["op1"], env
-                    )
-                    if status == ExecStatus.RAISE:
-                        return (status, op1)
-                    if op1.type() != Type.BOOL:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Incompatible types for comparison ||",
-                        )
-                    if op1.value():
-                        return (ExecStatus.CONTINUE, Value(Type.BOOL, True))
-
-                    status, op2 = self.evaluate_expression_and_lazy(
-                        expression_node.dict["op2"], env
-                    )
-                    if status == ExecStatus.RAISE:
-                        return (status, op2)
-                    if op2.type() != Type.BOOL:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Incompatible types for comparison &&",
-                        )
-                    return (ExecStatus.CONTINUE, Value(Type.BOOL, op2.value()))
-        else:
-            match expression_node.elem_type:
-                # value node
-                case "int" | "string" | "bool":
-                    return (
-                        ExecStatus.CONTINUE,
-                        create_value(expression_node.dict["val"]),
-                    )
-                case "nil":
-                    return (ExecStatus.CONTINUE, Value(Type.NIL))
-                # variable node
-                case "var":
-                    name = expression_node.dict["name"]
-                    result = env.get(name)
-                    if result is None:
-                        super().error(
-                            ErrorType.NAME_ERROR,
-                            f"EE Var: Variable {name} has not been defined",
-                        )
-                    return (ExecStatus.CONTINUE, result)
-                # unary operations
-                case "neg":
-                    status, op1 = self.evaluate_expression_and_lazy(
-                        expression_node.dict["op1"], env
-                    )
-                    if status == ExecStatus.RAISE:
-                        return (status, op1)
-                    if op1.type() != Type.INT and op1.type() != Type.STRING:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Invalid negation type",
-                        )
-                    return (ExecStatus.CONTINUE, Value(Type.INT, -op1.value()))
-                case "!":
-                    status, op1 = self.evaluate_expression_and_lazy(
-                        expression_node.dict["op1"], env
-                    )
-                    if status == ExecStatus.RAISE:
-                        return (status, op1)
-                    if op1.type() != Type.BOOL:
-                        super().error(
-                            ErrorType.TYPE_ERROR,
-                            "Illegal usage of not operation on non-boolean type",
-                        )
-                    return (
-                        (ExecStatus.CONTINUE, Value(Type.BOOL, True))
-                        if op1.value() is False
-                        else (ExecStatus.CONTINUE, Value(Type.BOOL, False))
-                    )
-                # function call
-                case "fcall":
-                    status, res = self.run_function_call(expression_node, env)
-                    return (status, res)
+        return Interpreter.expression_handlers[expression_node.opcode](
+            self, expression_node, env
+        )
+
+    # && and || short circuit, so they only force op2 if they need it
+    def evaluate_and(self, expression_node, env):
+        op1 = self.evaluate_expression_and_lazy(expression_node.op1, env)
+        if op1.type() != Type.BOOL:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Incompatible types for comparison &&",
+            )
+        if not op1.value():
+            return FALSE
+
+        op2 = self.evaluate_expression_and_lazy(expression_node.op2, env)
+        if op2.type() != Type.BOOL:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Incompatible types for comparison &&",
+            )
+        return bool_value(op2.value())
+
+    def evaluate_or(self, expression_node, env):
+        op1 = self.evaluate_expression_and_lazy(expression_node.op1, env)
+        if op1.type() != Type.BOOL:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Incompatible types for comparison ||",
+            )
+        if op1.value():
+            return TRUE
+
+        op2 = self.evaluate_expression_and_lazy(expression_node.op2, env)
+        if op2.type() != Type.BOOL:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Incompatible types for comparison &&",
+            )
+        return bool_value(op2.value())
+
+    def evaluate_binary_operation(self, expression_node, env):
+        op1 = self.evaluate_expression_and_lazy(expression_node.op1, env)
+        op2 = self.evaluate_expression_and_lazy(expression_node.op2, env)
+        return Interpreter.operation_handlers[expression_node.opcode](self, op1, op2)
+
+    # value node
+    def evaluate_value(self, expression_node, env):
+        return create_value(expression_node.val)
+
+    def evaluate_nil(self, expression_node, env):
+        return NIL
+
+    # variable node
+    def evaluate_variable(self, expression_node, env):
+        name = expression_node.name
+        result = env.get(name, expression_node.address)
+        if result is None:
+            super().error(
+                ErrorType.NAME_ERROR,
+                f"EE Var: Variable {name} has not been defined",
+            )
+        return result
+
+    # unary operations
+    def evaluate_negate(self, expression_node, env):
+        return self.negate(self.evaluate_expression_and_lazy(expression_node.op1, env))
+
+    def evaluate_not(self, expression_node, env):
+        return self.logical_not(
+            self.evaluate_expression_and_lazy(expression_node.op1, env)
+        )
+
+    # any other node used as an expression has no value
+    def evaluate_nothing(self, expression_node, env):
+        return None
+
+    # evaluates an expression made only of constants for the ConstantFolder, returning
+    # None (and forgetting the error) if it fails or raises
+    def evaluate_constant(self, expression_node):
+        error_type, error_line = self.error_type, self.error_line
+        try:
+            return self.evaluate_expression(expression_node)
+        except Exception:
+            self.error_type, self.error_line = error_type, error_line
+            return None
+
+    # strict operations shared by every execution mode, applied to forced operands
+    def add(self, op1, op2):
+        if op1.type() == Type.INT and op2.type() == Type.INT:
+            return int_value(op1.value() + op2.value())
+        if op1.type() == Type.STRING and op2.type() == Type.STRING:
+            result = concat(op1, op2)
+            # concatenation is how a program builds strings that keep growing
+            if self.governor:
+                self.governor.allocate(STRING_SIZE + len(op2.value()))
+            return result
+
+        super().error(
+            ErrorType.TYPE_ERROR,
+            "Illegal usage of arithmetic operation on non-integer types",
+        )
+
+    def subtract(self, op1, op2):
+        if op1.type() != Type.INT or op2.type() != Type.INT:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Illegal usage of arithmetic operation on non-integer types",
+            )
+        return int_value(op1.value() - op2.value())
+
+    def multiply(self, op1, op2):
+        if op1.type() != Type.INT or op2.type() != Type.INT:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Illegal usage of arithmetic operation on non-integer types",
+            )
+        return int_value(op1.value() * op2.value())
+
+    def divide(self, op1, op2):
+        # divide by 0
+        if op2.value() == 0:
+            raise BrewinException(Value(Type.STRING, "div0"))
+        if op1.type() != Type.INT or op2.type() != Type.INT:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Illegal usage of arithmetic operation on non-integer types",
+            )
+        return int_value(op1.value() // op2.value())
+
+    def equal(self, op1, op2):
+        if op1.type() != op2.type():
+            return FALSE
+        return bool_value(op1.value() == op2.value())
+
+    def less(self, op1, op2):
+        if op1.type() != Type.INT or op2.type() != Type.INT:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Incompatible types for comparison <",
+            )
+        return bool_value(op1.value() < op2.value())
+
+    def less_equal(self, op1, op2):
+        if op1.type() != Type.INT or op2.type() != Type.INT:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Incompatible types for comparison <=",
+            )
+        return bool_value(op1.value() <= op2.value())
+
+    def greater(self, op1, op2):
+        if op1.type() != Type.INT or op2.type() != Type.INT:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Incompatible types for comparison >",
+            )
+        return bool_value(op1.value() > op2.value())
+
+    def greater_equal(self, op1, op2):
+        if op1.type() != Type.INT or op2.type() != Type.INT:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Incompatible types for comparison >=",
+            )
+        return bool_value(op1.value() >= op2.value())
+
+    def not_equal(self, op1, op2):
+        if op1.type() != op2.type():
+            return TRUE
+        return bool_value(op1.value() != op2.value())
+
+    def negate(self, op1):
+        if op1.type() != Type.INT and op1.type() != Type.STRING:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Invalid negation type",
+            )
+        return int_value(-op1.value())
+
+    def logical_not(self, op1):
+        if op1.type() != Type.BOOL:
+            super().error(
+                ErrorType.TYPE_ERROR,
+                "Illegal usage of not operation on non-boolean type",
+            )
+        return TRUE if op1.value() is False else FALSE
+
+    # maps each strict binary operator to the method that applies it
+    # (&& and || short circuit, so they are evaluated directly from their nodes)
+    operations = {
+        "+": add,
+        "-": subtract,
+        "*": multiply,
+        "/": divide,
+        "==": equal,
+        "<": less,
+        "<=": less_equal,
+        ">": greater,
+        ">=": greater_equal,
+        "!=": not_equal,
+    }
 
     def run_function_call(self, function_call, env=None):
         if not env:
             env = self.variables
 
-        name = function_call.dict["name"]
-        arg_nodes = function_call.dict["args"]
-        match name:
-            case "print":
-                res = ""
-                for arg in function_call.dict["args"]:
-                    status, output = self.evaluate_expression_and_lazy(arg, env)
-                    if status == ExecStatus.RAISE:
-                        return (status, output)
-                    res += get_printable(output)
-
-                super().output(res)
-                return (ExecStatus.CONTINUE, Value(Type.NIL))
-            case "inputi":
-                if len(function_call.dict["args"]) > 1:
-                    super().error(
-                        ErrorType.NAME_ERROR,
-                        "No inputi() function found that takes > 1 parameter",
-                    )
-                elif len(function_call.dict["args"]) == 1:
-                    status, output = self.evaluate_expression_and_lazy(
-                        function_call.dict["args"][0], env
-                    )
-                    if status == ExecStatus.RAISE:
-                        return (status, output)
-                    super().output(output.value())
-
-                return (ExecStatus.CONTINUE, Value(Type.INT, int(super().get_input())))
-            case "inputs":
-                if len(function_call.dict["args"]) > 1:
-                    super().error(
-                        ErrorType.NAME_ERROR,
-                        "No inputs() function found that takes > 1 parameter",
-                    )
-                elif len(function_call.dict["args"]) == 1:
-                    status, output = self.evaluate_expression_and_lazy(
-                        function_call.dict["args"][0], env
-                    )
-                    if status == ExecStatus.RAISE:
-                        return (status, output)
-                    super().output(output.value())
-
-                return (ExecStatus.CONTINUE, Value(Type.STRING, super().get_input()))
-            case _:
-                for function in self.functions:
-                    # if same name and same amount of args
-                    if function.dict["name"] == name and len(arg_nodes) == len(
-                        function.dict["args"]
-                    ):
-                        status, res = self.run_function(function, arg_nodes, env.copy())
-                        if status == ExecStatus.RETURN:
-                            return (ExecStatus.CONTINUE, res)
-                        elif status == ExecStatus.RAISE:
-                            return (status, res)
-                        # return NIL if no return value
-                        return (ExecStatus.CONTINUE, Value(Type.NIL))
+        name = function_call.name
+        if name in Interpreter.builtin_functions:
+            self.check_builtin(function_call)
+            values = [
+                self.evaluate_expression_and_lazy(arg, env)
+                for arg in function_call.args
+            ]
+            return self.run_builtin(name, values)
+        return self.call_function(function_call, env)
+
+    # runs a call to a user function, returning what it returns (which can be a
+    # LazyValue)
+    def call_function(self, function_call, env):
+        arg_nodes = function_call.args
+        function = self.find_function(function_call.name, len(arg_nodes))
+        return self.run_function(function, arg_nodes, env.copy())
+
+    # fails if a call to a builtin function has more args than it takes. this is
+    # checked before any of them are evaluated
+    def check_builtin(self, function_call):
+        name = function_call.name
+        if name != "print" and len(function_call.args) > 1:
+            super().error(
+                ErrorType.NAME_ERROR,
+                f"No {name}() function found that takes > 1 parameter",
+            )
 
+    # runs the builtin function called name with the forced values of its args
+    def run_builtin(self, name, values):
+        if name == "print":
+            super().output(format_line(values))
+            return NIL
+        if values:
+            super().output(values[0].value())
+        if name == "inputi":
+            return int_value(int(super().get_input()))
+        return Value(Type.STRING, super().get_input())
+
+    # returns the value of expression_node in env for a variable: the Value itself if
+    # evaluate_strict can work it out now, otherwise a LazyValue. snapshot says whether
+    # env has to be copied for the LazyValue (it's still live)
+    def delay(self, expression_node, env, snapshot=False):
+        if expression_node in self.strict_expressions:
+            value = self.evaluate_strict(expression_node, env)
+            if isinstance(value, Value):
+                return value
+        if self.governor:
+            self.governor.allocate(THUNK_SIZE)
+        return LazyValue(expression_node, env.copy() if snapshot else env)
+
+    # works out the value of expression_node in env if that can't fail or do anything
+    # else anyone could notice: every variable it reads has already been forced, every
+    # operator accepts its operands, and there are no function calls. otherwise returns
+    # the LazyValue evaluating it would force first, or None if something else would
+    # happen first
+    def evaluate_strict(self, expression_node, env):
+        if isinstance(expression_node, VarNode):
+            value = env.get(expression_node.name, expression_node.address)
+            if isinstance(value, LazyValue) and value.evaluated():
+                return value.value()
+            return value
+        if isinstance(expression_node, ValueNode):
+            return create_value(expression_node.val)
+        if isinstance(expression_node, NilNode):
+            return NIL
+        if isinstance(expression_node, UnaryOp):
+            op1 = self.evaluate_strict(expression_node.op1, env)
+            if not isinstance(op1, Value):
+                return op1
+            if expression_node.opcode == Opcode.NEG:
+                return int_value(-op1.value()) if op1.type() == Type.INT else None
+            return bool_value(not op1.value()) if op1.type() == Type.BOOL else None
+        if isinstance(expression_node, BinOp):
+            opcode = expression_node.opcode
+            op1 = self.evaluate_strict(expression_node.op1, env)
+            if not isinstance(op1, Value):
+                return op1
+            if opcode == Opcode.AND or opcode == Opcode.OR:
+                if op1.type() != Type.BOOL:
+                    return None
+                # && stops at the first false, || at the first true
+                if op1.value() is (opcode == Opcode.OR):
+                    return op1
+            op2 = self.evaluate_strict(expression_node.op2, env)
+            if not isinstance(op2, Value):
+                return op2
+            if opcode == Opcode.AND or opcode == Opcode.OR:
+                return op2 if op2.type() == Type.BOOL else None
+            if not is_safe_operation(opcode, op1, op2):
+                return None
+            return Interpreter.operation_handlers[opcode](self, op1, op2)
+        return None
+
+    # forces val. chains of LazyValues (like the ones x = x + 1, x = f() + x and
+    # x = f(x) + 1 build in a loop) are forced with a stack rather than by recursing
+    # down them, in the same order recursing would force them:
+    # - if evaluate_strict can work a LazyValue's expression out, it's done straight
+    #   away, once the LazyValue evaluate_strict says would be forced first has been
+    # - otherwise the expression is evaluated by a generator from evaluation_steps,
+    #   which yields every LazyValue it needs (an operand, a builtin's arg, or what a
+    #   function returned) so it can be forced here first, and is then sent its value
+    # evaluating a generator counts toward the governor's call depth, since it can run
+    # the rest of a function that has already returned. call runs a call to a user
+    # function (see call_function)
+    def evaluate_lazy(self, val, call=None):
+        if call is None:
+            call = self.call_function
+        governor = self.governor
+        forcing = []  # (LazyValue, generator or None) being forced
+        lazy = val  # the next LazyValue to force, or None
+        value = None  # the value of the last one forced
+        while True:
+            if lazy is not None:
+                if lazy.evaluated():
+                    value = lazy.value()
+                else:
+                    ast = lazy.ast()
+                    env = lazy.env()
+                    res = self.evaluate_strict(ast, env)
+                    if isinstance(res, LazyValue):
+                        # come back to lazy once res has its value
+                        forcing.append((lazy, None))
+                        lazy = res
+                        continue
+                    if res is None:
+                        if governor:
+                            governor.descend()
+                        forcing.append((lazy, self.evaluation_steps(ast, env, call)))
+                        value = None
+                    else:
+                        lazy.set_value(res)
+                        lazy.set_eval()
+                        value = res
+                lazy = None
+
+            if not forcing:
+                # should return a fully evaluated Value
+                return value
+            waiting, steps = forcing[-1]
+            if steps is None:
+                forcing.pop()
+                lazy = waiting
+                continue
+            try:
+                lazy = steps.send(value)
+            except StopIteration as done:
+                forcing.pop()
+                if governor:
+                    governor.exit()
+                waiting.set_value(done.value)
+                waiting.set_eval()
+                value = done.value
+
+    # a generator evaluating expression_node in env for evaluate_lazy, in the same
+    # order as evaluate_expression_and_lazy. each LazyValue it needs is yielded rather
+    # than forced, and it's sent the LazyValue's value. it returns the expression's
+    # value
+    def evaluation_steps(self, expression_node, env, call):
+        elem_type = expression_node.elem_type
+        if elem_type == "&&" or elem_type == "||":
+            # && stops at the first false, || at the first true
+            stop = elem_type == "||"
+            op1 = yield from self.evaluation_steps(expression_node.op1, env, call)
+            if op1.type() != Type.BOOL:
                 super().error(
-                    ErrorType.NAME_ERROR,
-                    f"Function {name} has not been defined",
+                    ErrorType.TYPE_ERROR,
+                    f"Incompatible types for comparison {elem_type}",
                 )
-
-    def evaluate_lazy(self, val):
-        if not val.evaluated():
-            status, res = self.evaluate_expression(val.ast(), val.env())
-            if status == ExecStatus.RAISE:
-                return (status, res)
-            while isinstance(res, LazyValue):
-                status, res = self.evaluate_lazy(res)
-                if status == ExecStatus.RAISE:
-                    return (status, res)
-            val.set_value(res)
-            val.set_eval()
-
-        # should return a fully evaluated Value
-        return (ExecStatus.CONTINUE, val.value())
+            if op1.value() is stop:
+                return bool_value(stop)
+            op2 = yield from self.evaluation_steps(expression_node.op2, env, call)
+            if op2.type() != Type.BOOL:
+                super().error(
+                    ErrorType.TYPE_ERROR,
+                    "Incompatible types for comparison &&",
+                )
+            return bool_value(op2.value())
+        if elem_type in Interpreter.binary_operators:
+            op1 = yield from self.evaluation_steps(expression_node.op1, env, call)
+            op2 = yield from self.evaluation_steps(expression_node.op2, env, call)
+            operation = Interpreter.operation_handlers[expression_node.opcode]
+            return operation(self, op1, op2)
+        if elem_type == "neg":
+            op1 = yield from self.evaluation_steps(expression_node.op1, env, call)
+            return self.negate(op1)
+        if elem_type == "!":
+            op1 = yield from self.evaluation_steps(expression_node.op1, env, call)
+            return self.logical_not(op1)
+
+        if elem_type == "fcall":
+            if expression_node.name in Interpreter.builtin_functions:
+                self.check_builtin(expression_node)
+                values = []
+                for arg in expression_node.args:
+                    values.append((yield from self.evaluation_steps(arg, env, call)))
+                return self.run_builtin(expression_node.name, values)
+            res = call(expression_node, env)
+        else:
+            res = Interpreter.expression_handlers[expression_node.opcode](
+                self, expression_node, env
+            )
+        if isinstance(res, LazyValue):
+            res = yield res
+        return res
 
     def evaluate_expression_and_lazy(self, exp, env=None):
-        status, output = self.evaluate_expression(exp, env)
-        if status == ExecStatus.RAISE:
-            return (status, output)
+        if not env:
+            env = self.variables
+        output = Interpreter.expression_handlers[exp.opcode](self, exp, env)
         if isinstance(output, LazyValue):
-            status, output = self.evaluate_lazy(output)
-            if status == ExecStatus.RAISE:
-                return (status, output)
-
-        return (status, output)
-
-    # gets op1 and op2 when evaluating an expression
-    def get_ops(self, expression_node, env):
-        status1, op1 = self.evaluate_expression_and_lazy(
-            expression_node.dict["op1"], env
-        )
-        if status1 == ExecStatus.RAISE:
-            return (status1, op1, None)
-        status2, op2 = self.evaluate_expression_and_lazy(
-            expression_node.dict["op2"], env
-        )
-        if status2 == ExecStatus.RAISE:
-            return (status2, None, op2)
-
-        return (ExecStatus.CONTINUE, op1, op2)
+            output = self.evaluate_lazy(output)
+        return output
+
+    # handlers indexed by opcode, for run_statement and evaluate_expression
+    statement_handlers = handler_table(
+        {
+            Opcode.VAR_DEF: run_vardef,
+            Opcode.ASSIGN: run_assign,
+            Opcode.FCALL: run_fcall,
+            Opcode.IF: run_if,
+            Opcode.FOR: run_for,
+            Opcode.RETURN: run_return,
+            Opcode.TRY: run_try,
+            Opcode.RAISE: run_raise,
+        },
+        skip_statement,
+    )
+    expression_handlers = handler_table(
+        {
+            **dict.fromkeys(
+                (InterpreterBase.OPCODES[op] for op in operations),
+                evaluate_binary_operation,
+            ),
+            Opcode.AND: evaluate_and,
+            Opcode.OR: evaluate_or,
+            Opcode.INT: evaluate_value,
+            Opcode.STRING: evaluate_value,
+            Opcode.BOOL: evaluate_value,
+            Opcode.NIL: evaluate_nil,
+            Opcode.VAR: evaluate_variable,
+            Opcode.NEG: evaluate_negate,
+            Opcode.NOT: evaluate_not,
+            Opcode.FCALL: run_function_call,
+        },
+        evaluate_nothing,
+    )
+    operation_handlers = handler_table(
+        {InterpreterBase.OPCODES[op]: method for op, method in operations.items()}
+    )
 
 
 if __name__ == "__main__":
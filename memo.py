@@ -0,0 +1,180 @@
+# memoization of pure Brewin functions.
+#
+# find_pure_functions works out which functions always give the same result for the same
+# args without anything else being able to tell they ran: they don't print or read
+# input, create or touch structs, or raise, and only call other pure functions. since
+# brewin is dynamically scoped, a pure function also can't read or assign any variable
+# that isn't one of its args or a variable it has already defined, or it could see (and
+# change) variables of whoever called it.
+# the interpreters keep the results of pure functions in a MemoTable, keyed by the
+# function and the (type, value) of every arg
+
+from collections import OrderedDict
+
+IO_FUNCTIONS = {"print", "inputi", "inputs"}
+
+
+# returns the set of function nodes in functions ((name, arg count) : function node)
+# that are pure. if types is given, every arg, variable and return value of a pure
+# function must have one of those types (a return type may also be void)
+def find_pure_functions(functions, types=None):
+    calls = {}  # function node : (name, arg count) of every function it calls
+    pure = set()
+    for function in functions.values():
+        checker = PurityChecker(types)
+        if checker.check_function(function):
+            pure.add(function)
+            calls[function] = checker.calls
+
+    # a function that calls an impure (or missing) function isn't pure either; repeat
+    # until nothing changes, so recursive functions can still be pure
+    changed = True
+    while changed:
+        changed = False
+        for function in list(pure):
+            for call in calls[function]:
+                if functions.get(call) not in pure:
+                    pure.discard(function)
+                    changed = True
+                    break
+    return pure
+
+
+class PurityChecker:
+    def __init__(self, types):
+        self.types = types
+        self.scopes = []  # names defined in each enclosing block
+        self.calls = set()
+
+    def check_function(self, func_node):
+        if self.types is not None:
+            if func_node.return_type not in self.types | {"void"}:
+                return False
+            if any(arg.var_type not in self.types for arg in func_node.args):
+                return False
+        return self.check_block(
+            func_node.statements, {arg.name for arg in func_node.args}
+        )
+
+    def check_block(self, statement_nodes, names=None):
+        self.scopes.append(set() if names is None else names)
+        pure = all(self.check_statement(node) for node in statement_nodes or [])
+        self.scopes.pop()
+        return pure
+
+    def is_local(self, name):
+        return any(name in scope for scope in self.scopes)
+
+    def check_statement(self, statement_node):
+        match statement_node.elem_type:
+            case "vardef":
+                if self.types is not None and statement_node.var_type not in self.types:
+                    return False
+                self.scopes[-1].add(statement_node.name)
+                return True
+            case "=":
+                return self.is_local(statement_node.name) and self.check_expression(
+                    statement_node.expression
+                )
+            case "if":
+                # each branch only sees the variables defined in it
+                return (
+                    self.check_expression(statement_node.condition)
+                    and self.check_block(statement_node.statements)
+                    and self.check_block(statement_node.else_statements)
+                )
+            case "for":
+                return (
+                    self.check_statement(statement_node.init)
+                    and self.check_expression(statement_node.condition)
+                    and self.check_block(statement_node.statements)
+                    and self.check_statement(statement_node.update)
+                )
+            case "return":
+                expression = statement_node.expression
+                return expression is None or self.check_expression(expression)
+            case "fcall":
+                return self.check_expression(statement_node)
+            case "try" | "catch" | "raise":
+                return False
+            case _:
+                return True
+
+    def check_expression(self, expression_node):
+        match expression_node.elem_type:
+            case "int" | "string" | "bool" | "nil":
+                return True
+            case "var":
+                # dotted names are struct fields
+                return self.is_local(expression_node.name)
+            case "fcall":
+                name = expression_node.name
+                if name in IO_FUNCTIONS:
+                    return False
+                self.calls.add((name, len(expression_node.args)))
+                return all(self.check_expression(arg) for arg in expression_node.args)
+            case "neg" | "!":
+                return self.check_expression(expression_node.op1)
+            case "new":
+                return False
+            case _:
+                return self.check_expression(
+                    expression_node.op1
+                ) and self.check_expression(expression_node.op2)
+
+
+# returns the memo key for calling function with args, or None if one of the args can't
+# be part of a key (a struct)
+def memo_key(function, args):
+    key = (function, tuple((arg.type(), arg.value()) for arg in args))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+# a bounded table of results, dropping the least recently used one when it's full
+class MemoTable:
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.results = OrderedDict()  # memo key : result
+
+        # counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0  # dropped to stay under max_size
+
+    # returns the result stored for key, or None
+    def get(self, key):
+        result = self.results.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.results.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        self.results[key] = result
+        self.results.move_to_end(key)
+        while len(self.results) > self.max_size:
+            self.results.popitem(last=False)
+            self.evictions += 1
+
+    # returns the counters, hit rate and current size
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self.results),
+            "max_size": self.max_size,
+        }
+
+    # empties the table and resets the counters
+    def clear(self):
+        self.results.clear()
+        self.hits = self.misses = self.evictions = 0
@@ -0,0 +1,155 @@
+# output sinks: where an interpreter sends every line a program prints. by default an
+# interpreter keeps every line in memory (so get_output can return them) and prints it
+# as it goes, but a program that prints millions of lines doesn't have to: it can write
+# them to a file descriptor in large buffered chunks, keep only the last few, hand each
+# one to a callback, or throw them away.
+# every sink can be given a limit on the number of lines and bytes it accepts; lines
+# past either limit are dropped (and counted) instead of written
+
+import os
+import sys
+from collections import deque
+
+# when a StreamSink writes what it has buffered
+FLUSH_LINE = "line"  # after every line
+FLUSH_BUFFER = "buffer"  # once buffer_size bytes are waiting
+FLUSH_POLICIES = (FLUSH_LINE, FLUSH_BUFFER)
+
+
+class OutputSink:
+    def __init__(self, max_lines=None, max_bytes=None):
+        self.max_lines = max_lines  # None for no limit
+        self.max_bytes = max_bytes  # None for no limit, counted in utf-8
+        self.reset()
+
+    # called by the interpreter for every line printed; v is usually a string, but the
+    # prompts of inputi/inputs in v4 can be any value
+    def write(self, v):
+        if self.max_lines is not None and self.lines >= self.max_lines:
+            self.dropped += 1
+            return
+        if self.max_bytes is not None:
+            size = len(str(v).encode()) + 1
+            if self.bytes + size > self.max_bytes:
+                self.dropped += 1
+                return
+            self.bytes += size
+        self.lines += 1
+        self.emit(v)
+
+    # subclasses handle a line that's within the limits here
+    def emit(self, v):
+        pass
+
+    # writes out anything buffered; called when a program finishes (even if it fails)
+    # and before reading input from the keyboard
+    def flush(self):
+        pass
+
+    # returns the lines this sink kept, for sinks that keep any
+    def get_output(self):
+        return []
+
+    # starts over for another run of a program
+    def reset(self):
+        self.lines = 0  # accepted
+        self.bytes = 0  # accepted, only counted if there's a byte limit
+        self.dropped = 0  # over a limit
+
+    # whether any line has been dropped for going over a limit
+    def truncated(self):
+        return self.dropped > 0
+
+
+# keeps every line, printing each one as it comes if echo is set (the default sink)
+class CaptureSink(OutputSink):
+    def __init__(self, echo=False, max_lines=None, max_bytes=None):
+        self.echo = echo
+        super().__init__(max_lines, max_bytes)
+
+    def emit(self, v):
+        if self.echo:
+            print(v)
+        self.output_log.append(v)
+
+    def get_output(self):
+        return self.output_log
+
+    def reset(self):
+        super().reset()
+        self.output_log = []
+
+
+# writes lines to a file descriptor (stdout by default), buffering them and writing
+# them out according to flush_policy
+class StreamSink(OutputSink):
+    def __init__(
+        self,
+        fd=1,
+        buffer_size=1 << 16,
+        flush_policy=FLUSH_BUFFER,
+        max_lines=None,
+        max_bytes=None,
+    ):
+        if flush_policy not in FLUSH_POLICIES:
+            raise ValueError(f"Unknown flush policy {flush_policy}")
+        self.fd = fd
+        self.buffer_size = buffer_size
+        self.flush_policy = flush_policy
+        self.buffer = []  # lines waiting to be written
+        self.buffered = 0  # characters in buffer
+        super().__init__(max_lines, max_bytes)
+
+    def emit(self, v):
+        line = f"{v}\n"
+        self.buffer.append(line)
+        self.buffered += len(line)
+        if self.flush_policy == FLUSH_LINE or self.buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        data = "".join(self.buffer).encode()
+        self.buffer.clear()
+        self.buffered = 0
+        # anything printed through sys.stdout (like the parser's syntax errors, or the
+        # lines of a CaptureSink that echoes) is still in its buffer, so write it first
+        # to keep everything in the order it was printed
+        sys.stdout.flush()
+        # os.write can write less than it's given
+        while data:
+            written = os.write(self.fd, data)
+            data = data[written:]
+
+
+# keeps only the last size lines
+class RingSink(OutputSink):
+    def __init__(self, size=1000, max_lines=None, max_bytes=None):
+        self.size = size
+        super().__init__(max_lines, max_bytes)
+
+    def emit(self, v):
+        self.output_log.append(v)
+
+    def get_output(self):
+        return list(self.output_log)
+
+    def reset(self):
+        super().reset()
+        self.output_log = deque(maxlen=self.size)
+
+
+# calls callback with every line
+class CallbackSink(OutputSink):
+    def __init__(self, callback, max_lines=None, max_bytes=None):
+        self.callback = callback
+        super().__init__(max_lines, max_bytes)
+
+    def emit(self, v):
+        self.callback(v)
+
+
+# throws every line away, only counting them
+class DiscardSink(OutputSink):
+    pass
@@ -40,7 +40,6 @@ import sys
 import types
 import copy
 import os
-import inspect
 
 # This tuple contains known string types
 try:
@@ -727,6 +726,9 @@ class LexerReflect(object):
 
     # Validate all of the t_rules collected
     def validate_rules(self):
+        # only needed for reflection, so it isn't imported with the module
+        import inspect
+
         for state in self.stateinfo:
             # Validate all rules defined by functions
 
@@ -830,6 +832,9 @@ class LexerReflect(object):
     # -----------------------------------------------------------------------------
 
     def validate_module(self, module):
+        # only needed for reflection, so it isn't imported with the module
+        import inspect
+
         try:
             lines, linen = inspect.getsourcelines(module)
         except IOError:
@@ -63,7 +63,6 @@ import re
 import types
 import sys
 import os.path
-import inspect
 import warnings
 
 __version__    = '3.11'
@@ -2997,6 +2996,9 @@ class ParserReflect(object):
     # -----------------------------------------------------------------------------
 
     def validate_modules(self):
+        # only needed for reflection, so it isn't imported with the module
+        import inspect
+
         # Match def p_funcname(
         fre = re.compile(r'\s*def\s+(p_[a-zA-Z_0-9]*)\(')
 
@@ -3036,6 +3038,9 @@ class ParserReflect(object):
 
     # Validate the error function
     def validate_error_func(self):
+        # only needed for reflection, so it isn't imported with the module
+        import inspect
+
         if self.error_func:
             if isinstance(self.error_func, types.FunctionType):
                 ismethod = 0
@@ -3127,6 +3132,9 @@ class ParserReflect(object):
 
     # Get all p_functions from the grammar
     def get_pfunctions(self):
+        # only needed for reflection, so it isn't imported with the module
+        import inspect
+
         p_functions = []
         for name, item in self.pdict.items():
             if not name.startswith('p_') or name == 'p_error':
@@ -3148,6 +3156,9 @@ class ParserReflect(object):
 
     # Validate all of the p_functions
     def validate_pfunctions(self):
+        # only needed for reflection, so it isn't imported with the module
+        import inspect
+
         grammar = []
         # Check for non-empty symbols
         if len(self.pfuncs) == 0:
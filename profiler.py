@@ -0,0 +1,239 @@
+# a profiler for Brewin programs, turned on by passing trace_output=True to an
+# Interpreter. it records, for every Brewin function, how many times it was called and
+# the time spent in it, both in total (inclusive) and not counting the functions it
+# called (exclusive), and how many times the statement on each line of the program ran.
+# the interpreters call enter and exit around every function call and hit for every
+# statement, only when profiling, so a normal run doesn't pay for any of it.
+# the results can be printed with report, loaded into pstats (pstats.Stats(profiler),
+# or dump_stats to a file like cProfile does), or written as collapsed stacks (one
+# "main;f;g <microseconds>" line per call stack) for flamegraph tools
+
+import marshal
+import sys
+import threading
+import time
+
+
+class Profiler:
+    def __init__(self, filename="<brewin>", clock=time.perf_counter):
+        self.filename = filename  # what pstats shows as the file of every function
+        self.clock = clock
+        self.running = False  # between start and finish
+        self.reset()
+
+    def reset(self):
+        # function node : [primitive calls, calls, exclusive time, inclusive time].
+        # like cProfile, a call is primitive if it isn't recursive, and only those add
+        # to inclusive time, so it isn't counted more than once
+        self.functions = {}
+        self.callers = {}  # (caller node, callee node) : same as functions
+        self.line_hits = {}  # line : number of statements run on it
+        # every distinct call stack is a path: an id for the (parent path id, function
+        # node) pair, so a frame finds its path without building the whole stack
+        self.path_ids = {}  # (parent path id, function node) : path id
+        self.paths = []  # path id : (parent path id, function node)
+        self.path_times = []  # path id : exclusive time
+        self.stack = []  # [function node, start time, time in callees, path id]
+        self.active = {}  # function node : frames of it on the stack
+        self.stats = {}  # filled in by create_stats
+
+    # called when a function starts running
+    def enter(self, func_node):
+        stack = self.stack
+        key = (stack[-1][3] if stack else None, func_node)
+        path = self.path_ids.get(key)
+        if path is None:
+            path = len(self.paths)
+            self.path_ids[key] = path
+            self.paths.append(key)
+            self.path_times.append(0.0)
+        self.active[func_node] = self.active.get(func_node, 0) + 1
+        stack.append([func_node, self.clock(), 0.0, path])
+
+    # called when the function that entered last returns
+    def exit(self):
+        func_node, start, callee_time, path = self.stack.pop()
+        total = self.clock() - start
+        own = total - callee_time
+        self.path_times[path] += own
+
+        active = self.active[func_node] - 1
+        self.active[func_node] = active
+        primitive = active == 0
+        record(self.functions, func_node, primitive, own, total)
+        if self.stack:
+            caller = self.stack[-1]
+            caller[2] += total
+            record(self.callers, (caller[0], func_node), primitive, own, total)
+
+    # returns how many functions are running, to pass to unwind later
+    def depth(self):
+        return len(self.stack)
+
+    # exits every function entered after depth, when a raise leaves them
+    def unwind(self, depth):
+        while len(self.stack) > depth:
+            self.exit()
+
+    # called when a program starts. counting statements and timing functions can add a
+    # Python frame for every one that's running, so the recursion limit is raised to
+    # match, and a program can go at least as deep as it could without the profiler
+    def start(self):
+        if not self.running:
+            self.running = True
+            raise_recursion_limit()
+
+    # called when a program stops, so functions it was in the middle of are counted
+    def finish(self):
+        self.unwind(0)
+        if self.running:
+            self.running = False
+            restore_recursion_limit()
+
+    # called for every statement that runs
+    def hit(self, statement_node):
+        line = statement_node.line
+        self.line_hits[line] = self.line_hits.get(line, 0) + 1
+
+    # returns a statement handler that counts the statements it runs before running
+    # them with handler
+    def counting(self, handler):
+        line_hits = self.line_hits
+
+        def counted(interpreter, statement_node, *args):
+            line = statement_node.line
+            line_hits[line] = line_hits.get(line, 0) + 1
+            return handler(interpreter, statement_node, *args)
+
+        return counted
+
+    # takes a compiler's compile_statement and returns one whose closures count their
+    # statement before running it
+    def counting_compiler(self, compile_statement):
+        hit = self.hit
+
+        def compile_counted(statement_node):
+            statement = compile_statement(statement_node)
+
+            def counted(*args):
+                hit(statement_node)
+                return statement(*args)
+
+            return counted
+
+        return compile_counted
+
+    # takes a compiler's compile_function and returns one whose closures enter and exit
+    # their function around running it
+    def timing_compiler(self, compile_function):
+        enter = self.enter
+        exit = self.exit
+
+        def compile_timed(func_node):
+            function = compile_function(func_node)
+
+            def timed(*args):
+                enter(func_node)
+                try:
+                    return function(*args)
+                finally:
+                    exit()
+
+            return timed
+
+        return compile_timed
+
+    # the (file, line, function name) pstats identifies a function by
+    def label(self, func_node):
+        return (self.filename, func_node.line or 0, func_node.name)
+
+    # fills in stats the way cProfile does, so pstats.Stats can load this profiler
+    def create_stats(self):
+        self.stats = {}
+        for func_node, (cc, nc, tt, ct) in self.functions.items():
+            self.stats[self.label(func_node)] = (cc, nc, tt, ct, {})
+        for (caller, callee), (cc, nc, tt, ct) in self.callers.items():
+            self.stats[self.label(callee)][4][self.label(caller)] = (cc, nc, tt, ct)
+
+    # writes the stats to a file pstats can read, like cProfile's dump_stats
+    def dump_stats(self, file):
+        self.create_stats()
+        with open(file, "wb") as f:
+            marshal.dump(self.stats, f)
+
+    # returns the collapsed stacks, one line for every call stack with the exclusive
+    # time spent in it in microseconds
+    def collapsed(self):
+        lines = []
+        for path, (parent, func_node) in enumerate(self.paths):
+            names = [func_node.name]
+            while parent is not None:
+                parent, caller = self.paths[parent]
+                names.append(caller.name)
+            lines.append(
+                f"{';'.join(reversed(names))} {round(self.path_times[path] * 1e6)}"
+            )
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def write_collapsed(self, file):
+        with open(file, "w") as f:
+            f.write(self.collapsed())
+
+    # returns a table of every function, most inclusive time first, followed by the
+    # number of statements run on each line
+    def report(self):
+        lines = [
+            f"{'calls':>10} {'exclusive':>12} {'inclusive':>12}  function",
+        ]
+        functions = sorted(
+            self.functions.items(), key=lambda item: item[1][3], reverse=True
+        )
+        for func_node, (cc, nc, tt, ct) in functions:
+            calls = str(nc) if cc == nc else f"{nc}/{cc}"
+            lines.append(
+                f"{calls:>10} {tt:>12.6f} {ct:>12.6f}  "
+                f"{func_node.name} (line {func_node.line})"
+            )
+        lines.append("")
+        lines.append(f"{'line':>10} {'hits':>12}")
+        for line in sorted(self.line_hits, key=lambda line: line or 0):
+            lines.append(f"{str(line):>10} {self.line_hits[line]:>12}")
+        return "\n".join(lines)
+
+
+# the recursion limit is shared by the whole process, so it's doubled when the first
+# profiler starts and set back to what it was when the last one running finishes, even
+# if they run at the same time in different threads
+recursion_lock = threading.Lock()
+profilers_running = 0
+recursion_limit = None  # the one to go back to
+
+
+def raise_recursion_limit():
+    global profilers_running, recursion_limit
+    with recursion_lock:
+        if profilers_running == 0:
+            recursion_limit = sys.getrecursionlimit()
+            sys.setrecursionlimit(recursion_limit * 2)
+        profilers_running += 1
+
+
+def restore_recursion_limit():
+    global profilers_running
+    with recursion_lock:
+        profilers_running -= 1
+        if profilers_running == 0:
+            sys.setrecursionlimit(recursion_limit)
+
+
+# adds a call to the [primitive calls, calls, exclusive time, inclusive time] entry of
+# table[key]
+def record(table, key, primitive, own, total):
+    entry = table.get(key)
+    if entry is None:
+        entry = table[key] = [0, 0, 0.0, 0.0]
+    entry[1] += 1
+    entry[2] += own
+    if primitive:
+        entry[0] += 1
+        entry[3] += total
@@ -0,0 +1,138 @@
+# the ProgramCache class maps the hash of a program's source to its parsed AST, already
+# annotated by the Resolver, so running the same program again skips the lexer and
+# parser entirely. ASTs are never changed once they've been resolved, so every
+# interpreter (of any version) running the same source can share one. an interpreter
+# that rewrites the AST before running it (like the ConstantFolder, which folds with
+# each version's semantics) loads it under its own variant name and passes the rewrite
+# as optimize, which runs once after the Resolver; each variant is cached separately.
+# the most recently used programs are kept in memory; if a directory is given (or the
+# BREWIN_CACHE_DIR environment variable is set for the shared cache), ASTs are also
+# pickled to disk so they survive across processes
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+from brewparse import Parser
+from resolver import Resolver
+
+# bump whenever the shape of the AST or its annotations changes, so stale files on disk
+# are ignored instead of loaded
+CACHE_FORMAT = 6
+
+
+class ProgramCache:
+    def __init__(self, max_size=128, directory=None):
+        self.max_size = max_size
+        self.directory = directory
+        self.programs = OrderedDict()  # source hash : resolved AST
+        self.lock = threading.Lock()
+
+        # counters
+        self.hits = 0  # found in memory
+        self.disk_hits = 0  # found on disk
+        self.misses = 0  # had to be parsed
+        self.evictions = 0  # dropped from memory to stay under max_size
+
+    # returns the cache key for a program's source
+    def key(self, program, variant=""):
+        return hashlib.sha256(
+            f"{CACHE_FORMAT}:{variant}:{program}".encode()
+        ).hexdigest()
+
+    # returns the resolved AST for a program, parsing it only if it isn't cached
+    def load(self, program, variant="", optimize=None):
+        key = self.key(program, variant)
+
+        with self.lock:
+            ast = self.programs.get(key)
+            if ast is not None:
+                self.programs.move_to_end(key)
+                self.hits += 1
+                return ast
+
+        ast = self.read(key)
+        if ast is not None:
+            with self.lock:
+                self.disk_hits += 1
+        else:
+            # syntax errors are raised here and never cached
+            parser = Parser()
+            ast = parser.parse(program)
+            Resolver().resolve_program(ast)
+            if optimize:
+                optimize(ast)
+            with self.lock:
+                self.misses += 1
+            if parser.syntax_errors:
+                # the parser recovered, but its diagnostics are printed only while
+                # parsing, so the program is parsed again every time to print them
+                return ast
+            self.write(key, ast)
+
+        with self.lock:
+            self.programs[key] = ast
+            self.programs.move_to_end(key)
+            while len(self.programs) > self.max_size:
+                self.programs.popitem(last=False)
+                self.evictions += 1
+        return ast
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.ast")
+
+    # returns the AST stored on disk for a key, or None if there isn't a usable one
+    def read(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(self.path(key), "rb") as file:
+                return pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+
+    def write(self, key, ast):
+        if not self.directory:
+            return
+        temp_path = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # write to a temporary file first so readers never see a partial file
+            fd, temp_path = tempfile.mkstemp(dir=self.directory)
+            with os.fdopen(fd, "wb") as file:
+                pickle.dump(ast, file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.path(key))
+        except (OSError, pickle.PicklingError, RecursionError):
+            # the disk cache is only an optimization
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    # returns the counters and current size
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self.programs),
+                "max_size": self.max_size,
+            }
+
+    # empties the in-memory cache and resets the counters (files on disk are kept)
+    def clear(self):
+        with self.lock:
+            self.programs.clear()
+            self.hits = self.disk_hits = self.misses = self.evictions = 0
+
+
+# the cache shared by every interpreter
+program_cache = ProgramCache(directory=os.environ.get("BREWIN_CACHE_DIR"))
+
+
+# returns the resolved AST for a program from the shared cache
+def load_program(program, variant="", optimize=None):
+    return program_cache.load(program, variant, optimize)
@@ -0,0 +1,114 @@
+# the Resolver walks every function once before it runs and works out where each
+# variable will live. every block that gets its own scope at runtime (function, if, for,
+# try and catch) gets a layout: a dict from variable name to slot index, shared by every
+# scope created for that block. every vardef, = and var node gets an address: a
+# (depth, slot, layout) tuple giving how many scopes above the current one the variable
+# lives, which slot it's in, and the layout that scope is expected to have. a dotted
+# name (a struct field) is also split into its parts once here, as the node's path.
+#
+# brewin is dynamically scoped, so an address is only a guess at where the lookup by
+# name would end up: the environment uses it when the scope at that depth has the
+# expected layout and the slot has been defined, and falls back to searching by name
+# otherwise (variables from a calling function, uses before a vardef has run, ...)
+
+from element import BinOp
+
+
+class Resolver:
+    def __init__(self):
+        self.layouts = []  # layouts of the blocks enclosing the current node
+
+    def resolve_program(self, ast):
+        for function in ast.functions:
+            self.resolve_function(function)
+
+    def resolve_function(self, func_node):
+        layout = {}
+        for arg in func_node.args:
+            layout.setdefault(arg.name, len(layout))
+        func_node.layout = layout
+
+        self.layouts.append(layout)
+        self.resolve_statements(func_node.statements)
+        self.layouts.pop()
+
+    # resolves statement_nodes in a new block scope and records its layout on node
+    def resolve_block(self, node, statement_nodes):
+        layout = {}
+        node.layout = layout
+
+        self.layouts.append(layout)
+        self.resolve_statements(statement_nodes)
+        self.layouts.pop()
+
+    def resolve_statements(self, statement_nodes):
+        if not statement_nodes:
+            return
+        for statement_node in statement_nodes:
+            self.resolve_statement(statement_node)
+
+    def resolve_statement(self, statement_node):
+        match statement_node.elem_type:
+            case "vardef":
+                layout = self.layouts[-1]
+                name = statement_node.name
+                # a second vardef in the same block shares the slot, so it still fails
+                slot = layout.setdefault(name, len(layout))
+                statement_node.address = (0, slot, layout)
+            case "=":
+                self.resolve_expression(statement_node.expression)
+                self.resolve_name(statement_node)
+            case "fcall":
+                self.resolve_expression(statement_node)
+            case "if":
+                # the if scope covers the condition and both branches
+                layout = {}
+                statement_node.layout = layout
+
+                self.layouts.append(layout)
+                self.resolve_expression(statement_node.condition)
+                self.resolve_statements(statement_node.statements)
+                self.resolve_statements(statement_node.else_statements)
+                self.layouts.pop()
+            case "for":
+                # only the body runs in the for scope
+                self.resolve_statement(statement_node.init)
+                self.resolve_expression(statement_node.condition)
+                self.resolve_block(statement_node, statement_node.statements)
+                self.resolve_statement(statement_node.update)
+            case "return":
+                if statement_node.expression:
+                    self.resolve_expression(statement_node.expression)
+            case "try":
+                self.resolve_block(statement_node, statement_node.statements)
+                # the try scope is gone by the time a catch block runs
+                for catch in statement_node.catchers:
+                    self.resolve_block(catch, catch.statements)
+            case "raise":
+                self.resolve_expression(statement_node.exception_type)
+
+    def resolve_expression(self, expression_node):
+        match expression_node.elem_type:
+            case "var":
+                self.resolve_name(expression_node)
+            case "fcall":
+                for arg in expression_node.args:
+                    self.resolve_expression(arg)
+            case "neg" | "!":
+                self.resolve_expression(expression_node.op1)
+            case _:
+                if isinstance(expression_node, BinOp):
+                    self.resolve_expression(expression_node.op1)
+                    self.resolve_expression(expression_node.op2)
+
+    # addresses a var or = node by the innermost enclosing block that defines its name
+    # (or the struct variable its dotted name starts with)
+    def resolve_name(self, node):
+        parts = node.name.split(".")
+        if len(parts) > 1:
+            node.path = tuple(parts)
+        name = parts[0]
+        for depth, layout in enumerate(reversed(self.layouts)):
+            if name in layout:
+                node.address = (depth, layout[name], layout)
+                return
@@ -0,0 +1,86 @@
+# strictness analysis for v4's lazy evaluation.
+#
+# v4 wraps every value that's assigned, returned or passed as an arg in a LazyValue
+# holding a snapshot of the environment, and only evaluates it once it's needed, so a
+# loop doing x = x + 1 builds a chain of LazyValues, one per iteration. an expression
+# can be evaluated right away instead when nothing could tell the difference: it
+# doesn't call a function (which could print, read input or raise), every variable it
+# reads has already been forced, and none of its operators can fail on their operands.
+# find_strict_expressions finds the expressions that pass the first test ahead of time;
+# the interpreter checks the rest when it gets to them (see evaluate_strict)
+
+from element import BinOp, FCall, UnaryOp
+from intbase import Opcode
+from type_valuev4 import Type
+
+
+# returns the set of expression nodes in the program that are assigned, returned or
+# passed as an arg and never call a function
+def find_strict_expressions(ast):
+    analyzer = StrictnessAnalyzer()
+    for function in ast.functions:
+        analyzer.analyze_statements(function.statements)
+    return analyzer.strict
+
+
+class StrictnessAnalyzer:
+    def __init__(self):
+        self.strict = set()
+
+    def analyze_statements(self, statement_nodes):
+        for statement_node in statement_nodes or []:
+            self.analyze_statement(statement_node)
+
+    def analyze_statement(self, statement_node):
+        match statement_node.elem_type:
+            case "=":
+                if self.analyze(statement_node.expression):
+                    self.strict.add(statement_node.expression)
+            case "return":
+                expression = statement_node.expression
+                if expression is not None and self.analyze(expression):
+                    self.strict.add(expression)
+            case "fcall":
+                self.analyze(statement_node)
+            case "if":
+                self.analyze(statement_node.condition)
+                self.analyze_statements(statement_node.statements)
+                self.analyze_statements(statement_node.else_statements)
+            case "for":
+                self.analyze_statement(statement_node.init)
+                self.analyze(statement_node.condition)
+                self.analyze_statement(statement_node.update)
+                self.analyze_statements(statement_node.statements)
+            case "try":
+                self.analyze_statements(statement_node.statements)
+                for catch in statement_node.catchers:
+                    self.analyze_statements(catch.statements)
+            case "raise":
+                self.analyze(statement_node.exception_type)
+
+    # returns whether expression_node never calls a function, recording the args of
+    # the calls it does make that don't
+    def analyze(self, expression_node):
+        if isinstance(expression_node, FCall):
+            for arg in expression_node.args:
+                if self.analyze(arg):
+                    self.strict.add(arg)
+            return False
+        if isinstance(expression_node, BinOp):
+            # both sides are analyzed so calls in either one are recorded
+            op1 = self.analyze(expression_node.op1)
+            op2 = self.analyze(expression_node.op2)
+            return op1 and op2
+        if isinstance(expression_node, UnaryOp):
+            return self.analyze(expression_node.op1)
+        return True
+
+
+# whether applying the binary operator opcode to the forced values op1 and op2 always
+# succeeds (&& and || aren't included, since they short circuit)
+def is_safe_operation(opcode, op1, op2):
+    if opcode == Opcode.EQ or opcode == Opcode.NOT_EQ:
+        return True
+    if op1.type() != Type.INT or op2.type() != Type.INT:
+        return opcode == Opcode.ADD and op1.type() == op2.type() == Type.STRING
+    return opcode != Opcode.DIVIDE or op2.value() != 0
@@ -0,0 +1,83 @@
+# checks batch.py: jobs capture what they print to stdout, jobs that run too long are
+# stopped, and a timeout that lands as a job finishes still gives a result (with the
+# timer disarmed and stdout restored) instead of killing the worker
+#
+# usage: python3 -m pytest test_batch.py
+
+import signal
+import sys
+
+import pytest
+
+import batch
+import interpreterv2
+from batch import Job, JobTimeout, make_jobs, run_batch, run_job
+
+LOOP = "func main() { var i; for (i = 0; true; i = i + 0) { i = i; } }"
+
+needs_timer = pytest.mark.skipif(
+    not hasattr(signal, "setitimer"), reason="timeouts need SIGALRM"
+)
+
+
+# installs the SIGALRM handler a worker would, for jobs run in this process
+@pytest.fixture
+def worker():
+    handler = signal.getsignal(signal.SIGALRM) if hasattr(signal, "SIGALRM") else None
+    batch.init_worker()
+    yield
+    if handler is not None:
+        signal.signal(signal.SIGALRM, handler)
+
+
+def test_stdout():
+    jobs = make_jobs(
+        ["func f() { } func main() { print(1); }"], [None, None, None], version=2
+    )
+    results = sorted(run_batch(jobs, processes=2), key=lambda result: result["id"])
+    assert [result["id"] for result in results] == [(0, 0), (0, 1), (0, 2)]
+    for result in results:
+        assert result["output"] == ["1"]
+        assert result["stdout"] == "Syntax error at '}' on line 1\n"
+
+
+@needs_timer
+def test_timeout():
+    jobs = make_jobs([LOOP], version=2, timeout=0.2)
+    (result,) = run_batch(jobs, processes=1)
+    assert result["timed_out"]
+
+
+# JobTimeout raised while the result of a finished job is being built, as it would be
+# if the timer went off right as the program returned
+@needs_timer
+def test_timeout_at_completion(worker, monkeypatch):
+    get_output = interpreterv2.Interpreter.get_output
+    raised = []
+
+    def timeout_once(self):
+        if not raised:
+            raised.append(True)
+            raise JobTimeout()
+        return get_output(self)
+
+    monkeypatch.setattr(interpreterv2.Interpreter, "get_output", timeout_once)
+    stdout = sys.stdout
+    result = run_job(Job("func main() { print(1); }", version=2, timeout=5))
+    assert raised
+    assert result["timed_out"]
+    assert result["output"] == ["1"]
+    assert sys.stdout is stdout
+    assert signal.getitimer(signal.ITIMER_REAL) == (0.0, 0.0)
+
+
+# timeouts that go off at every point around the end of short jobs
+@needs_timer
+def test_timeouts_near_completion(worker):
+    stdout = sys.stdout
+    program = "func main() { var i; for (i = 0; i < 200; i = i + 1) { i = i; } }"
+    for i in range(200):
+        result = run_job(Job(program, version=2, timeout=0.0002 + i * 0.00002))
+        assert result["exception"] is None or result["timed_out"]
+        assert sys.stdout is stdout
+        assert signal.getitimer(signal.ITIMER_REAL) == (0.0, 0.0)
@@ -0,0 +1,181 @@
+# checks that every mode of every interpreter with a Governor stops a program that goes
+# past one of its limits with a LIMIT_ERROR, and says which limit it was, while a
+# program within them runs as it would without a governor (and has its peak memory
+# measured)
+#
+# usage: python3 -m pytest test_governor.py
+
+import itertools
+
+import pytest
+
+import interpreterv2
+import interpreterv3
+import interpreterv4
+from governor import DEADLINE, DEPTH, MEMORY, STEPS, Governor
+from intbase import ErrorType, InterpreterBase
+
+MODES = {
+    interpreterv2: [InterpreterBase.TREE_MODE, InterpreterBase.COMPILED_MODE],
+    interpreterv3: [
+        InterpreterBase.TREE_MODE,
+        InterpreterBase.COMPILED_MODE,
+        InterpreterBase.VM_MODE,
+    ],
+    interpreterv4: [InterpreterBase.TREE_MODE, InterpreterBase.COMPILED_MODE],
+}
+RUNS = [(module, mode) for module in MODES for mode in MODES[module]]
+
+LOOP = {
+    interpreterv2: "func main() { var i; for (i = 0; true; i = i + 0) { i = i; } }",
+    interpreterv3: (
+        "func main(): void { var i: int; for (i = 0; true; i = i + 0) { i = i; } }"
+    ),
+    interpreterv4: "func main() { var i; for (i = 0; true; i = i + 0) { i = i; } }",
+}
+
+RECURSION = {
+    interpreterv2: "func main() { f(0); }\nfunc f(n) { return 1 + f(n + 1); }",
+    interpreterv3: (
+        "func main(): void { f(0); }\nfunc f(n: int): int { return 1 + f(n + 1); }"
+    ),
+    interpreterv4: "func main() { print(f(0)); }\nfunc f(n) { return 1 + f(n + 1); }",
+}
+
+# doubles a string until it's 2^41 characters long
+STRINGS = {
+    interpreterv2: """
+func main() {
+  var s;
+  var i;
+  s = "ab";
+  for (i = 0; i < 40; i = i + 1) { s = s + s; }
+  print(s);
+}
+""",
+    interpreterv3: """
+func main(): void {
+  var s: string;
+  var i: int;
+  s = "ab";
+  for (i = 0; i < 40; i = i + 1) { s = s + s; }
+  print(s);
+}
+""",
+}
+STRINGS[interpreterv4] = STRINGS[interpreterv2]
+
+# what else can keep growing: a linked list of structs in v3, and a chain of LazyValues
+# in v4 (each one holding the previous one)
+GROWING = {
+    interpreterv3: """
+struct node { next: node; }
+func main(): void {
+  var head: node;
+  var i: int;
+  for (i = 0; i < 10000000; i = i + 1) {
+    var n: node;
+    n = new node;
+    n.next = head;
+    head = n;
+  }
+}
+""",
+    interpreterv4: """
+func id(a) { return a; }
+func main() {
+  var x;
+  var i;
+  x = 0;
+  for (i = 0; i < 10000000; i = i + 1) { x = x + id(i); }
+}
+""",
+}
+
+MEMORY_QUOTA = 1 << 20
+
+# sums 0 to 99 in a loop and with a recursion 20 calls deep
+WITHIN = {
+    interpreterv2: """
+func sum(n) { if (n == 0) { return 0; } return n + sum(n - 1); }
+func main() {
+  var i;
+  var total;
+  total = 0;
+  for (i = 0; i < 100; i = i + 1) { total = total + i; }
+  print(total, " ", sum(20));
+}
+""",
+    interpreterv3: """
+func sum(n: int): int { if (n == 0) { return 0; } return n + sum(n - 1); }
+func main(): void {
+  var i: int;
+  var total: int;
+  for (i = 0; i < 100; i = i + 1) { total = total + i; }
+  print(total, " ", sum(20));
+}
+""",
+}
+WITHIN[interpreterv4] = WITHIN[interpreterv2]
+
+
+# returns the governor and the exception the program stopped with (None if it didn't)
+def run(module, mode, program, governor):
+    interpreter = module.Interpreter(console_output=False, mode=mode, governor=governor)
+    try:
+        interpreter.run(program)
+    except Exception as e:
+        assert interpreter.get_error_type_and_line()[0] == ErrorType.LIMIT_ERROR
+        return interpreter, e
+    return interpreter, None
+
+
+@pytest.mark.parametrize("module, mode", RUNS)
+def test_steps(module, mode):
+    governor = Governor(max_steps=10000)
+    _, exception = run(module, mode, LOOP[module], governor)
+    assert "Step budget of 10000 exceeded" in str(exception)
+    assert governor.exceeded == STEPS
+    assert governor.steps > 10000
+
+
+@pytest.mark.parametrize("module, mode", RUNS)
+def test_deadline(module, mode):
+    # a clock that goes forward a second every time it's read
+    governor = Governor(deadline=5, clock=itertools.count().__next__)
+    _, exception = run(module, mode, LOOP[module], governor)
+    assert "Deadline of 5s exceeded" in str(exception)
+    assert governor.exceeded == DEADLINE
+
+
+@pytest.mark.parametrize("module, mode", RUNS)
+def test_depth(module, mode):
+    governor = Governor(max_depth=50)
+    _, exception = run(module, mode, RECURSION[module], governor)
+    assert "Call depth of 50 exceeded" in str(exception)
+    assert governor.exceeded == DEPTH
+
+
+@pytest.mark.parametrize(
+    "module, mode, program",
+    [(module, mode, STRINGS[module]) for module, mode in RUNS]
+    + [(module, mode, GROWING[module]) for module, mode in RUNS if module in GROWING],
+)
+def test_memory(module, mode, program):
+    governor = Governor(max_memory=MEMORY_QUOTA)
+    _, exception = run(module, mode, program, governor)
+    assert f"Memory quota of {MEMORY_QUOTA} bytes exceeded" in str(exception)
+    assert governor.exceeded == MEMORY
+    assert governor.peak_memory > MEMORY_QUOTA
+
+
+@pytest.mark.parametrize("module, mode", RUNS)
+def test_within(module, mode):
+    governor = Governor(
+        max_steps=100000, deadline=60, max_depth=30, max_memory=MEMORY_QUOTA
+    )
+    interpreter, exception = run(module, mode, WITHIN[module], governor)
+    assert exception is None
+    assert interpreter.get_output() == ["4950 210"]
+    assert governor.exceeded is None
+    assert governor.peak_memory < MEMORY_QUOTA
@@ -0,0 +1,118 @@
+# checks that v4 forces long chains of LazyValues without running out of Python stack,
+# in every execution mode, and that forcing them does things in the same order as
+# forcing them one at a time would. each chain is built by running one assignment
+# CHAIN_LENGTH times in a loop, so forcing the last value forces every one before it
+#
+# usage: python3 test_lazy.py, or through pytest
+
+import sys
+
+import interpreterv4
+from intbase import InterpreterBase
+
+MODES = [InterpreterBase.TREE_MODE, InterpreterBase.COMPILED_MODE]
+
+CHAIN_LENGTH = 5000
+
+FUNCTIONS = """
+func one() { return 1; }
+func id(a) { return a; }
+func add(a, b) { return a + b; }
+"""
+
+# assignment : what printing x prints once it has run CHAIN_LENGTH times
+CHAINS = {
+    # the operand forced first is a variable
+    "x = x + 1;": str(CHAIN_LENGTH),
+    "x = -x;": "0",
+    # a call is evaluated before the variable is forced
+    "x = one() + x;": str(CHAIN_LENGTH),
+    # the variable is forced through what a function returns
+    "x = id(x) + 1;": str(CHAIN_LENGTH),
+    "x = add(x, 1);": str(CHAIN_LENGTH),
+    "x = id(id(x));": "0",
+}
+
+# prints from the functions a chain calls come out in the same order as they would if
+# each LazyValue were forced on its own
+ORDER = """
+func one(i) { print("one ", i); return 1; }
+func id(a) { print("id"); return a; }
+func main() {
+  var x;
+  var i;
+  x = 0;
+  for (i = 0; i < 3; i = i + 1) { x = one(i) + x; x = id(x) + one(i); }
+  print(x);
+}
+"""
+ORDER_OUTPUT = [
+    "id", "one 2", "id", "one 1", "id", "one 0", "one 0", "one 1", "one 2", "6"
+]
+
+# an exception raised partway down a chain is raised where the chain is forced
+RAISE = """
+func f(i) { if (i == 2) { raise "two"; } return i; }
+func main() {
+  var x;
+  var i;
+  x = 0;
+  for (i = 0; i < 4; i = i + 1) { x = f(i) + x; }
+  try { print(x); } catch "two" { print("caught"); }
+  x = 5;
+  print(x + 1);
+}
+"""
+RAISE_OUTPUT = ["caught", "6"]
+
+
+def run(program, mode):
+    interpreter = interpreterv4.Interpreter(console_output=False, mode=mode)
+    interpreter.run(program)
+    return interpreter.get_output()
+
+
+def chain_program(assignment):
+    return FUNCTIONS + (
+        "func main() { var x; var i; x = 0; "
+        f"for (i = 0; i < {CHAIN_LENGTH}; i = i + 1) {{ {assignment} }} print(x); }}"
+    )
+
+
+# returns a description of every chain and mode that doesn't print what it should
+def find_failures():
+    failures = []
+    for assignment, expected in CHAINS.items():
+        for mode in MODES:
+            try:
+                output = run(chain_program(assignment), mode)
+            except RecursionError:
+                failures.append(f"{assignment} {mode}: ran out of Python stack")
+                continue
+            if output[-1] != expected:
+                failures.append(
+                    f"{assignment} {mode}: {output[-1]}, expected {expected}"
+                )
+
+    for name, program, expected in [
+        ("order", ORDER, ORDER_OUTPUT),
+        ("raise", RAISE, RAISE_OUTPUT),
+    ]:
+        for mode in MODES:
+            output = run(program, mode)
+            if output != expected:
+                failures.append(f"{name} {mode}: {output}, expected {expected}")
+    return failures
+
+
+def test_chains():
+    failures = find_failures()
+    assert not failures, "\n".join(failures)
+
+
+if __name__ == "__main__":
+    failures = find_failures()
+    for failure in failures:
+        print(failure)
+    print(f"{len(failures)} failures")
+    sys.exit(1 if failures else 0)
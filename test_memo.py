@@ -0,0 +1,143 @@
+# checks memoizing pure functions: find_pure_functions only picks functions whose
+# results can't depend on (or change) anything but their args, every mode hits and
+# misses the memo on the same calls, and impure functions are never memoized, so they
+# still print, read input and create structs every time they're called
+#
+# usage: python3 -m pytest test_memo.py
+
+import pytest
+
+import interpreterv2
+import interpreterv3
+from brewparse import parse_program
+from intbase import InterpreterBase
+from memo import MemoTable, find_pure_functions
+
+MODES = {
+    interpreterv2: [InterpreterBase.TREE_MODE, InterpreterBase.COMPILED_MODE],
+    interpreterv3: [
+        InterpreterBase.TREE_MODE,
+        InterpreterBase.COMPILED_MODE,
+        InterpreterBase.VM_MODE,
+    ],
+}
+
+FIB = {
+    interpreterv2: """
+func fib(n) {
+  if (n < 2) { return n; }
+  return fib(n - 1) + fib(n - 2);
+}
+func main() { print(fib(20)); print(fib(20)); }
+""",
+    interpreterv3: """
+func fib(n: int): int {
+  if (n < 2) { return n; }
+  return fib(n - 1) + fib(n - 2);
+}
+func main(): void { print(fib(20)); print(fib(20)); }
+""",
+}
+
+# every function but main is called twice with the same args, and none of them can be
+# memoized (in v3, fresh creates a new struct every time, so changing the one it
+# returned first doesn't change the second)
+IMPURE = {
+    interpreterv2: """
+func shout(n) { print("shout ", n); return n; }
+func read(n) { return inputi() + n; }
+func calls_shout(n) { return shout(n); }
+func main() {
+  print(shout(1), shout(1));
+  print(read(1), read(1));
+  print(calls_shout(2), calls_shout(2));
+}
+""",
+    interpreterv3: """
+struct box { n: int; }
+func shout(n: int): int { print("shout ", n); return n; }
+func read(n: int): int { return inputi() + n; }
+func calls_shout(n: int): int { return shout(n); }
+func fresh(n: int): box { var b: box; b = new box; b.n = n; return b; }
+func main(): void {
+  print(shout(1), shout(1));
+  print(read(1), read(1));
+  print(calls_shout(2), calls_shout(2));
+  var a: box;
+  a = fresh(1);
+  a.n = 5;
+  a = fresh(1);
+  print(a.n);
+}
+""",
+}
+
+IMPURE_V2 = ["shout 1", "shout 1", "11", "1121", "shout 2", "shout 2", "22"]
+IMPURE_OUTPUT = {
+    interpreterv2: IMPURE_V2,
+    interpreterv3: IMPURE_V2 + ["1"],
+}
+
+
+def run(module, mode, program, memo_size=64, inp=None):
+    interpreter = module.Interpreter(
+        console_output=False, inp=inp, mode=mode, memo_size=memo_size
+    )
+    interpreter.run(program)
+    return interpreter.get_output(), interpreter.memo.stats()
+
+
+def test_pure_functions():
+    functions = {
+        (func_node.name, len(func_node.args)): func_node
+        for func_node in parse_program(IMPURE[interpreterv2] + FIB[interpreterv2])
+        .get("functions")
+    }
+    pure = {func_node.name for func_node in find_pure_functions(functions)}
+    assert pure == {"fib"}
+
+
+@pytest.mark.parametrize(
+    "module, mode", [(module, mode) for module in MODES for mode in MODES[module]]
+)
+def test_hits(module, mode):
+    output, stats = run(module, mode, FIB[module])
+    assert output == ["6765", "6765"]
+    # fib(0) to fib(20) are each worked out once. fib(3) to fib(20) then find the
+    # result of fib(n - 2) already there, and so does the second fib(20) in main
+    assert stats["misses"] == 21
+    assert stats["hits"] == 18 + 1
+    assert stats["size"] == 21
+
+    # only the 4 most recent results are kept
+    output, stats = run(module, mode, FIB[module], memo_size=4)
+    assert output == ["6765", "6765"]
+    assert stats["size"] == 4
+    assert stats["evictions"] == stats["misses"] - 4
+
+
+@pytest.mark.parametrize(
+    "module, mode", [(module, mode) for module in MODES for mode in MODES[module]]
+)
+def test_impure(module, mode):
+    output, stats = run(module, mode, IMPURE[module], inp=["10", "20"])
+    assert output == IMPURE_OUTPUT[module]
+    assert stats["hits"] == stats["misses"] == 0
+
+
+def test_table():
+    table = MemoTable(max_size=2)
+    table.put("a", 1)
+    table.put("b", 2)
+    assert table.get("a") == 1  # a is now the most recently used
+    table.put("c", 3)
+    assert table.get("b") is None
+    assert table.get("c") == 3
+    assert table.stats() == {
+        "hits": 2,
+        "misses": 1,
+        "evictions": 1,
+        "hit_rate": 2 / 3,
+        "size": 2,
+        "max_size": 2,
+    }
@@ -0,0 +1,135 @@
+# runs every program in corpus/ through each execution mode of its interpreter (tree
+# and compiled for every version, and the bytecode VM for v3) and checks that they all
+# print the same output and stop with the same error as the tree walker, with and
+# without memoizing pure functions (when memoizing, every mode must also hit and miss
+# the memo on the same calls). a program is corpus/v<version>/<name>.br, with the input
+# it reads, one item per line or space, in <name>.in next to it.
+# a mode that runs out of Python stack (like the tree walker on a deep recursion) has no
+# result to compare, so only the modes that finish are checked against each other. the
+# programs in TAIL_CALLS only recurse through tail calls, so every mode has to finish
+# them, and has to do it within a call depth of TAIL_CALL_DEPTH
+#
+# usage: python3 test_modes.py, or through pytest
+
+import contextlib
+import glob
+import importlib
+import io
+import os
+import sys
+
+from governor import Governor
+from intbase import InterpreterBase
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+MODES = {
+    2: [InterpreterBase.TREE_MODE, InterpreterBase.COMPILED_MODE],
+    3: [
+        InterpreterBase.TREE_MODE,
+        InterpreterBase.COMPILED_MODE,
+        InterpreterBase.VM_MODE,
+    ],
+    4: [InterpreterBase.TREE_MODE, InterpreterBase.COMPILED_MODE],
+}
+
+
+# programs that every mode must run without running out of Python stack, or going
+# deeper than TAIL_CALL_DEPTH calls
+TAIL_CALLS = {"v2/mutual.br", "v3/mutual.br"}
+TAIL_CALL_DEPTH = 10
+
+# every memo_size each mode runs with (v4 doesn't memoize)
+MEMO_SIZES = {2: [None, 64], 3: [None, 64], 4: [None]}
+
+
+# returns (output, error type, exception) for a run of program in mode and the stats of
+# its memo (None if it has none), or None if it ran out of Python stack
+def run(version, mode, program, inp, memo_size=None, governor=None):
+    module = importlib.import_module(f"interpreterv{version}")
+    kwargs = {"memo_size": memo_size} if memo_size else {}
+    interpreter = module.Interpreter(
+        console_output=False, inp=inp, mode=mode, governor=governor, **kwargs
+    )
+    exception = None
+    # syntax errors are printed by the parser
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            interpreter.run(program)
+        except RecursionError:
+            return None
+        except Exception as e:
+            exception = f"{type(e).__name__}: {e}"
+    error_type, _ = interpreter.get_error_type_and_line()
+    stats = interpreter.memo.stats() if memo_size else None
+    return (interpreter.get_output(), error_type, exception), stats
+
+
+# adds a description of every result in results (run name : result) that isn't the
+# same as the first one to mismatches
+def compare(mismatches, path, results):
+    expected = next(iter(results.values()), None)
+    for name, result in results.items():
+        if result != expected:
+            mismatches.append(
+                f"{os.path.relpath(path, CORPUS)} {name}: {result}, "
+                f"expected {expected}"
+            )
+
+
+# returns a description of every program whose modes disagree
+def find_mismatches():
+    mismatches = []
+    for version, modes in MODES.items():
+        for path in sorted(glob.glob(os.path.join(CORPUS, f"v{version}", "*.br"))):
+            with open(path) as file:
+                program = file.read()
+            inp = None
+            if os.path.exists(path[:-3] + ".in"):
+                with open(path[:-3] + ".in") as file:
+                    inp = file.read().split()
+
+            tail_calls = os.path.relpath(path, CORPUS) in TAIL_CALLS
+            results = {}
+            memo_stats = {}
+            for mode in modes:
+                runs = [(memo_size, None) for memo_size in MEMO_SIZES[version]]
+                if tail_calls:
+                    runs.append((None, Governor(max_depth=TAIL_CALL_DEPTH)))
+                for memo_size, governor in runs:
+                    result = run(
+                        version,
+                        mode,
+                        program,
+                        None if inp is None else inp[:],
+                        memo_size,
+                        governor,
+                    )
+                    name = f"{mode}, memo_size={memo_size}"
+                    if governor:
+                        name = f"{mode}, max_depth={TAIL_CALL_DEPTH}"
+                    if result is not None:
+                        results[name], stats = result
+                        if stats is not None:
+                            memo_stats[name] = stats
+                    elif tail_calls:
+                        mismatches.append(
+                            f"{os.path.relpath(path, CORPUS)} {name}: ran out of "
+                            "Python stack on tail calls"
+                        )
+            compare(mismatches, path, results)
+            compare(mismatches, path, memo_stats)
+    return mismatches
+
+
+def test_modes():
+    mismatches = find_mismatches()
+    assert not mismatches, "\n".join(mismatches)
+
+
+if __name__ == "__main__":
+    mismatches = find_mismatches()
+    for mismatch in mismatches:
+        print(mismatch)
+    print(f"{len(mismatches)} mismatches")
+    sys.exit(1 if mismatches else 0)
@@ -0,0 +1,108 @@
+# checks the output sinks: every sink drops (and counts) the lines past its max_lines
+# or max_bytes, a StreamSink writes its lines in order with whatever else was printed to
+# stdout, and interpreters still expose what they printed as output_log
+#
+# usage: python3 -m pytest test_output_sink.py
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+import interpreterv2
+from output_sink import (
+    FLUSH_LINE,
+    CallbackSink,
+    CaptureSink,
+    DiscardSink,
+    RingSink,
+    StreamSink,
+)
+
+LINES = ["one", "two", "three", "four"]
+
+
+# returns a sink of each kind with the given limits and a function returning the
+# lines it has accepted
+def sinks(directory, **limits):
+    capture = CaptureSink(**limits)
+    yield capture, capture.get_output
+
+    ring = RingSink(size=10, **limits)
+    yield ring, ring.get_output
+
+    received = []
+    yield CallbackSink(received.append, **limits), lambda: received
+
+    path = os.path.join(directory, "stream")
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+    stream = StreamSink(fd=fd, **limits)
+
+    def written():
+        stream.flush()
+        with open(path) as file:
+            return file.read().splitlines()
+
+    yield stream, written
+    os.close(fd)
+
+
+@pytest.mark.parametrize(
+    "limits, accepted",
+    [
+        ({}, LINES),
+        ({"max_lines": 2}, LINES[:2]),
+        # "one\n" and "two\n" are 8 bytes, "three\n" would make 14
+        ({"max_bytes": 10}, LINES[:2]),
+        # "four" still fits after "three" was dropped
+        ({"max_bytes": 13}, ["one", "two", "four"]),
+        ({"max_lines": 1, "max_bytes": 100}, LINES[:1]),
+    ],
+)
+def test_limits(limits, accepted):
+    with tempfile.TemporaryDirectory() as directory:
+        for sink, get_lines in sinks(directory, **limits):
+            for line in LINES:
+                sink.write(line)
+            assert get_lines() == accepted, type(sink).__name__
+            assert sink.lines == len(accepted)
+            assert sink.dropped == len(LINES) - len(accepted)
+            assert sink.truncated() == (len(accepted) < len(LINES))
+
+
+def test_discard():
+    sink = DiscardSink(max_lines=3)
+    for line in LINES:
+        sink.write(line)
+    assert sink.get_output() == []
+    assert (sink.lines, sink.dropped) == (3, 1)
+
+
+@pytest.mark.parametrize("flush_policy", ["buffer", FLUSH_LINE])
+def test_stream_order(monkeypatch, flush_policy):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "stdout")
+        with open(path, "w") as stdout:
+            monkeypatch.setattr(sys, "stdout", stdout)
+            sink = StreamSink(fd=stdout.fileno(), flush_policy=flush_policy)
+            print("before")
+            sink.write("sink")
+            sink.flush()
+            print("after")
+        with open(path) as file:
+            assert file.read() == "before\nsink\nafter\n"
+
+
+def test_output_log():
+    interpreter = interpreterv2.Interpreter(console_output=False)
+    interpreter.run('func main() { print("a"); print(1 + 2); }')
+    assert interpreter.output_log == ["a", "3"]
+    with pytest.raises(AttributeError):
+        interpreter.output_log = []
+
+    interpreter = interpreterv2.Interpreter(
+        console_output=False, output_sink=RingSink(size=1)
+    )
+    interpreter.run('func main() { print("a"); print(1 + 2); }')
+    assert interpreter.output_log == ["3"]
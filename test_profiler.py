@@ -0,0 +1,121 @@
+# checks the profiler: the calls it counts come out the same through pstats and as
+# collapsed stacks in every mode, and the recursion limit it raises while a program runs
+# is set back afterwards, even if the program fails or another profiler is running
+#
+# usage: python3 -m pytest test_profiler.py
+
+import os
+import pstats
+import sys
+import tempfile
+
+import pytest
+
+import interpreterv2
+import interpreterv3
+from intbase import InterpreterBase
+from profiler import Profiler
+
+PROGRAM = """
+func main() {
+  f(2);
+  f(0);
+}
+func f(n) {
+  if (n > 0) { g(); return f(n - 1) + 1; }
+  return 0;
+}
+func g() { print("g"); }
+"""
+
+FAILING = "func main() { f(); }\nfunc f() { print(1 + true); }"
+
+
+def profile(mode, program=PROGRAM):
+    interpreter = interpreterv2.Interpreter(
+        console_output=False, mode=mode, trace_output=True
+    )
+    interpreter.run(program)
+    return interpreter.profiler
+
+
+@pytest.mark.parametrize(
+    "mode", [InterpreterBase.TREE_MODE, InterpreterBase.COMPILED_MODE]
+)
+def test_pstats(mode):
+    profiler = profile(mode)
+    stats = pstats.Stats(profiler).stats
+    # (primitive calls, calls, callers) for every function
+    calls = {
+        name: (cc, nc, sorted(callers))
+        for (_, _, name), (cc, nc, _, _, callers) in stats.items()
+    }
+    main = ("<brewin>", 2, "main")
+    f = ("<brewin>", 6, "f")
+    assert calls == {
+        "main": (1, 1, []),
+        "f": (2, 4, [main, f]),
+        "g": (2, 2, [f]),
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "brewin.prof")
+        profiler.dump_stats(path)
+        assert pstats.Stats(path).stats == stats
+
+
+@pytest.mark.parametrize(
+    "mode", [InterpreterBase.TREE_MODE, InterpreterBase.COMPILED_MODE]
+)
+def test_collapsed(mode):
+    lines = profile(mode).collapsed().splitlines()
+    stacks = [line.rsplit(" ", 1)[0] for line in lines]
+    assert sorted(stacks) == [
+        "main",
+        "main;f",
+        "main;f;f",
+        "main;f;f;f",
+        "main;f;f;g",
+        "main;f;g",
+    ]
+    assert all(int(line.rsplit(" ", 1)[1]) >= 0 for line in lines)
+
+
+def test_vm():
+    interpreter = interpreterv3.Interpreter(
+        console_output=False, mode=InterpreterBase.VM_MODE, trace_output=True
+    )
+    interpreter.run("func main(): void { f(); f(); }\nfunc f(): void { print(1); }")
+    stats = pstats.Stats(interpreter.profiler).stats
+    assert {name: stat[:2] for (_, _, name), stat in stats.items()} == {
+        "main": (1, 1),
+        "f": (2, 2),
+    }
+    stacks = interpreter.profiler.collapsed().splitlines()
+    assert [line.rsplit(" ", 1)[0] for line in stacks] == ["main", "main;f"]
+
+
+@pytest.mark.parametrize(
+    "mode", [InterpreterBase.TREE_MODE, InterpreterBase.COMPILED_MODE]
+)
+def test_recursion_limit(mode):
+    limit = sys.getrecursionlimit()
+    profile(mode)
+    assert sys.getrecursionlimit() == limit
+    with pytest.raises(Exception):
+        profile(mode, FAILING)
+    assert sys.getrecursionlimit() == limit
+
+
+# two profilers running at the same time (like two interpreters in different threads)
+# that don't finish in the order they started
+def test_recursion_limit_overlapping():
+    limit = sys.getrecursionlimit()
+    first, second = Profiler(), Profiler()
+    first.start()
+    second.start()
+    assert sys.getrecursionlimit() == 2 * limit
+    first.finish()
+    assert sys.getrecursionlimit() == 2 * limit
+    second.finish()
+    assert sys.getrecursionlimit() == limit
@@ -0,0 +1,101 @@
+# checks the ProgramCache: programs are parsed once and then found in memory or on disk,
+# files written under another CACHE_FORMAT are ignored, programs the parser only
+# recovered from print their syntax errors on every load, and separate Parser objects
+# can parse at the same time from different threads
+#
+# usage: python3 -m pytest test_program_cache.py
+
+import contextlib
+import io
+import tempfile
+import threading
+
+import program_cache
+from brewparse import Parser
+from program_cache import ProgramCache
+
+PROGRAM = "func main() { var x; x = 1 + 2; print(x); }"
+
+# the parser reports the empty body of f, then recovers and returns an AST
+RECOVERED = "func f() { } func main() { print(1); }"
+
+
+# returns what loading program from cache prints
+def load_output(cache, program):
+    with contextlib.redirect_stdout(io.StringIO()) as stdout:
+        cache.load(program)
+    return stdout.getvalue()
+
+
+def test_memory():
+    cache = ProgramCache(max_size=1)
+    ast = cache.load(PROGRAM)
+    assert cache.load(PROGRAM) is ast
+    cache.load("func main() { print(1); }")
+    assert cache.stats() == {
+        "hits": 1,
+        "disk_hits": 0,
+        "misses": 2,
+        "evictions": 1,
+        "size": 1,
+        "max_size": 1,
+    }
+
+
+def test_disk():
+    with tempfile.TemporaryDirectory() as directory:
+        ast = ProgramCache(directory=directory).load(PROGRAM)
+
+        # a new cache (like one in another process) reads the AST back from disk
+        cache = ProgramCache(directory=directory)
+        loaded = cache.load(PROGRAM)
+        assert loaded is not ast
+        assert str(loaded) == str(ast)
+        assert cache.stats()["disk_hits"] == 1
+        assert cache.stats()["misses"] == 0
+
+
+def test_cache_format(monkeypatch):
+    with tempfile.TemporaryDirectory() as directory:
+        ProgramCache(directory=directory).load(PROGRAM)
+
+        format = program_cache.CACHE_FORMAT + 1
+        monkeypatch.setattr(program_cache, "CACHE_FORMAT", format)
+        cache = ProgramCache(directory=directory)
+        cache.load(PROGRAM)
+        assert cache.stats()["disk_hits"] == 0
+        assert cache.stats()["misses"] == 1
+
+
+def test_recovered_syntax_errors():
+    expected = "Syntax error at '}' on line 1\n"
+    with tempfile.TemporaryDirectory() as directory:
+        cache = ProgramCache(directory=directory)
+        for _ in range(3):
+            assert load_output(cache, RECOVERED) == expected
+        assert cache.stats()["misses"] == 3
+        assert cache.stats()["size"] == 0
+
+
+def test_threads():
+    programs = [
+        f"func main() {{ var x; x = {i}; if (x > 0) {{ print(x * {i}); }} }}"
+        for i in range(8)
+    ]
+    expected = [str(Parser().parse(program)) for program in programs]
+    results = [[] for _ in programs]
+    barrier = threading.Barrier(len(programs))
+
+    def parse(i):
+        parser = Parser()
+        barrier.wait()
+        for _ in range(50):
+            results[i].append(str(parser.parse(programs[i])))
+
+    threads = [threading.Thread(target=parse, args=(i,)) for i in range(len(programs))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for i, program_results in enumerate(results):
+        assert program_results == [expected[i]] * 50
@@ -0,0 +1,78 @@
+# checks v3 struct layouts: every struct type is laid out once when the program is
+# loaded, each new instance gets its own copy of the defaults, and fields reached
+# through a dotted path are read and written at their offsets in every mode
+#
+# usage: python3 -m pytest test_structs.py
+
+import pytest
+
+import interpreterv3
+from intbase import ErrorType, InterpreterBase
+from type_valuev3 import Type
+
+MODES = [
+    InterpreterBase.TREE_MODE,
+    InterpreterBase.COMPILED_MODE,
+    InterpreterBase.VM_MODE,
+]
+
+PROGRAM = """
+struct point { x: int; y: int; }
+struct line { from: point; to: point; label: string; closed: bool; }
+func main(): void {
+  var a: line;
+  var b: line;
+  a = new line;
+  b = new line;
+  a.from = new point;
+  a.to = new point;
+  a.from.x = 1;
+  a.to.y = 2;
+  a.label = "a";
+  b.from = a.to;
+  b.from.x = 3;
+  print(a.from.x, " ", a.to.x, " ", a.to.y, " ", a.label, " ", a.closed);
+  print(b.to == nil, " ", b.label, " ", b.from == a.to);
+}
+"""
+
+
+def run(mode, program):
+    interpreter = interpreterv3.Interpreter(console_output=False, mode=mode)
+    interpreter.run(program)
+    return interpreter
+
+
+def test_layouts():
+    layouts = run(InterpreterBase.TREE_MODE, PROGRAM).struct_layouts
+    assert layouts["point"].offsets == {"x": 0, "y": 1}
+    assert layouts["line"].offsets == {"from": 0, "to": 1, "label": 2, "closed": 3}
+    defaults = layouts["line"].defaults
+    assert [value.type() for value in defaults] == [
+        "point",
+        "point",
+        Type.STRING,
+        Type.BOOL,
+    ]
+    assert [value.value() for value in defaults[2:]] == ["", False]
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_fields(mode):
+    interpreter = run(mode, PROGRAM)
+    assert interpreter.get_output() == ["1 3 2 a false", "true  true"]
+    # setting fields on instances never changes the defaults the next one starts from
+    defaults = interpreter.struct_layouts["line"].defaults
+    assert [value.value() for value in defaults[2:]] == ["", False]
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_missing_field(mode):
+    program = """
+struct point { x: int; }
+func main(): void { var p: point; p = new point; p.z = 1; }
+"""
+    interpreter = interpreterv3.Interpreter(console_output=False, mode=mode)
+    with pytest.raises(Exception):
+        interpreter.run(program)
+    assert interpreter.get_error_type_and_line()[0] == ErrorType.NAME_ERROR
@@ -0,0 +1,41 @@
+# checks that the v3 bytecode VM runs Brewin calls on its own frame stack: a recursion
+# much deeper than Python's recursion limit finishes in the VM, while the tree walker and
+# compiled mode, which make a Python call for every Brewin call, run out of stack
+#
+# usage: python3 -m pytest test_vm.py
+
+import sys
+
+import pytest
+
+import interpreterv3
+from intbase import InterpreterBase
+
+PROGRAM = """
+func main(): void { print(depth(inputi())); }
+func depth(n: int): int {
+  if (n == 0) { return 0; }
+  return 1 + depth(n - 1);
+}
+"""
+
+
+def run(mode, depth):
+    interpreter = interpreterv3.Interpreter(
+        console_output=False, inp=[str(depth)], mode=mode
+    )
+    interpreter.run(PROGRAM)
+    return interpreter.get_output()
+
+
+def test_vm_depth():
+    depth = 3 * sys.getrecursionlimit()
+    assert run(InterpreterBase.VM_MODE, depth) == [str(depth)]
+
+
+@pytest.mark.parametrize(
+    "mode", [InterpreterBase.TREE_MODE, InterpreterBase.COMPILED_MODE]
+)
+def test_python_depth(mode):
+    with pytest.raises(RecursionError):
+        run(mode, 3 * sys.getrecursionlimit())
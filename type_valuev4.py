@@ -6,8 +6,21 @@ class Type:
     NIL = "nil"
 
 
-# represents a value, which has a type and its value
+# a Brewin raise, carrying the (string) Value that was raised. it's a Python exception
+# so it unwinds straight to the try that catches it (or to run()), and code that isn't
+# a try never has to check for it
+class BrewinException(Exception):
+    def __init__(self, value):
+        super().__init__(value.value())
+        self.value = value
+
+
+# represents a value, which has a type and its value.
+# values are never changed once they're made, so the common ones are shared instead of
+# built over and over: use TRUE, FALSE, NIL, bool_value and int_value
 class Value:
+    __slots__ = ("t", "v")
+
     def __init__(self, type, value=None):
         self.t = type
         self.v = value
@@ -19,7 +32,73 @@ class Value:
         return self.t
 
     def print(self):
-        return f"{self.v}"
+        return f"{self.value()}"
+
+
+# shared values
+TRUE = Value(Type.BOOL, True)
+FALSE = Value(Type.BOOL, False)
+NIL = Value(Type.NIL)
+
+# ints in this range are shared too
+SMALL_INT_MIN = -128
+SMALL_INT_MAX = 1024
+SMALL_INTS = [Value(Type.INT, i) for i in range(SMALL_INT_MIN, SMALL_INT_MAX + 1)]
+
+
+def bool_value(val):
+    return TRUE if val else FALSE
+
+
+def int_value(val):
+    if SMALL_INT_MIN <= val <= SMALL_INT_MAX:
+        return SMALL_INTS[val - SMALL_INT_MIN]
+    return Value(Type.INT, val)
+
+
+# strings at least this long are built as Ropes when they're concatenated; copying a
+# shorter one costs less than keeping track of its pieces
+ROPE_MIN_LENGTH = 256
+
+
+# a string Value made by concatenation, kept as the strings it's made of, so building a
+# string piece by piece (s = s + "x" in a loop) doesn't copy everything built so far
+# every time. the pieces are only joined once something needs the string itself (to
+# print it, compare it or hand it back to Python), and the joined string is kept.
+# a Rope's string is the first count strings of pieces, and Ropes can share a list:
+# concatenating onto the last Rope made from a list adds to the same list, so
+# s = s + "x" takes O(1) no matter how long s is
+class Rope(Value):
+    __slots__ = ("pieces", "count", "length")
+
+    def __init__(self, pieces, length):
+        super().__init__(Type.STRING)
+        self.pieces = pieces  # None once they've been joined
+        self.count = len(pieces)
+        self.length = length
+
+    def value(self):
+        if self.v is None:
+            self.v = "".join(self.pieces[: self.count])
+            self.pieces = None
+        return self.v
+
+
+# returns the string Value op1 + op2
+def concat(op1, op2):
+    right = op2.value()
+    if isinstance(op1, Rope) and op1.pieces is not None:
+        pieces = op1.pieces
+        # nothing has been added after op1's pieces yet
+        if len(pieces) == op1.count:
+            pieces.append(right)
+            return Rope(pieces, op1.length + len(right))
+
+    left = op1.value()
+    length = len(left) + len(right)
+    if length < ROPE_MIN_LENGTH:
+        return Value(Type.STRING, left + right)
+    return Rope([left, right], length)
 
 
 class LazyValue:
@@ -32,8 +111,12 @@ class LazyValue:
     def evaluated(self):
         return self.eval
 
+    # once it has its value, a LazyValue no longer needs its expression or the
+    # environment it captured, so they're dropped and can be freed
     def set_eval(self):
         self.eval = True
+        self.a = None
+        self.e = None
 
     def value(self):
         return self.v
@@ -54,31 +137,50 @@ class LazyValue:
             value = self.v.value()
             type = self.v.type()
 
-        return f"eval: {self.eval} | value: {value} | type: {type} | ast: {self.a} | env: {self.e.print()}"
+        return f"eval: {self.eval} | value: {value} | type: {type} | ast: {self.a} | env: {self.e.print() if self.e else None}"
 
 
 # creates a value based on the given value
 def create_value(val):
     if val is True:
-        return Value(Type.BOOL, True)
+        return TRUE
     if val is False:
-        return Value(Type.BOOL, False)
+        return FALSE
     elif isinstance(val, str):
         return Value(Type.STRING, val)
     elif isinstance(val, int):
-        return Value(Type.INT, val)
+        return int_value(val)
     else:
         raise ValueError("Unknown value type")
 
 
+# how print shows each type of value, given the value itself
+PRINTERS = {
+    Type.INT: str,
+    Type.STRING: str,
+    Type.BOOL: lambda v: "true" if v is True else "false",
+}
+
+
+# what get_printable returns for a value of any other type
+def unprintable(v):
+    return None
+
+
 # outputs the printable version of the value
 def get_printable(val):
-    if val.type() == Type.INT:
-        return str(val.value())
-    if val.type() == Type.STRING:
-        return val.value()
-    if val.type() == Type.BOOL:
-        if val.value() is True:
-            return "true"
-        return "false"
-    return None
+    return PRINTERS.get(val.type(), unprintable)(val.value())
+
+
+# returns the line print outputs for the values of its arguments, joining their
+# printable versions once. a lone argument's printable version is the line itself
+def format_line(values):
+    if len(values) == 1:
+        line = get_printable(values[0])
+        # join fails on a value that can't be printed, like + used to
+        if line is not None:
+            return line
+    printers = PRINTERS
+    return "".join(
+        [printers.get(val.type(), unprintable)(val.value()) for val in values]
+    )
@@ -0,0 +1,549 @@
+# a stack-based bytecode backend for the v3 interpreter
+#
+# the BytecodeCompiler flattens a function's AST into a list of integers, one
+# (opcode, argument) pair per instruction, plus a pool of constants the arguments index
+# into. the VirtualMachine then runs that list with a single dispatch loop over integer
+# opcodes instead of matching elem_type strings on every node.
+# a Brewin call doesn't recurse in Python: CALL saves the caller's frame on a frame stack
+# and starts running the callee in the same loop, and RETURN resumes the caller, so call
+# depth is only limited by memory. only this VM runs calls this way: v4, and the tree
+# walker and compiled mode of v2 and v3, still make a Python call for every Brewin call
+# (other than a tail call in v2 and v3), so deep recursion there runs out of Python
+# stack.
+# every function shares one operand stack; a caller's operands stay below the callee's
+# until it returns. a call whose result is returned straight away is a TAIL_CALL, which
+# runs the callee in place of the caller when the caller's scopes can be dropped, just
+# like a tail call in the tree walker.
+# a plain variable the resolver found an address for is read and written straight from
+# its slot, and args and return values whose type already matches the declared one are
+# passed as they are. everything else (type checks, coercion, default returns, struct
+# fields and names that have to be looked up) is delegated to the same interpreter
+# methods the tree walker uses, so both produce the same output and errors
+
+from intbase import ErrorType
+from env_v3 import Scope
+from memo import memo_key
+from type_valuev3 import Type, Value, NIL, VOID, int_value, create_value, get_printable
+
+# opcodes
+LOAD_CONST = 0  # push the Value constants[arg]
+LOAD_NIL = 1  # push a nil Value
+# variables are described by (name, address, path) tuples, see resolver.py
+LOAD_VAR = 2  # push the variable (possibly a dotted struct field) constants[arg]
+STORE_VAR = 3  # pop a value and assign it to the variable constants[arg]
+STORE_FIELD = 4  # pop a value and assign it to the struct field constants[arg]
+DEFINE_VAR = 5  # define the variable with the (name, type, address) constants[arg]
+BINARY = 6  # pop two operands and apply the operator BINARY_OPERATORS[arg]
+NEGATE = 7  # pop an operand and negate it
+NOT = 8  # pop an operand and logically negate it
+NEW = 9  # push a new instance of the struct named constants[arg]
+PRINTABLE = 10  # replace the top of the stack with its printable string
+PRINT = 11  # pop arg printable strings and output them as one line
+INPUT = 12  # read input for the (name, arg nodes) pair constants[arg]
+FIND_FUNCTION = 13  # push the function for the (name, arg count) pair constants[arg]
+CALL = 14  # pop arg values and a function and start running it
+POP = 15  # discard the top of the stack
+JUMP = 16  # continue at instruction arg
+JUMP_IF_FALSE = 17  # pop a value and continue at instruction arg if it's false
+TEST_CONDITION = 18  # coerce the condition on top of the stack to a bool or fail
+PUSH_SCOPE = 19  # enter a scope with the (type, layout) pair constants[arg]
+POP_SCOPE = 20  # exit the current scope
+# both return instructions push the return value onto the caller's stack, or return it
+# from run_function if the function was the one it started with
+RETURN = 21  # pop arg block scopes and the function scope, then return the top value
+RETURN_DEFAULT = 22  # pop the function scope and return the default return value
+# only emitted when profiling, before every statement
+LINE = 23  # count the statement node constants[arg] with the profiler
+# only emitted with a governor, at the start of every pass through a loop
+CHARGE = 24  # charge the governor for a pass through the for node constants[arg]
+# plain variables with an address are described by (scope index, slot, layout,
+# variable) tuples: the scope is scopes[scope index], and if it doesn't have the layout
+# or the slot is empty, the variable is loaded or stored like LOAD_VAR and STORE_VAR do
+LOAD_LOCAL = 25  # push the variable constants[arg]
+STORE_LOCAL = 26  # pop a value and assign it to the variable constants[arg]
+JUMP_IF_TRUE = 27  # pop a value and continue at instruction arg if it's true
+# pop arg count values and a function and run it in place of the running function,
+# which has block depth block scopes, if those can be dropped; otherwise CALL it. the
+# (arg count, depth) pair is constants[arg], and a RETURN always follows
+TAIL_CALL = 28
+
+BINARY_OPERATORS = ["+", "-", "*", "/", "==", "<", "<=", ">", ">=", "!=", "&&", "||"]
+
+
+# the compiled form of a single function
+class Code:
+    def __init__(self, func_node, instructions, constants):
+        self.func_node = func_node
+        self.return_type = func_node.return_type
+        self.instructions = instructions
+        self.constants = constants
+        # inline caches for FIND_FUNCTION, indexed like constants
+        self.targets = [None] * len(constants)
+        # the (arg node, slot) of every arg, for CALL to put args straight into the
+        # function scope, or None if two args share a name and create_args is needed
+        self.params = [(arg, func_node.layout[arg.name]) for arg in func_node.args]
+        if len({arg.name for arg in func_node.args}) < len(func_node.args):
+            self.params = None
+        # for TAIL_CALL to check whether the caller's scopes can be dropped
+        self.arg_names = [arg.name for arg in func_node.args]
+
+
+class BytecodeCompiler:
+    def __init__(self, profile=False, govern=False):
+        self.profile = profile  # whether to emit LINE instructions
+        self.govern = govern  # whether to emit CHARGE instructions
+        self.instructions = []
+        self.constants = []
+        self.constant_indices = {}
+        self.depth = 0  # number of block scopes entered within the function
+
+    def compile_function(self, func_node):
+        # the function scope itself is pushed by the VM before the code runs
+        self.compile_statements(func_node.statements)
+        self.emit(RETURN_DEFAULT)
+        return Code(func_node, self.instructions, self.constants)
+
+    def emit(self, opcode, arg=0):
+        self.instructions.append(opcode)
+        self.instructions.append(arg)
+        # returns the position of the argument so jumps can be patched later
+        return len(self.instructions) - 1
+
+    # constants with the same key share a slot; the key defaults to the value itself
+    def constant(self, value, key=None):
+        if key is None:
+            key = (type(value), value)
+        if key not in self.constant_indices:
+            self.constant_indices[key] = len(self.constants)
+            self.constants.append(value)
+        return self.constant_indices[key]
+
+    # adds a constant that can't be hashed (it holds nodes or layouts) without sharing
+    def unique_constant(self, value):
+        self.constants.append(value)
+        return len(self.constants) - 1
+
+    # jump targets are the index of the next instruction to be emitted
+    def patch(self, position):
+        self.instructions[position] = len(self.instructions)
+
+    # emits a load or store of the variable an = or var node names: straight from its
+    # slot if it's a plain name with an address, otherwise through the interpreter
+    def emit_variable(self, node, local_opcode, opcode):
+        variable = (node.name, node.address, node.path)
+        if node.address and not node.path:
+            depth, slot, layout = node.address
+            local = (-1 - depth, slot, layout, variable)
+            self.emit(local_opcode, self.unique_constant(local))
+        else:
+            self.emit(opcode, self.unique_constant(variable))
+
+    def compile_statements(self, statement_nodes):
+        for statement_node in statement_nodes:
+            self.compile_statement(statement_node)
+
+    def compile_block(self, scope_type, layout, statement_nodes):
+        self.emit(PUSH_SCOPE, self.unique_constant((scope_type, layout)))
+        self.depth += 1
+        self.compile_statements(statement_nodes)
+        self.depth -= 1
+        self.emit(POP_SCOPE)
+
+    def compile_statement(self, statement_node):
+        if self.profile:
+            self.emit(LINE, self.unique_constant(statement_node))
+        match statement_node.elem_type:
+            # variable definition
+            case "vardef":
+                name = statement_node.name
+                type = statement_node.var_type
+                address = statement_node.address
+                self.emit(DEFINE_VAR, self.unique_constant((name, type, address)))
+            # assignment
+            case "=":
+                self.compile_expression(statement_node.expression)
+                # if struct variable
+                if statement_node.path:
+                    variable = (
+                        statement_node.name,
+                        statement_node.address,
+                        statement_node.path,
+                    )
+                    self.emit(STORE_FIELD, self.unique_constant(variable))
+                else:
+                    self.emit_variable(statement_node, STORE_LOCAL, STORE_VAR)
+            # function call
+            case "fcall":
+                self.compile_function_call(statement_node)
+                self.emit(POP)
+            # if statement
+            case "if":
+                # the if scope also covers the condition
+                layout = statement_node.layout
+                self.emit(PUSH_SCOPE, self.unique_constant(("if", layout)))
+                self.depth += 1
+                self.compile_expression(statement_node.condition)
+                self.emit(TEST_CONDITION, self.constant("Invalid if condition"))
+                to_else = self.emit(JUMP_IF_FALSE)
+                self.compile_statements(statement_node.statements)
+                to_end = self.emit(JUMP)
+                self.patch(to_else)
+                if statement_node.else_statements:
+                    self.compile_statements(statement_node.else_statements)
+                self.patch(to_end)
+                self.depth -= 1
+                self.emit(POP_SCOPE)
+            # for loop
+            case "for":
+                self.compile_statement(statement_node.init)
+                # only the first test of the condition coerces and checks it; the
+                # others are at the bottom of the loop, so a pass takes one jump
+                self.compile_expression(statement_node.condition)
+                self.emit(TEST_CONDITION, self.constant("Invalid for condition"))
+                to_end = self.emit(JUMP_IF_FALSE)
+                loop = len(self.instructions)
+                if self.govern:
+                    self.emit(CHARGE, self.unique_constant(statement_node))
+                self.compile_block(
+                    "for",
+                    statement_node.layout,
+                    statement_node.statements,
+                )
+                self.compile_statement(statement_node.update)
+                self.compile_expression(statement_node.condition)
+                self.emit(JUMP_IF_TRUE, loop)
+                self.patch(to_end)
+            # return
+            case "return":
+                expression = statement_node.expression
+                if expression and expression.elem_type == "fcall":
+                    self.compile_function_call(expression, tail=True)
+                elif expression:
+                    self.compile_expression(expression)
+                else:
+                    self.emit(LOAD_CONST, self.constant(VOID))
+                self.emit(RETURN, self.depth)
+        # any other statement is a no-op, just like in the tree walker
+
+    def compile_expression(self, expression_node):
+        elem_type = expression_node.elem_type
+
+        # binary operations
+        if elem_type in BINARY_OPERATORS:
+            self.compile_expression(expression_node.op1)
+            self.compile_expression(expression_node.op2)
+            self.emit(BINARY, BINARY_OPERATORS.index(elem_type))
+            return
+
+        match elem_type:
+            # value node
+            case "int" | "string" | "bool":
+                value = create_value(expression_node.val)
+                key = (value.type(), value.value())
+                self.emit(LOAD_CONST, self.constant(value, key))
+            case "nil":
+                self.emit(LOAD_NIL)
+            # variable node
+            case "var":
+                self.emit_variable(expression_node, LOAD_LOCAL, LOAD_VAR)
+            # unary operations
+            case "neg":
+                self.compile_expression(expression_node.op1)
+                self.emit(NEGATE)
+            case "!":
+                self.compile_expression(expression_node.op1)
+                self.emit(NOT)
+            # new instance
+            case "new":
+                self.emit(NEW, self.constant(expression_node.var_type))
+            # function call
+            case "fcall":
+                self.compile_function_call(expression_node)
+
+    # a tail call is a call whose result is returned straight away
+    def compile_function_call(self, function_call, tail=False):
+        name = function_call.name
+        arg_nodes = function_call.args
+
+        match name:
+            case "print":
+                # each arg is checked before the next one is evaluated
+                for arg in arg_nodes:
+                    self.compile_expression(arg)
+                    self.emit(PRINTABLE)
+                self.emit(PRINT, len(arg_nodes))
+            case "inputi" | "inputs":
+                # the prompt is printed straight from its node, it's never evaluated
+                self.emit(INPUT, self.unique_constant((name, arg_nodes)))
+            case _:
+                # the function is looked up before any of its args are evaluated
+                self.emit(FIND_FUNCTION, self.constant((name, len(arg_nodes))))
+                for arg in arg_nodes:
+                    self.compile_expression(arg)
+                if tail:
+                    call = self.constant((len(arg_nodes), self.depth))
+                    self.emit(TAIL_CALL, call)
+                else:
+                    self.emit(CALL, len(arg_nodes))
+
+
+class VirtualMachine:
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.variables = interpreter.variables
+        self.codes = {}  # function node : compiled code
+        self.binary_operations = [
+            interpreter.operations[operator] for operator in BINARY_OPERATORS
+        ]
+
+    # returns the compiled code of a function node, compiling it on first use
+    def code(self, func_node):
+        code = self.codes.get(func_node)
+        if code is None:
+            profile = self.interpreter.profiler is not None
+            govern = self.interpreter.governor is not None
+            code = BytecodeCompiler(profile, govern).compile_function(func_node)
+            self.codes[func_node] = code
+        return code
+
+    def run_input(self, name, arg_nodes):
+        interpreter = self.interpreter
+        if len(arg_nodes) > 1:
+            interpreter.error(
+                ErrorType.NAME_ERROR,
+                f"No {name}() function found that takes > 1 parameter",
+            )
+        elif len(arg_nodes) == 1:
+            interpreter.output(arg_nodes[0].val)
+
+        if name == "inputi":
+            return int_value(int(interpreter.get_input()))
+        return Value(Type.STRING, interpreter.get_input())
+
+    def run_function(self, func_node, args=None):
+        interpreter = self.interpreter
+        variables = self.variables
+        scopes = variables.scopes
+        binary_operations = self.binary_operations
+        profiler = interpreter.profiler
+        governor = interpreter.governor
+        memo = interpreter.memo
+        pure_functions = interpreter.pure_functions
+
+        code = self.code(func_node)
+        instructions = code.instructions
+        constants = code.constants
+        targets = code.targets
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        pc = 0
+        # return types of the functions the running one took the place of with tail
+        # calls, whose checks still apply to its result (see Interpreter.run_function),
+        # and how many there were
+        pending = None
+        tails = 0
+        # (code, pc, pending, tails) of every caller waiting on a return, and the memo
+        # key of the function it called, if its result is to be memoized
+        frames = []
+
+        if profiler:
+            profiler.enter(func_node)
+        if governor:
+            governor.enter(func_node)
+        variables.push_scope("function", func_node.layout)
+        interpreter.create_args(func_node, args)
+
+        # the most common instructions are tested first
+        while True:
+            opcode = instructions[pc]
+            arg = instructions[pc + 1]
+            pc += 2
+
+            if opcode == LOAD_LOCAL:
+                index, slot, layout, variable = constants[arg]
+                scope = scopes[index]
+                if scope.layout is layout:
+                    value = scope.values[slot]
+                    if value is not None:
+                        push(value)
+                        continue
+                push(interpreter.get_nested_variable(*variable))
+            elif opcode == LOAD_CONST:
+                push(constants[arg])
+            elif opcode == BINARY:
+                op2 = pop()
+                push(binary_operations[arg](interpreter, pop(), op2))
+            elif opcode == STORE_LOCAL:
+                index, slot, layout, variable = constants[arg]
+                value = pop()
+                scope = scopes[index]
+                if scope.layout is layout:
+                    # a value of the variable's own type needs no checks or coercion
+                    old = scope.values[slot]
+                    if old is not None and old.type() == value.type():
+                        scope.values[slot] = value
+                        continue
+                interpreter.assign_variable(variable[0], value, variable[1])
+            elif opcode == JUMP_IF_TRUE:
+                if pop().value():
+                    pc = arg
+            elif opcode == JUMP_IF_FALSE:
+                if not pop().value():
+                    pc = arg
+            elif opcode == TEST_CONDITION:
+                # only an int needs coercing
+                if stack[-1].type() != Type.BOOL:
+                    cond = interpreter.check_bool(pop())
+                    if cond.type() != Type.BOOL:
+                        interpreter.error(ErrorType.TYPE_ERROR, constants[arg])
+                    push(cond)
+            elif opcode == PUSH_SCOPE:
+                scope_type, layout = constants[arg]
+                scopes.append(Scope(scope_type, layout))
+            elif opcode == POP_SCOPE:
+                scopes.pop()
+            elif opcode == FIND_FUNCTION:
+                function = targets[arg]
+                if function is None:
+                    function = interpreter.find_function(*constants[arg])
+                    targets[arg] = function
+                push(function)
+            elif opcode == CALL or opcode == TAIL_CALL:
+                if opcode == TAIL_CALL:
+                    arg, depth = constants[arg]
+                start = len(stack) - arg
+                function = stack[start - 1]
+                callee = self.codes.get(function) or self.code(function)
+
+                if opcode == TAIL_CALL and variables.can_drop_function(
+                    callee.arg_names
+                ):
+                    # the callee takes the place of the running function, so its
+                    # block scopes and function scope go
+                    del scopes[len(scopes) - depth - 1 :]
+                    return_type = code.return_type
+                    if pending is None:
+                        pending = [return_type]
+                    elif pending[-1] != return_type:
+                        pending.append(return_type)
+                    tails += 1
+                    if governor:
+                        governor.charge(function)
+                    if profiler:
+                        profiler.enter(function)
+                else:
+                    # a pure function called with the same args as before gives the
+                    # same result
+                    key = None
+                    if function in pure_functions:
+                        key = memo_key(function, stack[start:])
+                        if key is not None:
+                            res = memo.get(key)
+                            if res is not None:
+                                del stack[start - 1 :]
+                                push(res)
+                                continue
+                    frames.append((code, pc, pending, tails, key))
+                    pending = None
+                    tails = 0
+                    if profiler:
+                        profiler.enter(function)
+                    if governor:
+                        governor.enter(function)
+
+                code = callee
+                instructions = code.instructions
+                constants = code.constants
+                targets = code.targets
+                pc = 0
+
+                scope = Scope("function", function.layout)
+                scopes.append(scope)
+                params = code.params
+                if params is None:
+                    interpreter.create_args(function, stack[start:])
+                else:
+                    # an arg of its declared type goes straight into its slot
+                    values = scope.values
+                    for i in range(arg):
+                        value = stack[start + i]
+                        arg_node, slot = params[i]
+                        if value.type() == arg_node.var_type:
+                            values[slot] = value
+                        else:
+                            interpreter.create_arg(arg_node, value)
+                del stack[start - 1 :]
+            elif opcode == RETURN or opcode == RETURN_DEFAULT:
+                if opcode == RETURN:
+                    res = pop()
+                    # the block scopes and the function scope
+                    del scopes[len(scopes) - arg - 1 :]
+                    if res.type() != code.return_type:
+                        res = interpreter.finish_return(code.return_type, res)
+                else:
+                    scopes.pop()
+                    res = interpreter.return_default(code.return_type)
+                if pending is not None:
+                    for return_type in reversed(pending):
+                        res = interpreter.finish_return(return_type, res)
+                if profiler:
+                    for _ in range(tails + 1):
+                        profiler.exit()
+                if governor:
+                    governor.exit()
+                if not frames:
+                    return res
+
+                # resume the caller
+                code, pc, pending, tails, key = frames.pop()
+                if key is not None:
+                    memo.put(key, res)
+                instructions = code.instructions
+                constants = code.constants
+                targets = code.targets
+                push(res)
+            elif opcode == JUMP:
+                pc = arg
+            elif opcode == POP:
+                pop()
+            elif opcode == LOAD_VAR:
+                push(interpreter.get_nested_variable(*constants[arg]))
+            elif opcode == STORE_VAR:
+                name, address, path = constants[arg]
+                interpreter.assign_variable(name, pop(), address)
+            elif opcode == STORE_FIELD:
+                name, address, path = constants[arg]
+                interpreter.set_nested_variable(name, pop(), address, path)
+            elif opcode == DEFINE_VAR:
+                interpreter.type_to_variable(*constants[arg])
+            elif opcode == LOAD_NIL:
+                push(NIL)
+            elif opcode == NEGATE:
+                push(interpreter.negate(pop()))
+            elif opcode == NOT:
+                push(interpreter.logical_not(pop()))
+            elif opcode == NEW:
+                push(interpreter.new_struct(constants[arg]))
+            elif opcode == PRINTABLE:
+                output = pop()
+                if output.type() == Type.VOID:
+                    interpreter.error(
+                        ErrorType.TYPE_ERROR,
+                        "Using void in print",
+                    )
+                push(get_printable(output))
+            elif opcode == PRINT:
+                if arg == 1:
+                    res = pop()
+                else:
+                    res = "".join(stack[len(stack) - arg :])
+                    del stack[len(stack) - arg :]
+                interpreter.output(res)
+                push(VOID)
+            elif opcode == INPUT:
+                push(self.run_input(*constants[arg]))
+            elif opcode == LINE:
+                profiler.hit(constants[arg])
+            elif opcode == CHARGE:
+                governor.charge(constants[arg])